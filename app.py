@@ -1,91 +1,82 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
 import os
-import tempfile
 import csv
 import io
 import json
-import requests
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from invoice_extractor_server import extract_fields_from_image
+from itertools import islice
+from document_pages import ALLOWED_EXTENSIONS, extract_document, get_file_extension, stream_document
+from extraction_cache import EXTRACTION_CACHE
+from job_queue import JOB_QUEUE
+from webhook_delivery import WebhookDelivery
+from webhook_config_store import WebhookConfigStore
+from webhook_batching import WebhookBatcher
+from webhook_log_store import WEBHOOK_LOGS
+from invoice_store import INVOICE_STORE
+from csv_export import LAYOUT_COLUMNS, stream_csv
+import columnar_export
+import extraction_publishing
+from extraction_publishing import record_webhook_log
+from reconciliation import AUDIT_BATCH_SIZE, audit_records, reconcile_invoices
+from product_matcher import PRODUCT_MATCHER
+from model_scheduler import MODEL_SCHEDULER
+from request_hedging import MODEL_HEDGER
+from model_cascade import cascade_stats
+from invoice_extractor_server import cascade_tiers
+from metrics import (METRICS, SERVER_TIMING, CURRENT_TIMINGS, HTTP_REQUESTS, REQUEST_SECONDS,
+                     RequestTimings, stage_timer)
 
 app = Flask(__name__)
 
 # Configure CORS to allow requests from Vercel frontend and local development
 CORS(app, origins=["*"])
 
-# Configure upload settings
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Configure upload settings: 16MB per file; a batch request may carry many files
+MAX_FILE_SIZE = 16 * 1024 * 1024
+BATCH_MAX_CONTENT_LENGTH = int(os.environ.get('BATCH_MAX_CONTENT_LENGTH', 512 * 1024 * 1024))
+# The app-wide limit is the largest; enforce_upload_limit lowers it to the per-file
+# limit for every route but the batch one
+app.config['MAX_CONTENT_LENGTH'] = max(MAX_FILE_SIZE, BATCH_MAX_CONTENT_LENGTH)
 UPLOAD_FOLDER = 'uploads'
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# Orphaned temp uploads older than this are removed by the janitor thread
+UPLOAD_JANITOR_INTERVAL = int(os.environ.get('UPLOAD_JANITOR_INTERVAL', 3600))
+UPLOAD_JANITOR_MAX_AGE = int(os.environ.get('UPLOAD_JANITOR_MAX_AGE', 3600))
+
+# Bounded worker pool shared by all batch extraction requests
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', 8))
+BATCH_EXECUTOR = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix='batch-extract')
+
+# Most stored invoices one /api/invoices/audit request scans (continue with next_cursor)
+AUDIT_MAX_SCAN = int(os.environ.get('AUDIT_MAX_SCAN', 50000))
+
 # Webhook configuration storage
-WEBHOOK_CONFIG_FILE = 'webhook_config.json'
-WEBHOOK_LOGS = []
-RECEIVED_WEBHOOK_DATA = []  # Store actual received JSON data
+WEBHOOK_CONFIG_FILE = os.environ.get('WEBHOOK_CONFIG_FILE', 'webhook_config.json')
+WEBHOOK_CONFIG = WebhookConfigStore(WEBHOOK_CONFIG_FILE)
 
 def load_webhook_config():
-    """Load webhook configuration from file."""
-    try:
-        if os.path.exists(WEBHOOK_CONFIG_FILE):
-            with open(WEBHOOK_CONFIG_FILE, 'r') as f:
-                return json.load(f)
-    except Exception as e:
-        print(f"Error loading webhook config: {e}")
-    return {'webhooks': []}
+    """Load webhook configuration (served from memory, re-read only when the file changes)."""
+    return WEBHOOK_CONFIG.load()
 
 def save_webhook_config(config):
-    """Save webhook configuration to file."""
-    try:
-        with open(WEBHOOK_CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=2)
-        return True
-    except Exception as e:
-        print(f"Error saving webhook config: {e}")
-        return False
+    """Save webhook configuration to file atomically."""
+    return WEBHOOK_CONFIG.save(config)
+
+# Pooled, retrying webhook delivery backed by a durable outbox
+WEBHOOK_DELIVERY = WebhookDelivery(on_result=record_webhook_log)
+
+# Per-webhook batching (batch_size, batch_linger_seconds, gzip options in webhook_config.json)
+WEBHOOK_BATCHER = WebhookBatcher(WEBHOOK_DELIVERY)
 
 def send_webhook(url, data, headers=None):
-    """Send data to webhook URL asynchronously."""
-    def _send():
-        log_entry = {
-            'timestamp': datetime.now().isoformat(),
-            'url': url,
-            'status': 'pending',
-            'response_code': None,
-            'error': None
-        }
-        
-        try:
-            webhook_headers = {'Content-Type': 'application/json'}
-            if headers:
-                webhook_headers.update(headers)
-            
-            response = requests.post(
-                url, 
-                json=data, 
-                headers=webhook_headers,
-                timeout=30
-            )
-            
-            log_entry['status'] = 'success' if response.status_code < 400 else 'failed'
-            log_entry['response_code'] = response.status_code
-            log_entry['response_text'] = response.text[:500]  # Limit response text
-            
-        except Exception as e:
-            log_entry['status'] = 'error'
-            log_entry['error'] = str(e)
-        
-        # Store log (keep only last 100 entries)
-        WEBHOOK_LOGS.append(log_entry)
-        if len(WEBHOOK_LOGS) > 100:
-            WEBHOOK_LOGS.pop(0)
-    
-    # Send webhook in background thread
-    thread = threading.Thread(target=_send)
-    thread.daemon = True
-    thread.start()
+    """Queue data for delivery to a webhook URL."""
+    WEBHOOK_DELIVERY.enqueue(url, data, headers)
 
 def flatten_invoice_data(data):
     """Flatten nested invoice data for CSV export."""
@@ -109,6 +100,73 @@ def flatten_invoice_data(data):
     flatten_dict(data)
     return flattened
 
+def cleanup_orphaned_uploads(max_age=None):
+    """Remove stale temp_invoice_* files left in the upload folder; returns how many were removed."""
+    max_age = UPLOAD_JANITOR_MAX_AGE if max_age is None else max_age
+    cutoff = time.time() - max_age
+    removed = 0
+    for filename in os.listdir(UPLOAD_FOLDER):
+        if not filename.startswith('temp_invoice_'):
+            continue
+        path = os.path.join(UPLOAD_FOLDER, filename)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError as e:
+            print(f"Error removing orphaned upload {filename}: {e}")
+    return removed
+
+def start_upload_janitor():
+    """Periodically clean orphaned uploads in a background thread."""
+    def _run():
+        while True:
+            removed = cleanup_orphaned_uploads()
+            if removed:
+                print(f"Upload janitor removed {removed} orphaned file(s)")
+            time.sleep(UPLOAD_JANITOR_INTERVAL)
+    
+    thread = threading.Thread(target=_run, name='upload-janitor')
+    thread.daemon = True
+    thread.start()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    # Always reset, so a reused worker thread never carries an earlier request's timings
+    CURRENT_TIMINGS.set(RequestTimings() if SERVER_TIMING else None)
+
+@app.before_request
+def enforce_upload_limit():
+    """Limit bodies to 16MB except on the batch route, which checks each file instead.
+
+    Set on the request rather than checked against Content-Length, so chunked uploads
+    (which have none) are cut off while the body is read.
+    """
+    if request.endpoint != 'extract_invoice_batch':
+        request.max_content_length = MAX_FILE_SIZE
+    # Parse uploads here, so an oversized body is answered by the 413 handler rather
+    # than by the routes' generic error handling
+    if request.mimetype == 'multipart/form-data':
+        request.files
+
+@app.after_request
+def record_request_metrics(response):
+    """Record request latency and, when enabled, add the Server-Timing stage breakdown."""
+    endpoint = request.endpoint or 'unmatched'
+    started = getattr(g, 'request_started', None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+    HTTP_REQUESTS.inc(endpoint, str(response.status_code))
+    timings = CURRENT_TIMINGS.get()
+    if timings is not None:
+        response.headers['Server-Timing'] = timings.server_timing()
+    return response
+
+def publish_extraction(extracted_data):
+    """Enrich the extracted invoice, store it and send it to configured webhooks."""
+    extraction_publishing.publish_extraction(extracted_data, WEBHOOK_CONFIG, WEBHOOK_BATCHER)
+
 @app.route('/api/extract', methods=['POST'])
 def extract_invoice_data():
     """Extract data from uploaded invoice image."""
@@ -122,57 +180,175 @@ def extract_invoice_data():
             return jsonify({'error': 'No file selected'}), 400
         
         # Validate file type
-        allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff'}
-        file_extension = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
+        file_extension = get_file_extension(file.filename)
         
-        if file_extension not in allowed_extensions:
-            return jsonify({'error': 'Invalid file type. Please upload an image file.'}), 400
+        if file_extension not in ALLOWED_EXTENSIONS:
+            return jsonify({'error': 'Invalid file type. Please upload an image or PDF file.'}), 400
         
-        # Save uploaded file temporarily
-        temp_filename = f"temp_invoice_{os.urandom(8).hex()}.{file_extension}"
-        temp_path = os.path.join(UPLOAD_FOLDER, temp_filename)
-        file.save(temp_path)
+        # Queue the upload for a worker process instead of extracting in the request
+        if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+            job_id = JOB_QUEUE.enqueue(file.filename, file.read())
+            return jsonify({
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': request.url_root.rstrip('/') + f'/api/jobs/{job_id}'
+            }), 202
         
-        try:
-            # Extract data using your existing function
-            extracted_data, error_message = extract_fields_from_image(temp_path)
-            
-            if error_message:
-                return jsonify({'error': error_message}), 500
-            
-            if not extracted_data:
-                return jsonify({'error': 'No data could be extracted from the invoice'}), 400
-            
-            # Clean up temporary file
-            os.remove(temp_path)
-            
-            # Store current invoice data (replace any previous data)
-            current_entry = {
-                'timestamp': datetime.now().isoformat(),
-                'data': extracted_data
-            }
-            RECEIVED_WEBHOOK_DATA[:] = [current_entry]
-            
-            # Send data to configured webhooks
-            config = load_webhook_config()
-            for webhook in config.get('webhooks', []):
-                if webhook.get('enabled', True):
-                    send_webhook(
-                        webhook['url'], 
-                        extracted_data, 
-                        webhook.get('headers', {})
-                    )
-            
+        # Pass the upload straight to the extractor; Werkzeug already spools large
+        # request bodies to a self-deleting temporary file
+        with stage_timer('read_upload'):
+            file_data = file.read()
+        extracted_data, error_message = extract_document(file_data, file_extension)
+        
+        if error_message:
+            return jsonify({'error': error_message}), 500
+        
+        if not extracted_data:
+            return jsonify({'error': 'No data could be extracted from the invoice'}), 400
+        
+        publish_extraction(extracted_data)
+        
+        with stage_timer('serialize'):
             return jsonify(extracted_data)
             
+    except Exception as e:
+        return jsonify({'error': f'Processing failed: {str(e)}'}), 500
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/extract-stream', methods=['POST'])
+def extract_invoice_stream():
+    """Extract invoice data, streaming sections and line items as Server-Sent Events.
+
+    Events: 'field' ({key, value}) per header section, 'item' ({index, item}) per line
+    item, then 'done' with the full invoice or 'error'.
+    """
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file uploaded'}), 400
+    
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    file_extension = get_file_extension(file.filename)
+    if file_extension not in ALLOWED_EXTENSIONS:
+        return jsonify({'error': 'Invalid file type. Please upload an image or PDF file.'}), 400
+    
+    image_data = file.read()
+    
+    def generate():
+        try:
+            for event in stream_document(image_data, file_extension):
+                if event[0] == 'field':
+                    yield sse_event('field', {'key': event[1], 'value': event[2]})
+                elif event[0] == 'item':
+                    yield sse_event('item', {'index': event[1], 'item': event[2]})
+                else:
+                    _, extracted_data, error_message = event
+                    if error_message:
+                        yield sse_event('error', {'error': error_message})
+                    elif not extracted_data:
+                        yield sse_event('error', {'error': 'No data could be extracted from the invoice'})
+                    else:
+                        publish_extraction(extracted_data)
+                        yield sse_event('done', extracted_data)
         except Exception as e:
-            # Clean up temporary file in case of error
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            raise e
+            yield sse_event('error', {'error': f'Processing failed: {str(e)}'})
+    
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def extract_batch_file(index, filename, image_data):
+    """Extract one file of a batch."""
+    result = {'index': index, 'filename': filename}
+    try:
+        extracted_data, error_message = extract_document(image_data, get_file_extension(filename))
+        
+        if error_message:
+            result['error'] = error_message
+        elif not extracted_data:
+            result['error'] = 'No data could be extracted from the invoice'
+        else:
+            publish_extraction(extracted_data)
+            result['data'] = extracted_data
+    except Exception as e:
+        result['error'] = f'Processing failed: {str(e)}'
+    return result
+
+@app.route('/api/extract-batch', methods=['POST'])
+def extract_invoice_batch():
+    """Extract data from many uploaded invoice images concurrently."""
+    try:
+        files = [f for f in request.files.getlist('files') if f.filename]
+        if not files:
+            return jsonify({'error': 'No files uploaded'}), 400
+        
+        # Validate and read every file, then fan out to the shared worker pool
+        results = []
+        futures = []
+        for index, file in enumerate(files):
+            file_extension = get_file_extension(file.filename)
+            if file_extension not in ALLOWED_EXTENSIONS:
+                results.append({
+                    'index': index,
+                    'filename': file.filename,
+                    'error': 'Invalid file type. Please upload an image or PDF file.'
+                })
+                continue
+            
+            file_data = file.read(MAX_FILE_SIZE + 1)
+            if len(file_data) > MAX_FILE_SIZE:
+                results.append({
+                    'index': index,
+                    'filename': file.filename,
+                    'error': 'File too large. Maximum size is 16MB.'
+                })
+                continue
             
+            futures.append(BATCH_EXECUTOR.submit(extract_batch_file, index, file.filename, file_data))
+        
+        # Optionally stream each result as newline-delimited JSON as soon as it completes
+        if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+            def generate():
+                for result in results:
+                    yield json.dumps(result) + '\n'
+                for future in as_completed(futures):
+                    yield json.dumps(future.result()) + '\n'
+            
+            return Response(generate(), mimetype='application/x-ndjson')
+        
+        for future in as_completed(futures):
+            results.append(future.result())
+        results.sort(key=lambda r: r['index'])
+        
+        succeeded = sum(1 for r in results if 'data' in r)
+        return jsonify({
+            'total': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'results': results
+        })
+        
     except Exception as e:
-        return jsonify({'error': f'Processing failed: {str(e)}'}), 500
+        return jsonify({'error': f'Batch processing failed: {str(e)}'}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status and result of an asynchronous extraction job."""
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs', methods=['GET'])
+def get_job_stats():
+    """Get the number of queued, running, done and failed jobs."""
+    return jsonify({'jobs': JOB_QUEUE.stats()})
 
 @app.route('/api/download-csv', methods=['POST'])
 def download_csv():
@@ -195,20 +371,14 @@ def download_csv():
         writer.writeheader()
         writer.writerow(flattened_data)
         
-        # Convert to bytes
+        # Send straight from memory
         csv_content = output.getvalue()
         output.close()
         
-        # Create a temporary file for download
-        temp_file = tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.csv')
-        temp_file.write(csv_content)
-        temp_file.close()
-        
-        return send_file(
-            temp_file.name,
-            as_attachment=True,
-            download_name='extracted_invoice_data.csv',
-            mimetype='text/csv'
+        return Response(
+            csv_content,
+            mimetype='text/csv',
+            headers={'Content-Disposition': 'attachment; filename=extracted_invoice_data.csv'}
         )
         
     except Exception as e:
@@ -223,16 +393,11 @@ def download_json():
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
-        # Create a temporary file for download
-        temp_file = tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.json')
-        json.dump(data, temp_file, indent=2, ensure_ascii=False)
-        temp_file.close()
-        
-        return send_file(
-            temp_file.name,
-            as_attachment=True,
-            download_name='extracted_invoice_data.json',
-            mimetype='application/json'
+        # Send straight from memory
+        return Response(
+            json.dumps(data, indent=2, ensure_ascii=False),
+            mimetype='application/json',
+            headers={'Content-Disposition': 'attachment; filename=extracted_invoice_data.json'}
         )
         
     except Exception as e:
@@ -253,20 +418,18 @@ def add_webhook():
         if not data or not data.get('url'):
             return jsonify({'error': 'Webhook URL is required'}), 400
         
-        config = load_webhook_config()
-        
-        webhook = {
-            'id': len(config['webhooks']) + 1,
-            'name': data.get('name', f"Webhook {len(config['webhooks']) + 1}"),
-            'url': data['url'],
-            'enabled': data.get('enabled', True),
-            'headers': data.get('headers', {}),
-            'created_at': datetime.now().isoformat()
-        }
+        # Optional batching settings
+        options = {key: data[key] for key in ('batch_size', 'batch_linger_seconds', 'gzip') if key in data}
         
-        config['webhooks'].append(webhook)
+        webhook = WEBHOOK_CONFIG.add(
+            data.get('name'),
+            data['url'],
+            enabled=data.get('enabled', True),
+            headers=data.get('headers', {}),
+            **options
+        )
         
-        if save_webhook_config(config):
+        if webhook:
             return jsonify(webhook), 201
         else:
             return jsonify({'error': 'Failed to save webhook configuration'}), 500
@@ -278,10 +441,7 @@ def add_webhook():
 def delete_webhook(webhook_id):
     """Delete a webhook configuration."""
     try:
-        config = load_webhook_config()
-        config['webhooks'] = [w for w in config['webhooks'] if w.get('id') != webhook_id]
-        
-        if save_webhook_config(config):
+        if WEBHOOK_CONFIG.delete(webhook_id):
             return jsonify({'message': 'Webhook deleted successfully'})
         else:
             return jsonify({'error': 'Failed to save webhook configuration'}), 500
@@ -293,14 +453,7 @@ def delete_webhook(webhook_id):
 def toggle_webhook(webhook_id):
     """Toggle webhook enabled/disabled status."""
     try:
-        config = load_webhook_config()
-        
-        for webhook in config['webhooks']:
-            if webhook.get('id') == webhook_id:
-                webhook['enabled'] = not webhook.get('enabled', True)
-                break
-        
-        if save_webhook_config(config):
+        if WEBHOOK_CONFIG.toggle(webhook_id):
             return jsonify({'message': 'Webhook status updated'})
         else:
             return jsonify({'error': 'Failed to save webhook configuration'}), 500
@@ -311,7 +464,42 @@ def toggle_webhook(webhook_id):
 @app.route('/api/webhook-logs', methods=['GET'])
 def get_webhook_logs():
     """Get webhook delivery logs."""
-    return jsonify({'logs': WEBHOOK_LOGS})
+    return jsonify({'logs': WEBHOOK_LOGS.recent()})
+
+@app.route('/api/webhook-deliveries', methods=['GET'])
+def get_webhook_deliveries():
+    """Get webhook outbox counts, retry counters and circuit breaker states."""
+    return jsonify(WEBHOOK_DELIVERY.stats())
+
+@app.route('/api/model-cascade', methods=['GET'])
+def get_model_cascade_stats():
+    """Per-tier attempts, hit rates and latency of the model cascade."""
+    return jsonify(cascade_stats(cascade_tiers()))
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Stage latency histograms and extraction, cache, model and webhook counters (Prometheus text format)."""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """Get extraction cache hit/miss counts."""
+    return jsonify(EXTRACTION_CACHE.stats())
+
+@app.route('/api/model-scheduler', methods=['GET'])
+def get_model_scheduler_stats():
+    """Model call concurrency limit, queue depth, quota buckets, throttle and hedging counters."""
+    return jsonify({**MODEL_SCHEDULER.stats(), 'hedging': MODEL_HEDGER.stats()})
+
+@app.route('/api/clear-cache', methods=['POST'])
+def clear_cache():
+    """Clear all cached extraction results."""
+    EXTRACTION_CACHE.clear()
+    return jsonify({
+        'status': 'success',
+        'message': 'Extraction cache cleared',
+        'timestamp': datetime.now().isoformat()
+    })
 
 @app.route('/api/demo-webhook', methods=['POST'])
 def demo_webhook():
@@ -330,19 +518,13 @@ def demo_webhook():
         }
         
         # Store in webhook logs for demonstration
-        WEBHOOK_LOGS.append(log_entry)
-        if len(WEBHOOK_LOGS) > 100:
-            WEBHOOK_LOGS.pop(0)
+        record_webhook_log(log_entry)
         
         # Only store data if this is a demo webhook call (not from main extraction)
         # Check if data is already stored from main extraction process
-        if not RECEIVED_WEBHOOK_DATA or RECEIVED_WEBHOOK_DATA[0]['data'] != data:
-            received_entry = {
-                'timestamp': log_entry['timestamp'],
-                'data': data
-            }
-            # Replace entire list with single current entry
-            RECEIVED_WEBHOOK_DATA[:] = [received_entry]
+        latest = INVOICE_STORE.latest()
+        if not latest or latest['data'] != data:
+            INVOICE_STORE.save(data, source='demo_webhook')
         
         print(f"Demo webhook received data: {log_entry}")
         
@@ -364,7 +546,7 @@ def demo_webhook():
             'type': 'demo_webhook_error',
             'error': str(e)
         }
-        WEBHOOK_LOGS.append(error_log)
+        record_webhook_log(error_log)
         
         return jsonify({
             'status': 'error',
@@ -373,15 +555,148 @@ def demo_webhook():
 
 @app.route('/api/get-data', methods=['GET'])
 def get_demo_webhook_data():
-    """Get all JSON data received by the demo webhook."""
+    """Get the most recent invoice data (extracted or received by the demo webhook)."""
+    latest = INVOICE_STORE.latest()
     return jsonify({
-        'data': RECEIVED_WEBHOOK_DATA
+        'data': [{'id': latest['id'], 'timestamp': latest['timestamp'], 'data': latest['data']}] if latest else []
     })
 
+def invoice_filters_from_request():
+    """Read invoice store filters from the query string."""
+    args = request.args
+    return {
+        'invoice_number': args.get('invoice_number'),
+        'gstin': args.get('gstin'),
+        'company': args.get('company'),
+        'date_from': args.get('date_from'),
+        'date_to': args.get('date_to'),
+        'sku': args.get('sku')
+    }
+
+@app.route('/api/invoices', methods=['GET'])
+def list_invoices():
+    """Query stored invoices with filters and keyset pagination."""
+    try:
+        args = request.args
+        result = INVOICE_STORE.query(
+            cursor=args.get('cursor', type=int),
+            limit=args.get('limit', 50, type=int),
+            include_data=args.get('include_data', '').lower() in ('1', 'true', 'yes'),
+            **invoice_filters_from_request()
+        )
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': f'Invoice query failed: {str(e)}'}), 500
+
+@app.route('/api/export/csv', methods=['GET'])
+def export_invoices_csv():
+    """Stream stored invoices as CSV (layout=items for one row per line item, or invoices)."""
+    layout = request.args.get('layout', 'items')
+    if layout not in LAYOUT_COLUMNS:
+        return jsonify({'error': f"Invalid layout. Use one of: {', '.join(LAYOUT_COLUMNS)}"}), 400
+    
+    records = INVOICE_STORE.iter_invoices(**invoice_filters_from_request())
+    return Response(
+        stream_csv(records, layout),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=invoices_{layout}.csv'}
+    )
+
+@app.route('/api/export/items', methods=['GET'])
+def export_line_items():
+    """Stream stored line items in a columnar format (Parquet, or gzip NDJSON without pyarrow)."""
+    export_format = request.args.get('format', columnar_export.default_format())
+    if export_format not in columnar_export.EXPORT_FORMATS:
+        return jsonify({'error': f"Invalid format. Use one of: {', '.join(columnar_export.EXPORT_FORMATS)}"}), 400
+    if export_format == 'parquet' and columnar_export.pa is None:
+        return jsonify({'error': 'Parquet export requires pyarrow; use format=ndjson'}), 400
+    
+    stream, mimetype, extension = columnar_export.EXPORT_FORMATS[export_format]
+    records = INVOICE_STORE.iter_invoices(**invoice_filters_from_request())
+    return Response(
+        stream(records),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=invoice_items.{extension}'}
+    )
+
+@app.route('/api/reconcile', methods=['POST'])
+def reconcile_posted_invoices():
+    """Check the arithmetic of one invoice or a list of invoices."""
+    try:
+        payload = request.get_json()
+        if payload is None:
+            return jsonify({'error': 'No invoice data provided'}), 400
+        invoices = payload if isinstance(payload, list) else [payload]
+        if not all(isinstance(invoice, dict) for invoice in invoices):
+            return jsonify({'error': 'Expected an invoice object or a list of invoice objects'}), 400
+        return jsonify(reconcile_invoices(invoices))
+    except Exception as e:
+        return jsonify({'error': f'Reconciliation failed: {str(e)}'}), 500
+
+@app.route('/api/match-products', methods=['POST'])
+def match_products():
+    """Match product descriptions to the formulary index (top-k per description)."""
+    if not PRODUCT_MATCHER.available:
+        return jsonify({'error': 'No product index has been built'}), 503
+    try:
+        payload = request.get_json() or {}
+        descriptions = payload.get('descriptions')
+        if not isinstance(descriptions, list) or not descriptions:
+            return jsonify({'error': 'Expected a non-empty descriptions list'}), 400
+        k = min(int(payload.get('k', 5)), 50)
+        matches = PRODUCT_MATCHER.match_many([str(description) for description in descriptions], k)
+        return jsonify({'results': [{'description': d, 'matches': m} for d, m in zip(descriptions, matches)]})
+    except Exception as e:
+        return jsonify({'error': f'Product matching failed: {str(e)}'}), 500
+
+@app.route('/api/invoices/audit', methods=['GET'])
+def audit_stored_invoices():
+    """Reconcile a window of stored invoices (accepts the /api/invoices filters) and list only the flagged ones.
+
+    Scans at most `limit` invoices (newest first, older than `cursor`) in batches, so a request
+    never loads the whole store; pass next_cursor back to audit the following window.
+    """
+    try:
+        args = request.args
+        limit = max(1, min(args.get('limit', AUDIT_BATCH_SIZE, type=int), AUDIT_MAX_SCAN))
+        records = INVOICE_STORE.iter_invoices(cursor=args.get('cursor', type=int), **invoice_filters_from_request())
+
+        # Stop after `limit` records, remembering the last id scanned
+        last_id = None
+        def window():
+            nonlocal last_id
+            for record in islice(records, limit):
+                last_id = record['id']
+                yield record
+
+        summary = {'invoices': 0, 'flagged': 0, 'lines': 0, 'lines_checked': 0, 'bad_lines': 0}
+        flagged = []
+        for report in audit_records(window()):
+            for key, value in report['summary'].items():
+                summary[key] += value
+            flagged.extend(report['invoices'])
+
+        return jsonify({
+            'summary': summary,
+            'invoices': flagged,
+            'next_cursor': last_id if next(records, None) is not None else None,
+            'limit': limit
+        })
+    except Exception as e:
+        return jsonify({'error': f'Invoice audit failed: {str(e)}'}), 500
+
+@app.route('/api/invoices/<int:invoice_id>', methods=['GET'])
+def get_invoice(invoice_id):
+    """Get one stored invoice."""
+    invoice = INVOICE_STORE.get(invoice_id)
+    if invoice is None:
+        return jsonify({'error': 'Invoice not found'}), 404
+    return jsonify(invoice)
+
 @app.route('/api/clear-webhook-data', methods=['POST'])
 def clear_webhook_data():
-    """Clear all stored webhook data."""
-    RECEIVED_WEBHOOK_DATA.clear()
+    """Clear the latest-data view and webhook logs (stored invoice history is kept)."""
+    INVOICE_STORE.clear_latest()
     WEBHOOK_LOGS.clear()
     return jsonify({
         'status': 'success',
@@ -435,17 +750,14 @@ def test_webhook_system():
                 }
             }
             
-            webhook = {
-                'id': len(config['webhooks']) + 1,
-                'name': webhook_data['name'],
-                'url': webhook_data['url'],
-                'enabled': webhook_data.get('enabled', True),
-                'headers': webhook_data.get('headers', {}),
-                'created_at': datetime.now().isoformat()
-            }
-            config['webhooks'].append(webhook)
+            webhook = WEBHOOK_CONFIG.add(
+                webhook_data['name'],
+                webhook_data['url'],
+                enabled=webhook_data.get('enabled', True),
+                headers=webhook_data.get('headers', {})
+            )
             
-            if save_webhook_config(config):
+            if webhook:
                 results['tests'].append({
                     'name': 'Add Webhook Configuration',
                     'status': 'success',
@@ -521,8 +833,8 @@ def test_webhook_system():
         results['tests'].append({
             'name': 'Webhook Logs Check',
             'status': 'success',
-            'message': f'Found {len(WEBHOOK_LOGS)} log entries',
-            'recent_logs': WEBHOOK_LOGS[-3:] if len(WEBHOOK_LOGS) > 0 else []
+            'message': f'Found {WEBHOOK_LOGS.count()} log entries',
+            'recent_logs': WEBHOOK_LOGS.recent(3)
         })
         
         # # Summary
@@ -564,6 +876,9 @@ def health_check():
     """Health check endpoint."""
     return jsonify({'status': 'healthy', 'message': 'Invoice extractor API is running'})
 
+start_upload_janitor()
+WEBHOOK_DELIVERY.start()
+
 @app.errorhandler(413)
 def too_large(e):
     return jsonify({'error': 'File too large. Maximum size is 16MB.'}), 413
@@ -0,0 +1,271 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from quart import Quart, request, jsonify, Response, g
+from quart_cors import cors
+from document_pages import ALLOWED_EXTENSIONS, extract_document_async, get_file_extension
+from job_queue import JOB_QUEUE
+from webhook_delivery import AsyncWebhookDelivery
+from webhook_config_store import WebhookConfigStore
+from webhook_batching import WebhookBatcher
+from webhook_log_store import WEBHOOK_LOGS
+from invoice_store import INVOICE_STORE
+import extraction_publishing
+from extraction_publishing import record_webhook_log
+from model_scheduler import MODEL_SCHEDULER
+from request_hedging import MODEL_HEDGER
+from metrics import (METRICS, SERVER_TIMING, CURRENT_TIMINGS, HTTP_REQUESTS, REQUEST_SECONDS, RequestTimings,
+                     stage_timer)
+
+# Asyncio-native variant of the extraction and webhook routes in app.py.
+# Serve with: uvicorn asgi_app:app --host 0.0.0.0 --port 5001
+app = cors(Quart(__name__), allow_origin='*')
+
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+
+# Threads for blocking work (SQLite, image decoding, enrichment); model calls and webhook
+# POSTs are awaited on the event loop and never occupy one
+ASYNC_BLOCKING_THREADS = int(os.environ.get('ASYNC_BLOCKING_THREADS', 8))
+
+# Webhook configuration and logs are shared with app.py through their files
+WEBHOOK_CONFIG_FILE = os.environ.get('WEBHOOK_CONFIG_FILE', 'webhook_config.json')
+WEBHOOK_CONFIG = WebhookConfigStore(WEBHOOK_CONFIG_FILE)
+
+# Webhooks are sent by coroutines through an async HTTP client, from the same outbox
+WEBHOOK_DELIVERY = AsyncWebhookDelivery(on_result=record_webhook_log)
+WEBHOOK_BATCHER = WebhookBatcher(WEBHOOK_DELIVERY)
+
+@app.before_serving
+async def start_services():
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_THREADS, thread_name_prefix='asgi-blocking')
+    )
+    await WEBHOOK_DELIVERY.start_async()
+
+@app.after_serving
+async def stop_services():
+    await asyncio.to_thread(WEBHOOK_BATCHER.flush_all)
+    await WEBHOOK_DELIVERY.stop_async()
+
+@app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+    CURRENT_TIMINGS.set(RequestTimings() if SERVER_TIMING else None)
+
+@app.after_request
+async def record_request_metrics(response):
+    """Record request latency and, when enabled, add the Server-Timing stage breakdown."""
+    endpoint = request.endpoint or 'unmatched'
+    started = getattr(g, 'request_started', None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+    HTTP_REQUESTS.inc(endpoint, str(response.status_code))
+    timings = CURRENT_TIMINGS.get()
+    if timings is not None:
+        response.headers['Server-Timing'] = timings.server_timing()
+    return response
+
+def publish_extraction(extracted_data):
+    """Enrich the extracted invoice, store it and send it to configured webhooks (blocking; run in a thread)."""
+    extraction_publishing.publish_extraction(extracted_data, WEBHOOK_CONFIG, WEBHOOK_BATCHER)
+
+@app.route('/api/extract', methods=['POST'])
+async def extract_invoice_data():
+    """Extract data from uploaded invoice image."""
+    try:
+        files = await request.files
+        if 'file' not in files:
+            return jsonify({'error': 'No file uploaded'}), 400
+
+        file = files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+
+        file_extension = get_file_extension(file.filename)
+        if file_extension not in ALLOWED_EXTENSIONS:
+            return jsonify({'error': 'Invalid file type. Please upload an image or PDF file.'}), 400
+
+        with stage_timer('read_upload'):
+            file_data = file.read()
+
+        # Queue the upload for a worker process instead of extracting in the request
+        if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+            job_id = await asyncio.to_thread(JOB_QUEUE.enqueue, file.filename, file_data)
+            return jsonify({
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': request.url_root.rstrip('/') + f'/api/jobs/{job_id}'
+            }), 202
+
+        extracted_data, error_message = await extract_document_async(file_data, file_extension)
+
+        if error_message:
+            return jsonify({'error': error_message}), 500
+
+        if not extracted_data:
+            return jsonify({'error': 'No data could be extracted from the invoice'}), 400
+
+        await asyncio.to_thread(publish_extraction, extracted_data)
+
+        with stage_timer('serialize'):
+            return jsonify(extracted_data)
+
+    except Exception as e:
+        return jsonify({'error': f'Processing failed: {str(e)}'}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+async def get_job(job_id):
+    """Get the status and result of an asynchronous extraction job."""
+    job = await asyncio.to_thread(JOB_QUEUE.get, job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs', methods=['GET'])
+async def get_job_stats():
+    """Get the number of queued, running, done and failed jobs."""
+    return jsonify({'jobs': await asyncio.to_thread(JOB_QUEUE.stats)})
+
+@app.route('/api/webhooks', methods=['GET'])
+async def get_webhooks():
+    """Get all configured webhooks."""
+    return jsonify(await asyncio.to_thread(WEBHOOK_CONFIG.load))
+
+@app.route('/api/webhooks', methods=['POST'])
+async def add_webhook():
+    """Add a new webhook configuration."""
+    try:
+        data = await request.get_json()
+
+        if not data or not data.get('url'):
+            return jsonify({'error': 'Webhook URL is required'}), 400
+
+        options = {key: data[key] for key in ('batch_size', 'batch_linger_seconds', 'gzip') if key in data}
+
+        webhook = await asyncio.to_thread(
+            WEBHOOK_CONFIG.add,
+            data.get('name'),
+            data['url'],
+            enabled=data.get('enabled', True),
+            headers=data.get('headers', {}),
+            **options
+        )
+
+        if webhook:
+            return jsonify(webhook), 201
+        else:
+            return jsonify({'error': 'Failed to save webhook configuration'}), 500
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to add webhook: {str(e)}'}), 500
+
+@app.route('/api/webhooks/<int:webhook_id>', methods=['DELETE'])
+async def delete_webhook(webhook_id):
+    """Delete a webhook configuration."""
+    try:
+        if await asyncio.to_thread(WEBHOOK_CONFIG.delete, webhook_id):
+            return jsonify({'message': 'Webhook deleted successfully'})
+        else:
+            return jsonify({'error': 'Failed to save webhook configuration'}), 500
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to delete webhook: {str(e)}'}), 500
+
+@app.route('/api/webhooks/<int:webhook_id>/toggle', methods=['POST'])
+async def toggle_webhook(webhook_id):
+    """Toggle webhook enabled/disabled status."""
+    try:
+        if await asyncio.to_thread(WEBHOOK_CONFIG.toggle, webhook_id):
+            return jsonify({'message': 'Webhook status updated'})
+        else:
+            return jsonify({'error': 'Failed to save webhook configuration'}), 500
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to toggle webhook: {str(e)}'}), 500
+
+@app.route('/api/webhook-logs', methods=['GET'])
+async def get_webhook_logs():
+    """Get webhook delivery logs."""
+    return jsonify({'logs': await asyncio.to_thread(WEBHOOK_LOGS.recent)})
+
+@app.route('/api/webhook-deliveries', methods=['GET'])
+async def get_webhook_deliveries():
+    """Get webhook outbox counts, retry counters and circuit breaker states."""
+    return jsonify(await asyncio.to_thread(WEBHOOK_DELIVERY.stats))
+
+@app.route('/api/demo-webhook', methods=['POST'])
+async def demo_webhook():
+    """Demo webhook endpoint to receive invoice data."""
+    try:
+        data = await request.get_json()
+
+        log_entry = {
+            'timestamp': datetime.now().isoformat(),
+            'type': 'demo_webhook_received',
+            'data_keys': list(data.keys()) if data else [],
+            'invoice_number': data.get('invoice_info', {}).get('gst_invoice_number', 'N/A') if data else 'N/A',
+            'company_name': data.get('company_info', {}).get('company_name', 'N/A') if data else 'N/A',
+            'total_amount': data.get('totals', {}).get('total_invoice', 'N/A') if data else 'N/A'
+        }
+
+        def store():
+            record_webhook_log(log_entry)
+            # Only store data not already saved by the extraction that sent it
+            latest = INVOICE_STORE.latest()
+            if not latest or latest['data'] != data:
+                INVOICE_STORE.save(data, source='demo_webhook')
+
+        await asyncio.to_thread(store)
+
+        return jsonify({
+            'status': 'success',
+            'message': 'Invoice data received successfully',
+            'received_at': log_entry['timestamp'],
+            'data_summary': {
+                'invoice_number': log_entry['invoice_number'],
+                'company_name': log_entry['company_name'],
+                'total_amount': log_entry['total_amount'],
+                'fields_count': len(log_entry['data_keys'])
+            }
+        }), 200
+
+    except Exception as e:
+        await asyncio.to_thread(record_webhook_log, {
+            'timestamp': datetime.now().isoformat(),
+            'type': 'demo_webhook_error',
+            'error': str(e)
+        })
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to process webhook data: {str(e)}'
+        }), 500
+
+@app.route('/api/model-scheduler', methods=['GET'])
+async def get_model_scheduler_stats():
+    """Model call concurrency limit, queue depth, quota buckets, throttle and hedging counters."""
+    return jsonify({**MODEL_SCHEDULER.stats(), 'hedging': MODEL_HEDGER.stats()})
+
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    """Stage latency histograms and extraction, cache, model and webhook counters (Prometheus text format)."""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/health', methods=['GET'])
+async def health_check():
+    """Health check endpoint."""
+    return jsonify({'status': 'healthy', 'message': 'Invoice extractor API is running'})
+
+@app.errorhandler(413)
+async def too_large(e):
+    return jsonify({'error': 'File too large. Maximum size is 16MB.'}), 413
+
+@app.errorhandler(404)
+async def not_found(e):
+    return jsonify({'error': 'Endpoint not found'}), 404
+
+if __name__ == '__main__':
+    import uvicorn
+    port = int(os.environ.get('PORT', 5001))
+    uvicorn.run(app, host='0.0.0.0', port=port)
@@ -0,0 +1,282 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from PIL import Image
+
+def configure_offline_environment(args, workdir: str):
+    """Point the app at the local backend and throwaway storage (before app is imported)."""
+    os.environ['EXTRACTION_BACKEND'] = 'local'
+    os.environ['LOCAL_MODEL_LATENCY'] = args.latency
+    os.environ.setdefault('MODEL_REQUESTS_PER_MINUTE', '1000000')
+    os.environ.setdefault('MODEL_TOKENS_PER_MINUTE', '1000000000')
+    os.environ.setdefault('MODEL_MAX_CONCURRENCY', str(max(16, args.concurrency)))
+    for variable, filename in (('INVOICE_STORE_DB', 'invoices.db'), ('EXTRACTION_CACHE_DB', 'cache.db'),
+                               ('JOB_QUEUE_DB', 'jobs.db'), ('WEBHOOK_OUTBOX_DB', 'outbox.db'),
+                               ('WEBHOOK_LOG_DB', 'webhook_logs.db'),
+                               ('WEBHOOK_CONFIG_FILE', 'webhook_config.json')):
+        os.environ[variable] = os.path.join(workdir, filename)
+
+class InProcessClient:
+    """Drives the Flask app directly through its WSGI test client."""
+
+    def __init__(self):
+        from app import app
+        self.app = app
+
+    def post(self, path, **kwargs):
+        with self.app.test_client() as client:
+            if 'files' in kwargs:
+                name, content, mimetype = kwargs.pop('files')['file']
+                kwargs['data'] = {'file': (io.BytesIO(content), name, mimetype)}
+                kwargs['content_type'] = 'multipart/form-data'
+            response = client.post(path, **kwargs)
+            response.get_data()
+            return response.status_code
+
+class HttpClient:
+    """Drives a running server over HTTP."""
+
+    def __init__(self, base_url: str):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.local = threading.local()
+        self.requests = requests
+
+    def post(self, path, **kwargs):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = self.requests.Session()
+        response = session.post(self.base_url + path, timeout=300, **kwargs)
+        return response.status_code
+
+class WebhookSink:
+    """Local HTTP endpoint counting webhook deliveries."""
+
+    def __init__(self):
+        sink = self
+        self.arrivals: List[float] = []
+        self.lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with sink.lock:
+                    sink.arrivals.append(time.monotonic())
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def count(self) -> int:
+        with self.lock:
+            return len(self.arrivals)
+
+class ProcessMonitor:
+    """Samples RSS and thread count of a process while a benchmark runs."""
+
+    def __init__(self, pid: Optional[int] = None, interval: float = 0.05):
+        self.pid = pid or os.getpid()
+        self.interval = interval
+        self.peak_rss_kb = 0
+        self.peak_threads = 0
+        self.stopped = threading.Event()
+
+    def _sample(self):
+        try:
+            with open(f'/proc/{self.pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        self.peak_rss_kb = max(self.peak_rss_kb, int(line.split()[1]))
+                    elif line.startswith('Threads:'):
+                        self.peak_threads = max(self.peak_threads, int(line.split()[1]))
+        except OSError:
+            # No procfs (e.g. macOS): fall back to this process's own counters
+            import resource
+            self.peak_rss_kb = max(self.peak_rss_kb, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024)
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self._sample()
+
+    def results(self) -> Dict:
+        return {'peak_rss_mb': round(self.peak_rss_kb / 1024, 1), 'peak_threads': self.peak_threads}
+
+def invoice_image(index: int) -> bytes:
+    """A small PNG that is unique per request, so the extraction cache never hits."""
+    rng = random.Random(index)
+    image = Image.new('RGB', (320, 240), (255, 255, 255))
+    pixels = image.load()
+    for _ in range(400):
+        pixels[rng.randrange(320), rng.randrange(240)] = (rng.randrange(256), 0, 0)
+    output = io.BytesIO()
+    image.save(output, format='PNG')
+    return output.getvalue()
+
+def run_scenario(name: str, request: Callable[[int], int], total: int, concurrency: int) -> Dict:
+    """Issue total requests at the given concurrency and summarize latency and throughput."""
+    latencies = np.zeros(total)
+    statuses = [0] * total
+
+    def one(index):
+        started = time.perf_counter()
+        try:
+            statuses[index] = request(index)
+        except Exception as e:
+            print(f"Error in {name} request: {e}")
+        latencies[index] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(total)))
+    duration = time.perf_counter() - started
+
+    errors = sum(1 for status in statuses if not 200 <= status < 300)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    result = {
+        'requests': total,
+        'concurrency': concurrency,
+        'errors': errors,
+        'duration_seconds': round(duration, 3),
+        'throughput_rps': round(total / duration, 2),
+        'mean_ms': round(latencies.mean() * 1000, 2),
+        'p50_ms': round(p50 * 1000, 2),
+        'p95_ms': round(p95 * 1000, 2),
+        'p99_ms': round(p99 * 1000, 2)
+    }
+    print(f"{name:<14} {result['throughput_rps']:>9.1f} req/s  p50 {result['p50_ms']:>8.1f} ms  "
+          f"p95 {result['p95_ms']:>8.1f} ms  p99 {result['p99_ms']:>8.1f} ms  errors {errors}")
+    return result
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(previous: Dict, current: Dict):
+    """Print throughput and p95/p99 changes against an earlier results file."""
+    print(f"\nCompared with {previous.get('git_commit')} ({previous.get('timestamp')}):")
+    for name, result in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for metric in ('throughput_rps', 'p95_ms', 'p99_ms'):
+            if before.get(metric):
+                change = (result[metric] - before[metric]) / before[metric] * 100
+                changes.append(f"{metric} {before[metric]} -> {result[metric]} ({change:+.1f}%)")
+        print(f"  {name}: " + ', '.join(changes))
+    for metric in ('peak_rss_mb', 'peak_threads'):
+        print(f"  {metric}: {previous.get('process', {}).get(metric)} -> {current['process'].get(metric)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=(
+        'Load-test the invoice API and record throughput, latency percentiles, peak RSS and threads. '
+        'By default the app runs in-process on the local stand-in model backend with throwaway storage.'
+    ))
+    parser.add_argument('-n', '--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('-c', '--concurrency', type=int, default=16)
+    parser.add_argument('--latency', default='lognormal:0.5,0.5',
+                        help='local backend latency (LOCAL_MODEL_LATENCY format)')
+    parser.add_argument('--webhooks', type=int, default=2, help='webhook endpoints receiving each extraction')
+    parser.add_argument('--url', help='benchmark a running server instead of the in-process app')
+    parser.add_argument('--pid', type=int, help='server process to sample RSS/threads from (with --url)')
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help='results file')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='invoice-bench-')
+    if args.url:
+        client = HttpClient(args.url)
+    else:
+        configure_offline_environment(args, workdir)
+        client = InProcessClient()
+
+    sink = WebhookSink()
+    for i in range(args.webhooks):
+        client.post('/api/webhooks', json={'name': f'benchmark-{i}', 'url': sink.url, 'enabled': True})
+
+    from local_model import generate_invoice
+    sample_invoice = generate_invoice(b'benchmark')
+    images = [invoice_image(i) for i in range(args.requests)]
+
+    scenarios = {}
+    monitor = ProcessMonitor(args.pid if args.url else None)
+    with monitor:
+        extract_started = time.monotonic()
+        scenarios['extract'] = run_scenario(
+            'extract', lambda i: client.post('/api/extract', files={'file': (f'invoice_{i}.png', images[i], 'image/png')}),
+            args.requests, args.concurrency)
+        extract_finished = time.monotonic()
+        scenarios['download_csv'] = run_scenario(
+            'download_csv', lambda i: client.post('/api/download-csv', json=sample_invoice),
+            args.requests, args.concurrency)
+        scenarios['download_json'] = run_scenario(
+            'download_json', lambda i: client.post('/api/download-json', json=sample_invoice),
+            args.requests, args.concurrency)
+
+        # Webhook fan-out: every successful extraction is delivered to every benchmark webhook
+        expected = (args.requests - scenarios['extract']['errors']) * args.webhooks
+        deadline = time.monotonic() + 120
+        while sink.count() < expected and time.monotonic() < deadline:
+            time.sleep(0.05)
+        last_arrival = sink.arrivals[-1] if sink.arrivals else extract_started
+        webhooks = {
+            'webhooks': args.webhooks,
+            'expected_deliveries': expected,
+            'deliveries': sink.count(),
+            'deliveries_per_second': round(sink.count() / max(last_arrival - extract_started, 1e-9), 2),
+            'drain_seconds': round(max(0.0, last_arrival - extract_finished), 3)
+        }
+        print(f"webhook fanout {webhooks['deliveries']}/{expected} deliveries, "
+              f"{webhooks['deliveries_per_second']} /s, drained {webhooks['drain_seconds']} s after extraction")
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': git_commit(),
+        'python': sys.version.split()[0],
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'scenarios': scenarios,
+        'webhooks': webhooks,
+        'process': monitor.results()
+    }
+    print(f"peak RSS {results['process']['peak_rss_mb']} MB, peak threads {results['process']['peak_threads']}")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+if __name__ == '__main__':
+    main()
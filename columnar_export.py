@@ -0,0 +1,155 @@
+import io
+import sys
+import gzip
+import json
+import argparse
+from typing import Dict, Iterable, Iterator, List
+from csv_export import ITEM_FIELDS
+from invoice_numbers import parse_number
+from invoice_store import INVOICE_STORE
+
+# pyarrow is optional; without it exports fall back to gzip-compressed NDJSON
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Line-item fields (from the extraction prompt) that are typed as numbers
+NUMERIC_ITEM_FIELDS = ('quantity', 'rate', 'amount')
+
+# Invoice-level keys repeated on every line-item row, then the item fields
+COLUMNS = [
+    ('invoice_id', 'int64'),
+    ('extracted_at', 'string'),
+    ('invoice_number', 'string'),
+    ('invoice_date', 'string'),
+    ('supplier_name', 'string'),
+    ('supplier_gstin', 'string'),
+    ('item_index', 'int32')
+] + [(field, 'float64' if field in NUMERIC_ITEM_FIELDS else 'string') for field in ITEM_FIELDS]
+
+# Rows per Parquet row group / NDJSON flush
+ROW_GROUP_SIZE = 50000
+
+def default_format() -> str:
+    """Parquet when pyarrow is installed, otherwise NDJSON."""
+    return 'parquet' if pa is not None else 'ndjson'
+
+def _string(value):
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+def item_rows(records: Iterable[Dict]) -> Iterator[Dict]:
+    """Yield one typed row per line item of each stored invoice record."""
+    for record in records:
+        items = record['data'].get('items') or []
+        for index, item in enumerate(items, 1):
+            if not isinstance(item, dict):
+                continue
+            row = {
+                'invoice_id': record['id'],
+                'extracted_at': record['timestamp'],
+                'invoice_number': record['invoice_number'],
+                'invoice_date': record['invoice_date'],
+                'supplier_name': record['supplier_name'],
+                'supplier_gstin': record['supplier_gstin'],
+                'item_index': index
+            }
+            for field in ITEM_FIELDS:
+                value = item.get(field)
+                row[field] = parse_number(value) if field in NUMERIC_ITEM_FIELDS else _string(value)
+            yield row
+
+def arrow_schema():
+    """Arrow schema for the line-item table."""
+    types = {'int64': pa.int64(), 'int32': pa.int32(), 'float64': pa.float64(), 'string': pa.string()}
+    return pa.schema([(name, types[kind]) for name, kind in COLUMNS])
+
+def _batches(rows: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose contents can be taken out as they are produced."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer.extend(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+def stream_parquet(records: Iterable[Dict], row_group_size: int = ROW_GROUP_SIZE) -> Iterator[bytes]:
+    """Stream a zstd-compressed Parquet file of line items, one row group at a time."""
+    if pa is None:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+    schema = arrow_schema()
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        for batch in _batches(item_rows(records), row_group_size):
+            columns = {name: [row[name] for row in batch] for name in schema.names}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def stream_ndjson_gzip(records: Iterable[Dict], flush_rows: int = ROW_GROUP_SIZE) -> Iterator[bytes]:
+    """Stream gzip-compressed newline-delimited JSON of line items."""
+    sink = _DrainableSink()
+    with gzip.GzipFile(fileobj=sink, mode='wb') as compressed:
+        for batch in _batches(item_rows(records), flush_rows):
+            compressed.write(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in batch).encode('utf-8'))
+            yield sink.drain()
+    yield sink.drain()
+
+# Export formats: streaming function, MIME type and file extension
+EXPORT_FORMATS = {
+    'parquet': (stream_parquet, 'application/vnd.apache.parquet', 'parquet'),
+    'ndjson': (stream_ndjson_gzip, 'application/x-ndjson', 'ndjson.gz')
+}
+
+def main():
+    parser = argparse.ArgumentParser(description='Export stored invoice line items for analytics.')
+    parser.add_argument('-o', '--output', required=True, help="output file path ('-' for stdout)")
+    parser.add_argument('-f', '--format', choices=sorted(EXPORT_FORMATS), default=default_format())
+    for name in ('invoice_number', 'gstin', 'company', 'date_from', 'date_to', 'sku'):
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, help=f'filter by {name}')
+    args = parser.parse_args()
+
+    filters = {name: getattr(args, name) for name in
+               ('invoice_number', 'gstin', 'company', 'date_from', 'date_to', 'sku')}
+    stream = EXPORT_FORMATS[args.format][0]
+    output = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        for chunk in stream(INVOICE_STORE.iter_invoices(**filters)):
+            output.write(chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+
+if __name__ == '__main__':
+    main()
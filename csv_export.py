@@ -0,0 +1,149 @@
+import io
+import csv
+import json
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+# Stable column layout, following the JSON structure requested by the extraction prompt
+HEADER_SCHEMA = [
+    ('company_info', ['company_name', 'gstin']),
+    ('billing_info', ['billing_company_name', 'billing_address']),
+    ('shipping_info', ['shipping_company_name', 'shipping_address']),
+    ('invoice_info', ['gst_invoice_number', 'invoice_date', 'due_date', 'sales_person', 'order_number']),
+    ('totals', ['subtotal', 'shipping', 'discount', 'tax', 'total_invoice'])
+]
+ITEM_FIELDS = ['sku_ndc_number', 'description_of_goods', 'size', 'quantity', 'rate', 'amount', 'uqc']
+
+RECORD_COLUMNS = ['invoice_id', 'extracted_at']
+HEADER_COLUMNS = [f"{section}_{field}" for section, fields in HEADER_SCHEMA for field in fields]
+ITEM_COLUMNS = ['item_index'] + [f"item_{field}" for field in ITEM_FIELDS]
+EXTRA_COLUMN = 'extra_fields'
+
+LAYOUT_COLUMNS = {
+    # One row per line item, invoice header repeated on each row
+    'items': RECORD_COLUMNS + HEADER_COLUMNS + ITEM_COLUMNS + [EXTRA_COLUMN],
+    # One row per invoice
+    'invoices': RECORD_COLUMNS + HEADER_COLUMNS + ['item_count', EXTRA_COLUMN]
+}
+
+# Rows buffered per chunk yielded to the client
+CHUNK_ROWS = 500
+
+# Compiled plans kept per record shape (keys and nesting); model output can invent keys and
+# reorder them, so only the most recently used shapes are kept
+PLAN_CACHE_SIZE = 256
+
+def _cell(value):
+    """Render a value for CSV (nested structures as JSON)."""
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+def header_signature(data: Dict) -> Tuple:
+    """Describe a record's header shape: its sections and, for dict sections, their keys."""
+    return tuple(
+        (key, tuple(value) if isinstance(value, dict) else None)
+        for key, value in data.items() if key != 'items'
+    )
+
+def compile_header_plan(signature: Tuple) -> Callable[[Dict], Tuple[List, Dict]]:
+    """Build a function mapping records of this shape to (header cells, extra fields).
+
+    All key lookups are resolved once here instead of walking each record recursively.
+    """
+    present = {key: set(fields) if fields is not None else None for key, fields in signature}
+    getters = []
+    for section, fields in HEADER_SCHEMA:
+        for field in fields:
+            if present.get(section) and field in present[section]:
+                getters.append(lambda d, s=section, f=field: _cell(d[s][f]))
+            else:
+                getters.append(lambda d: '')
+
+    known = {section: set(fields) for section, fields in HEADER_SCHEMA}
+    extra_paths = []
+    for key, fields in signature:
+        if fields is None:
+            # Unknown sections, and known ones that are not objects (e.g. a bare string totals)
+            extra_paths.append((key, None))
+        else:
+            extra_paths.extend((key, field) for field in fields if field not in known.get(key, ()))
+
+    def plan(data):
+        cells = [getter(data) for getter in getters]
+        extras = {}
+        for key, field in extra_paths:
+            if field is None:
+                extras[key] = data[key]
+            else:
+                extras[f"{key}_{field}"] = data[key][field]
+        return cells, extras
+
+    return plan
+
+def compile_item_plan(signature: Tuple) -> Callable[[Dict], Tuple[List, Dict]]:
+    """Build a function mapping line items with these keys to (item cells, extra fields)."""
+    present = set(signature)
+    getters = [
+        (lambda item, f=field: _cell(item[f])) if field in present else (lambda item: '')
+        for field in ITEM_FIELDS
+    ]
+    extra_fields = [field for field in signature if field not in ITEM_FIELDS]
+
+    def plan(item):
+        cells = [getter(item) for getter in getters]
+        extras = {f"item_{field}": item[field] for field in extra_fields}
+        return cells, extras
+
+    return plan
+
+_cached_header_plan = lru_cache(maxsize=PLAN_CACHE_SIZE)(compile_header_plan)
+_cached_item_plan = lru_cache(maxsize=PLAN_CACHE_SIZE)(compile_item_plan)
+
+def _header_plan(data):
+    return _cached_header_plan(header_signature(data))
+
+def _item_plan(item):
+    return _cached_item_plan(tuple(item))
+
+def invoice_rows(record: Dict, layout: str = 'items') -> Iterator[List]:
+    """Yield the CSV rows for one stored invoice record ({'id', 'timestamp', 'data'})."""
+    data = record['data']
+    header, header_extras = _header_plan(data)(data)
+    prefix = [record.get('id', ''), record.get('timestamp', '')] + header
+    items = [item for item in (data.get('items') or []) if isinstance(item, dict)]
+
+    if layout == 'invoices':
+        yield prefix + [len(items), _cell(header_extras or None)]
+        return
+
+    if not items:
+        yield prefix + [''] * len(ITEM_COLUMNS) + [_cell(header_extras or None)]
+        return
+
+    for index, item in enumerate(items, 1):
+        cells, item_extras = _item_plan(item)(item)
+        extras = {**header_extras, **item_extras} if item_extras else header_extras
+        yield prefix + [index] + cells + [_cell(extras or None)]
+
+def stream_csv(records: Iterable[Dict], layout: str = 'items') -> Iterator[str]:
+    """Stream CSV text for any number of invoice records in constant memory."""
+    if layout not in LAYOUT_COLUMNS:
+        raise ValueError(f"Unknown CSV layout '{layout}'")
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(LAYOUT_COLUMNS[layout])
+    pending = 0
+    for record in records:
+        for row in invoice_rows(record, layout):
+            writer.writerow(row)
+            pending += 1
+        if pending >= CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
@@ -0,0 +1,169 @@
+import os
+import io
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+from PIL import Image, ImageSequence
+from image_optimizer import flatten_transparency
+from invoice_extractor_server import extract_fields_from_image, extract_fields_from_image_async, stream_fields_from_image
+from metrics import stage_timer, with_current_timings
+
+# PyMuPDF is optional; PDFs are rejected with a clear error when it is not installed
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+# Page rendering and concurrency configuration
+PDF_RENDER_DPI = int(os.getenv('PDF_RENDER_DPI', 150))
+MAX_DOCUMENT_PAGES = int(os.getenv('MAX_DOCUMENT_PAGES', 50))
+PAGE_CONCURRENCY = int(os.getenv('PAGE_CONCURRENCY', 10))
+
+# Separate from the batch pool so batch tasks never wait on their own page tasks
+PAGE_EXECUTOR = ThreadPoolExecutor(max_workers=PAGE_CONCURRENCY, thread_name_prefix='page-extract')
+
+# Allowed invoice file types (PDFs and multi-frame TIFFs are split into pages)
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tif', 'tiff', 'pdf'}
+MULTI_PAGE_EXTENSIONS = {'pdf', 'tif', 'tiff'}
+
+def get_file_extension(filename):
+    """Return the lower-cased extension of an uploaded filename."""
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+def split_pdf_pages(data: bytes) -> List[bytes]:
+    """Render each PDF page to a PNG image."""
+    if fitz is None:
+        raise RuntimeError("PDF support requires PyMuPDF (pip install pymupdf)")
+    pages = []
+    with fitz.open(stream=data, filetype='pdf') as document:
+        if document.page_count > MAX_DOCUMENT_PAGES:
+            raise ValueError(f"Document has {document.page_count} pages; the limit is {MAX_DOCUMENT_PAGES}")
+        for page in document:
+            pixmap = page.get_pixmap(dpi=PDF_RENDER_DPI)
+            pages.append(pixmap.tobytes('png'))
+    return pages
+
+def split_tiff_pages(data: bytes) -> List[bytes]:
+    """Split a multi-frame TIFF into one PNG image per frame."""
+    image = Image.open(io.BytesIO(data))
+    frame_count = getattr(image, 'n_frames', 1)
+    if frame_count <= 1:
+        return [data]
+    if frame_count > MAX_DOCUMENT_PAGES:
+        raise ValueError(f"Document has {frame_count} pages; the limit is {MAX_DOCUMENT_PAGES}")
+    pages = []
+    for frame in ImageSequence.Iterator(image):
+        output = io.BytesIO()
+        flatten_transparency(frame).convert('RGB').save(output, format='PNG')
+        pages.append(output.getvalue())
+    return pages
+
+def split_document_pages(data: bytes, file_extension: str) -> List[bytes]:
+    """Return one image per page for PDFs and multi-frame TIFFs, or the upload itself."""
+    if file_extension == 'pdf':
+        return split_pdf_pages(data)
+    if file_extension in ('tif', 'tiff'):
+        return split_tiff_pages(data)
+    return [data]
+
+def _has_totals(totals):
+    """Check whether a page's totals contain any non-zero value."""
+    for value in (totals or {}).values():
+        try:
+            if float(str(value).replace(',', '')) != 0:
+                return True
+        except ValueError:
+            continue
+    return False
+
+def merge_page_results(pages: List[Dict]) -> Dict:
+    """Merge per-page extractions into one invoice.
+
+    The header sections come from page 1, items are concatenated in page order and
+    totals come from the last page that shows any.
+    """
+    merged = {k: v for k, v in pages[0].items() if k not in ('items', 'totals')}
+    merged['items'] = []
+    for page in pages:
+        merged['items'].extend(page.get('items') or [])
+
+    totals = None
+    for page in reversed(pages):
+        if _has_totals(page.get('totals')):
+            totals = page['totals']
+            break
+    if totals is None:
+        totals = pages[-1].get('totals')
+    if totals is not None:
+        merged['totals'] = totals
+    return merged
+
+def extract_document(data: bytes, file_extension: str) -> Tuple[Dict, str]:
+    """Extract an invoice from an image or a multi-page document.
+
+    Pages are extracted concurrently, so a multi-page invoice takes roughly as long
+    as its slowest page.
+    """
+    try:
+        with stage_timer('split_pages'):
+            pages = split_document_pages(data, file_extension)
+    except Exception as e:
+        return {}, f"Error reading document pages: {str(e)}"
+
+    if len(pages) == 1:
+        return extract_fields_from_image(pages[0])
+
+    return _extract_pages(pages)
+
+async def extract_document_async(data: bytes, file_extension: str) -> Tuple[Dict, str]:
+    """Async counterpart of extract_document; pages are extracted as concurrent coroutines."""
+    try:
+        with stage_timer('split_pages'):
+            pages = await asyncio.to_thread(split_document_pages, data, file_extension)
+    except Exception as e:
+        return {}, f"Error reading document pages: {str(e)}"
+
+    results = await asyncio.gather(*(extract_fields_from_image_async(page) for page in pages))
+    if len(pages) == 1:
+        return results[0]
+    return _merge_results(results)
+
+def stream_document(data: bytes, file_extension: str) -> Iterator[Tuple]:
+    """Streaming counterpart of extract_document (same events as stream_fields_from_image).
+
+    Single images stream as the model generates; multi-page documents are extracted
+    page-parallel and their merged result is emitted once all pages are done.
+    """
+    try:
+        pages = split_document_pages(data, file_extension)
+    except Exception as e:
+        yield ('done', {}, f"Error reading document pages: {str(e)}")
+        return
+
+    if len(pages) == 1:
+        yield from stream_fields_from_image(pages[0])
+        return
+
+    result, error = _extract_pages(pages)
+    for key, value in result.items():
+        if key == 'items':
+            for index, item in enumerate(value):
+                yield ('item', index, item)
+        else:
+            yield ('field', key, value)
+    yield ('done', result, error)
+
+def _extract_pages(pages: List[bytes]) -> Tuple[Dict, str]:
+    """Extract pages concurrently and merge them into one invoice."""
+    # Page stages still count towards the request's Server-Timing breakdown
+    results = list(PAGE_EXECUTOR.map(with_current_timings(extract_fields_from_image), pages))
+    return _merge_results(results)
+
+def _merge_results(results: List[Tuple[Dict, str]]) -> Tuple[Dict, str]:
+    """Merge per-page (data, error) results, failing the document if any page failed."""
+    failed = [f"page {i + 1}: {error or 'no data extracted'}"
+              for i, (page_data, error) in enumerate(results) if error or not page_data]
+    if failed:
+        return {}, "Error processing document (" + "; ".join(failed) + ")"
+
+    return merge_page_results([page_data for page_data, _ in results]), ""
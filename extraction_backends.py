@@ -0,0 +1,45 @@
+import os
+from typing import Callable, Dict, List, Optional, Protocol
+from local_model import LocalModel
+
+# Force every cascade tier onto one backend (e.g. "local" for load tests); unset picks per model name
+EXTRACTION_BACKEND = os.getenv('EXTRACTION_BACKEND', '').strip().lower() or None
+
+class ExtractionBackend(Protocol):
+    """What the extractor needs from a model backend (the Gemini SDK's GenerativeModel shape).
+
+    generate_content() takes [prompt, {"mime_type", "data"}] and returns a response with
+    .text and .usage_metadata; with stream=True the response iterates over chunks that
+    each have .text. generate_content_async() is the awaitable, non-streaming form used by
+    the asyncio service.
+    """
+
+    def generate_content(self, contents: List, stream: bool = False, **kwargs):
+        ...
+
+    async def generate_content_async(self, contents: List, **kwargs):
+        ...
+
+# Backend factories by name; each takes the tier's model name and returns a backend or None
+BACKENDS: Dict[str, Callable[[str], Optional[ExtractionBackend]]] = {}
+
+def register_backend(name: str, factory: Callable[[str], Optional[ExtractionBackend]]):
+    """Make a backend available to cascade tiers and EXTRACTION_BACKEND."""
+    BACKENDS[name] = factory
+
+def backend_name(model_name: str) -> str:
+    """Backend serving a model: EXTRACTION_BACKEND if set, local for local* models, else gemini."""
+    if EXTRACTION_BACKEND:
+        return EXTRACTION_BACKEND
+    return 'local' if model_name.startswith('local') else 'gemini'
+
+def create_backend(model_name: str) -> Optional[ExtractionBackend]:
+    """Create the backend for one cascade tier's model."""
+    name = backend_name(model_name)
+    factory = BACKENDS.get(name)
+    if factory is None:
+        print(f"Error creating model backend: unknown backend '{name}'")
+        return None
+    return factory(model_name)
+
+register_backend('local', LocalModel)
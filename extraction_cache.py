@@ -0,0 +1,224 @@
+import os
+import copy
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Cache configuration (override through environment variables)
+CACHE_DB_PATH = os.getenv('EXTRACTION_CACHE_DB', 'extraction_cache.db')
+CACHE_MEMORY_ENTRIES = int(os.getenv('EXTRACTION_CACHE_MEMORY_ENTRIES', 256))
+CACHE_MAX_DISK_BYTES = int(os.getenv('EXTRACTION_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+CACHE_MAX_AGE_SECONDS = int(os.getenv('EXTRACTION_CACHE_MAX_AGE', 30 * 24 * 3600))
+
+def make_cache_key(image_data: bytes, version: str) -> str:
+    """Build a content-addressed key from the image bytes and prompt/model version."""
+    digest = hashlib.sha256()
+    digest.update(version.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(image_data)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """Two-tier (memory LRU + SQLite) cache for extraction results.
+
+    Every server worker process has its own memory tier in front of the shared SQLite
+    file. clear() bumps a generation counter stored in the file, and each worker drops
+    its memory tier when it sees the counter change, so a clear reaches all of them.
+    """
+
+    def __init__(self, db_path=CACHE_DB_PATH, memory_entries=CACHE_MEMORY_ENTRIES,
+                 max_disk_bytes=CACHE_MAX_DISK_BYTES, max_age_seconds=CACHE_MAX_AGE_SECONDS):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age_seconds = max_age_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._generation = None
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self):
+        """Open the SQLite tier on first use."""
+        if self._conn is None:
+            try:
+                self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+                # WAL lets server worker processes read the disk tier while another writes
+                self._conn.execute('PRAGMA journal_mode=WAL')
+                self._conn.execute(
+                    'CREATE TABLE IF NOT EXISTS extraction_cache ('
+                    ' key TEXT PRIMARY KEY,'
+                    ' data TEXT NOT NULL,'
+                    ' size INTEGER NOT NULL,'
+                    ' created_at REAL NOT NULL,'
+                    ' accessed_at REAL NOT NULL)'
+                )
+                self._conn.execute(
+                    'CREATE INDEX IF NOT EXISTS idx_extraction_cache_accessed'
+                    ' ON extraction_cache (accessed_at)'
+                )
+                self._conn.execute(
+                    'CREATE TABLE IF NOT EXISTS extraction_cache_meta ('
+                    ' name TEXT PRIMARY KEY,'
+                    ' value INTEGER NOT NULL)'
+                )
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO extraction_cache_meta (name, value) VALUES ('generation', 0)"
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error opening extraction cache: {e}")
+                self._conn = None
+        return self._conn
+
+    def _sync_generation(self, conn):
+        """Drop the memory tier if any process has cleared the cache since it was filled."""
+        try:
+            generation = conn.execute(
+                "SELECT value FROM extraction_cache_meta WHERE name = 'generation'"
+            ).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error reading extraction cache generation: {e}")
+            return
+        if generation != self._generation:
+            self._memory.clear()
+            self._generation = generation
+
+    def _remember(self, key, data, created_at):
+        """Insert into the memory tier, evicting the least recently used entry."""
+        self._memory[key] = (data, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached result for key, or None on a miss."""
+        with self._lock:
+            now = time.time()
+            conn = self._connect()
+            if conn is not None:
+                self._sync_generation(conn)
+
+            if key in self._memory:
+                data, created_at = self._memory[key]
+                if now - created_at <= self.max_age_seconds:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return copy.deepcopy(data)
+                del self._memory[key]
+
+            if conn is not None:
+                try:
+                    row = conn.execute(
+                        'SELECT data, created_at FROM extraction_cache WHERE key = ?', (key,)
+                    ).fetchone()
+                    if row and now - row[1] <= self.max_age_seconds:
+                        conn.execute(
+                            'UPDATE extraction_cache SET accessed_at = ? WHERE key = ?', (now, key)
+                        )
+                        conn.commit()
+                        data = json.loads(row[0])
+                        self._remember(key, data, row[1])
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return copy.deepcopy(data)
+                except (sqlite3.Error, ValueError) as e:
+                    print(f"Error reading extraction cache: {e}")
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, data: Dict):
+        """Store a result in both tiers and enforce age and size limits."""
+        with self._lock:
+            now = time.time()
+            conn = self._connect()
+            if conn is not None:
+                self._sync_generation(conn)
+            self._remember(key, copy.deepcopy(data), now)
+            if conn is None:
+                return
+            payload = json.dumps(data, ensure_ascii=False)
+            try:
+                conn.execute(
+                    'INSERT OR REPLACE INTO extraction_cache (key, data, size, created_at, accessed_at)'
+                    ' VALUES (?, ?, ?, ?, ?)',
+                    (key, payload, len(payload), now, now)
+                )
+                self._evict(conn, now)
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing extraction cache: {e}")
+
+    def _evict(self, conn, now):
+        """Drop expired rows, then least recently used rows until under the size cap."""
+        cursor = conn.execute(
+            'DELETE FROM extraction_cache WHERE created_at < ?', (now - self.max_age_seconds,)
+        )
+        self.evictions += max(cursor.rowcount, 0)
+
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM extraction_cache').fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        for key, size in conn.execute(
+            'SELECT key, size FROM extraction_cache ORDER BY accessed_at ASC'
+        ).fetchall():
+            if total <= self.max_disk_bytes:
+                break
+            conn.execute('DELETE FROM extraction_cache WHERE key = ?', (key,))
+            self._memory.pop(key, None)
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        """Remove every cached result from the disk tier and every process's memory tier."""
+        with self._lock:
+            self._memory.clear()
+            conn = self._connect()
+            if conn is not None:
+                try:
+                    conn.execute('DELETE FROM extraction_cache')
+                    conn.execute(
+                        "UPDATE extraction_cache_meta SET value = value + 1 WHERE name = 'generation'"
+                    )
+                    conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Error clearing extraction cache: {e}")
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and tier sizes."""
+        with self._lock:
+            disk_entries = 0
+            disk_bytes = 0
+            conn = self._connect()
+            if conn is not None:
+                try:
+                    disk_entries, disk_bytes = conn.execute(
+                        'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extraction_cache'
+                    ).fetchone()
+                except sqlite3.Error:
+                    pass
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'memory_entries': len(self._memory),
+                'disk_entries': disk_entries,
+                'disk_bytes': disk_bytes
+            }
+
+# Shared process-wide cache instance
+EXTRACTION_CACHE = ExtractionCache()
@@ -0,0 +1,20 @@
+"""Model client, prompt profiles, invoice schema and response parsing shared by the desktop and server extractors.
+
+Nothing heavy happens on import: the Gemini SDK is imported and configured the first
+time a model is requested (see client.gemini_model).
+"""
+from dotenv import load_dotenv
+
+# Settings are read from the environment, so load .env before anything reads them
+load_dotenv()
+
+from extraction_core.client import configure_gemini, gemini_initialized, gemini_model
+from extraction_core.parsing import parse_model_response, parse_profile_response, parse_structured_response
+from extraction_core.prompts import PROMPT_PROFILES, PromptProfile, generation_options, get_profile
+from extraction_core.schema import Invoice
+
+__all__ = [
+    'configure_gemini', 'gemini_initialized', 'gemini_model', 'parse_model_response',
+    'parse_profile_response', 'parse_structured_response', 'PROMPT_PROFILES', 'PromptProfile',
+    'generation_options', 'get_profile', 'Invoice'
+]
@@ -0,0 +1,42 @@
+import os
+import threading
+from typing import Dict, Optional
+
+# The Gemini SDK (and its gRPC stack) is only imported when the first model is needed,
+# so processes that never call a model - or have not yet - start without paying for it
+_lock = threading.Lock()
+_genai = None
+_configured = False
+_models: Dict[str, object] = {}
+
+def configure_gemini():
+    """Import and configure the Gemini SDK on first use; returns the module, or None without an API key."""
+    global _genai, _configured
+    with _lock:
+        if not _configured:
+            _configured = True
+            try:
+                api_key = os.getenv('GOOGLE_API_KEY')
+                if not api_key:
+                    raise ValueError("Please set the GOOGLE_API_KEY in the .env file")
+                import google.generativeai as genai
+                genai.configure(api_key=api_key)
+                _genai = genai
+            except Exception as e:
+                print(f"Error initializing Gemini API: {e}")
+        return _genai
+
+def gemini_model(model_name: str) -> Optional[object]:
+    """Shared GenerativeModel for a model name, or None if the API is not configured."""
+    genai = configure_gemini()
+    if genai is None:
+        return None
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            model = _models[model_name] = genai.GenerativeModel(model_name)
+        return model
+
+def gemini_initialized() -> bool:
+    """Whether the SDK has been imported and configured in this process."""
+    return _genai is not None
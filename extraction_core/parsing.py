@@ -0,0 +1,38 @@
+import re
+import json
+from typing import Dict, Tuple
+from extraction_core.prompts import PromptProfile
+from metrics import PARSE_FALLBACKS
+
+def parse_model_response(text: str) -> Tuple[Dict[str, str], str]:
+    """Parse the model's text response into invoice data."""
+    try:
+        # Try to parse the response as JSON
+        result = json.loads(text)
+        return {k: v for k, v in result.items() if v is not None}, ""
+    except json.JSONDecodeError:
+        # If direct JSON parsing fails, try to extract JSON from the response
+        json_match = re.search(r'\{.*\}', text, re.DOTALL)
+        if json_match:
+            PARSE_FALLBACKS.inc('recovered')
+            result = json.loads(json_match.group(0))
+            return {k: v for k, v in result.items() if v is not None}, ""
+        else:
+            PARSE_FALLBACKS.inc('failed')
+            return {}, "Could not parse the response as JSON"
+
+def parse_structured_response(text: str) -> Tuple[Dict[str, str], str]:
+    """Parse a structured-output response, which must be exactly one JSON object (no fallback)."""
+    try:
+        result = json.loads(text)
+    except json.JSONDecodeError as e:
+        return {}, f"Model returned invalid JSON: {e}"
+    if not isinstance(result, dict):
+        return {}, "Model returned JSON that is not an object"
+    return {k: v for k, v in result.items() if v is not None}, ""
+
+def parse_profile_response(profile: PromptProfile, text: str) -> Tuple[Dict[str, str], str]:
+    """Parse a response with the parser matching how the profile asked for its output."""
+    if profile.response_schema is not None:
+        return parse_structured_response(text)
+    return parse_model_response(text)
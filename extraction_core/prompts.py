@@ -0,0 +1,225 @@
+from typing import Dict, NamedTuple, Optional
+from extraction_core.schema import Invoice
+
+class PromptProfile(NamedTuple):
+    """A prompt and the output schema it asks for.
+
+    version changes whenever the prompt text or schema does, so cached results from an
+    older prompt are never served for a newer one. Profiles with a response_schema use
+    structured output: the schema is sent with the request instead of being spelled out
+    in the prompt, and the model is constrained to return JSON matching it.
+    """
+    name: str
+    schema: str
+    version: str
+    text: str
+    response_schema: Optional[type] = None
+
+# Desktop schema: detailed company/billing/shipping addresses, tax and additional info
+DESKTOP_EXTRACTION_PROMPT = """Extract all data from this pharmacy invoice and return it in a structured JSON format. 
+        
+        CRITICAL INSTRUCTIONS:
+        1. For each item, you MUST extract the NDC (National Drug Code) or SKU (in general sku us written and not ndc but in some cases we do have ndc ):
+           - Look for numbers in these formats: 12345-678-90, 1234567890, 12345678901, 1234-5678-90
+           - Common positions:Always have a new column in front of product name or description (it is not found in description it has different column only and each has different sku number)
+           - If there is product then there must be sku number since every product has unique sku number
+           - If not found, generate a unique 10-11 digit code starting with '999'
+           
+        2. For product descriptions:
+           - Keep the full description including strength and form (e.g., "Lofena 25MG TABS (DICLOFENAC 25MG)")
+           - Include both brand and generic names when present
+           
+        3. For each item, you MUST include these fields:
+           - sku_ndc_number: The NDC/SKU (MANDATORY, extract from description if needed)
+           - description_of_goods: Full product description
+           - quantity: As a number
+           - rate: Price per unit as number
+           - amount: Total amount as number
+           - uqc: Unit of measure (CT, EA, BTL, etc.)
+           
+           
+        EXAMPLE ITEM:
+        {
+          "sku_ndc_number": "15370018060",  // Or generated code if not found
+          "description_of_goods": "Lofena 25MG TABS (DICLOFENAC 25MG)",
+          "quantity": 24,
+          "rate": 365,
+          "amount": 8760,
+          "uqc": "CT"
+        }
+        
+        For invoices with multiple items, create an array of items with all their details.
+        
+        Return the response in this exact JSON structure:
+        {
+          "company_info": {
+            "company_name": "string",
+            "company_address": "string",
+            "city": "string",
+            "state": "string",
+            "pincode": "string",
+            "gstin": "string",
+            "email": "string",
+            "phone": "string"
+          },
+          "invoice_info": {
+            "invoice_number": "string",
+            "issue_date": "string",
+            "due_date": "string",
+            "payment_terms": "string",
+            "sales_person": "string",
+            "order_number": "string"
+          },
+          "billing_info": {
+            "bill_to_name": "string",
+            "bill_to_address": "string",
+            "bill_to_city": "string",
+            "bill_to_state": "string",
+            "bill_to_pincode": "string",
+            "bill_to_gstin": "string"
+          },
+          "shipping_info": {
+            "ship_to_name": "string",
+            "ship_to_address": "string",
+            "ship_to_city": "string",
+            "ship_to_state": "string",
+            "ship_to_pincode": "string"
+          },
+          "items": [
+            {
+              "sku_ndc_number": "string (10-11 digit NDC number, e.g., 12345-678-90 or 12345678901. Extract from product description if not explicitly listed) It is always mentioned in general case since every product has unique sku",
+              "description_of_goods": "string (full product description including brand and generic names, e.g., 'Lofena 25MG TABS (DICLOFENAC 25MG)')",
+              "quantity": "number (quantity as a number, not string)",
+              "rate": "number (price per unit as number, not string)",
+              "amount": "number (total for this line item as number, not string)",
+              "uqc": "string (unit of measure, e.g., 'CT' for count, 'BOX', 'BTL', 'EA')",
+              "expiry_date": "string (MM/YYYY or DD/MM/YYYY if available, extract from description if needed)"
+            }
+          ],
+          "totals": {
+            "subtotal": "number (sum of all line items before tax and discounts)",
+            "shipping": "number (shipping/handling charges if any)",
+            "discount": "number (any discounts applied)",
+            "tax": "number (total tax amount)",
+            "total_invoice": "number (final total amount to pay)"
+          },
+          "tax_info": {
+            "cgst": "number (if applicable)",
+            "sgst": "number (if applicable)",
+            "igst": "number (if applicable)"
+          },
+          "additional_info": {
+            "notes": "string",
+            "terms_and_conditions": "string"
+          }
+        }
+        
+        IMPORTANT INSTRUCTIONS:
+        1. If any field is not present or not applicable, set it to null
+        2. For items array, include ALL items found on the invoice with their complete details
+        3. Make sure all numerical values are properly formatted as numbers, not strings
+        4. Only extract data that is actually present on the invoice
+        5. Do not make up or assume any values
+        6. For SKU (NDC Number), ensure to extract the NDC number if available
+        7. For product names, include both brand and generic names if available"""
+
+# Server schema: the fields the web app, invoice store and exports use
+EXTRACTION_PROMPT = """Extract data from this pharmacy invoice and return it in a structured JSON format.
+        
+        CRITICAL INSTRUCTIONS:
+        1. For each item, you MUST extract the NDC (National Drug Code) or SKU:
+           - Look for numbers in these formats: 12345-678-90, 1234567890, 12345678901, 1234-5678-90
+           - Look in a separate column specifically for SKU/NDC/HSN code
+           - If SKU/NDC is not found, use "NA" (do not generate or make up codes)
+           - Never extract SKU from product description or other fields
+        
+        2. Return the response in this exact JSON structure:
+        {
+          "company_info": {
+            "company_name": "string"
+          },
+          "billing_info": {
+            "billing_company_name": "string",
+            "billing_address": "string"
+          },
+          "shipping_info": {
+            "shipping_company_name": "string",
+            "shipping_address": "string"
+          },
+          "invoice_info": {
+            "gst_invoice_number": "string",
+            "invoice_date": "string",
+            "due_date": "string",
+            "sales_person": "string",
+            "order_number": "string"
+          },
+          "items": [
+            {
+              "sku_ndc_number": "string (or 'NA' if not found)",
+              "description_of_goods": "string (product name/description)",
+              "size": "string (or 'NA' if not found)",
+              "quantity": "number (0 if not found)",
+              "rate": "number (0 if not found)",
+              "amount": "number (0 if not found)",
+              "uqc": "string (e.g., 'CT', 'BOX', 'BTL')"
+            }
+          ],
+          "totals": {
+            "subtotal": "number (0 if not found, sum of all item amounts if not explicitly provided)",
+            "shipping": "number (0 if not found)",
+            "discount": "number (0 if not found)",
+            "tax": "number (0 if not found)",
+            "total_invoice": "number (0 if not found)"
+          }
+        }
+        
+        IMPORTANT RULES:
+        1. For missing text fields, use "NA"
+        2. For missing numeric fields, use 0
+        3. SKU/NDC must only come from a dedicated column, not from descriptions
+        4. Never make up or hallucinate data - only extract what's visible
+        5. For totals, only include values that are explicitly shown in the invoice
+        6. Do not calculate any values - only extract what's visible
+        7. If subtotal is not shown, leave it as 0
+        8. If discount is not shown, leave it as 0
+        9. If shipping is not shown, leave it as 0
+       10. If tax is not shown, leave it as 0
+       11. For items, include ALL products exactly as listed
+        """
+
+COMPACT_EXTRACTION_PROMPT = """Extract this pharmacy invoice as JSON with exactly these keys:
+        company_info {company_name}; billing_info {billing_company_name, billing_address};
+        shipping_info {shipping_company_name, shipping_address};
+        invoice_info {gst_invoice_number, invoice_date, due_date, sales_person, order_number};
+        items [{sku_ndc_number, description_of_goods, size, quantity, rate, amount, uqc}];
+        totals {subtotal, shipping, discount, tax, total_invoice}.
+        Include every line item. Use "NA" for missing text and 0 for missing numbers. Take SKU/NDC only
+        from a dedicated SKU/NDC/HSN column. Copy values exactly as shown; do not calculate anything.
+        """
+
+# Structured output: the JSON layout comes from the response schema, so only the rules remain
+STRUCTURED_EXTRACTION_PROMPT = """Extract this pharmacy invoice. Include every line item exactly as listed.
+        Use "NA" for missing text and 0 for missing numbers. Take SKU/NDC only from a dedicated SKU/NDC/HSN
+        column, never from descriptions, and never make one up. Copy values exactly as shown; do not
+        calculate anything, and leave totals that are not shown at 0.
+        """
+
+PROMPT_PROFILES: Dict[str, PromptProfile] = {
+    'desktop': PromptProfile('desktop', 'desktop', 'desktop-v1', DESKTOP_EXTRACTION_PROMPT),
+    'full': PromptProfile('full', 'server', 'server-v1', EXTRACTION_PROMPT),
+    'compact': PromptProfile('compact', 'server', 'server-compact-v1', COMPACT_EXTRACTION_PROMPT),
+    'structured': PromptProfile('structured', 'server', 'server-structured-v1', STRUCTURED_EXTRACTION_PROMPT, Invoice)
+}
+
+def generation_options(profile: PromptProfile) -> Dict:
+    """Keyword arguments for generate_content that a profile needs (structured output settings)."""
+    if profile.response_schema is None:
+        return {}
+    return {'generation_config': {
+        'response_mime_type': 'application/json',
+        'response_schema': profile.response_schema
+    }}
+
+def get_profile(name: str) -> PromptProfile:
+    """Prompt profile by name; unknown names fall back to the full server prompt."""
+    return PROMPT_PROFILES.get(name, PROMPT_PROFILES['full'])
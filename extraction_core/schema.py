@@ -0,0 +1,49 @@
+from typing import List
+
+from typing_extensions import TypedDict
+
+# The server invoice schema, defined once. Passed to the model as a response schema in
+# structured-output mode; the Gemini SDK converts these TypedDicts to its Schema type.
+# typing_extensions.TypedDict because the SDK's pydantic rejects typing.TypedDict before 3.12.
+
+class CompanyInfo(TypedDict):
+    company_name: str
+
+class BillingInfo(TypedDict):
+    billing_company_name: str
+    billing_address: str
+
+class ShippingInfo(TypedDict):
+    shipping_company_name: str
+    shipping_address: str
+
+class InvoiceInfo(TypedDict):
+    gst_invoice_number: str
+    invoice_date: str
+    due_date: str
+    sales_person: str
+    order_number: str
+
+class LineItem(TypedDict):
+    sku_ndc_number: str
+    description_of_goods: str
+    size: str
+    quantity: float
+    rate: float
+    amount: float
+    uqc: str
+
+class Totals(TypedDict):
+    subtotal: float
+    shipping: float
+    discount: float
+    tax: float
+    total_invoice: float
+
+class Invoice(TypedDict):
+    company_info: CompanyInfo
+    billing_info: BillingInfo
+    shipping_info: ShippingInfo
+    invoice_info: InvoiceInfo
+    items: List[LineItem]
+    totals: Totals
@@ -0,0 +1,40 @@
+from invoice_store import INVOICE_STORE
+from ndc_catalog import NDC_CATALOG
+from product_matcher import PRODUCT_MATCHER
+from webhook_log_store import WEBHOOK_LOGS
+from metrics import WEBHOOK_DELIVERIES, stage_timer
+
+# What happens to an extraction after the model call, shared by app.py, asgi_app.py and the
+# job workers so the enrichment, storage and webhook metrics cannot drift apart between them.
+
+def record_webhook_log(log_entry):
+    """Store a webhook log entry (shared by all worker processes; keeps only the last 100 entries)."""
+    # Demo webhook entries are logged here too but are not deliveries
+    if 'status' in log_entry:
+        if log_entry['status'] == 'success':
+            WEBHOOK_DELIVERIES.inc('delivered')
+        else:
+            WEBHOOK_DELIVERIES.inc('retried' if 'next_attempt_at' in log_entry else 'dead')
+    WEBHOOK_LOGS.append(log_entry)
+
+def publish_extraction(extracted_data, webhook_config, webhook_batcher):
+    """Enrich the extracted invoice, store it and send it to the enabled webhooks (blocking).
+
+    webhook_config is the app's WebhookConfigStore and webhook_batcher its WebhookBatcher.
+    """
+    with stage_timer('enrich'):
+        # Canonical NDCs and catalog fields for line items (no model calls)
+        NDC_CATALOG.enrich(extracted_data)
+        # Formulary matches by description for items without a catalog NDC
+        PRODUCT_MATCHER.enrich(extracted_data)
+
+    # Keep every extraction in the invoice store
+    with stage_timer('store'):
+        INVOICE_STORE.save(extracted_data)
+
+    # Send data to configured webhooks (batched and compressed per webhook options)
+    with stage_timer('webhook_config'):
+        webhooks = webhook_config.enabled_webhooks()
+    with stage_timer('webhook_dispatch'):
+        for webhook in webhooks:
+            webhook_batcher.add(webhook, extracted_data)
@@ -0,0 +1,65 @@
+import os
+import time
+import argparse
+import multiprocessing
+from job_queue import JOB_QUEUE, worker_id
+
+# Seconds to wait before polling an empty queue again
+POLL_INTERVAL = float(os.getenv('WORKER_POLL_INTERVAL', 1.0))
+
+def process_job(job):
+    """Run extraction for one claimed job and record the outcome."""
+    from app import get_file_extension, publish_extraction
+    from document_pages import extract_document
+
+    extracted_data, error_message = extract_document(job['image'], get_file_extension(job['filename']))
+
+    if error_message:
+        JOB_QUEUE.fail(job['id'], error_message)
+    elif not extracted_data:
+        JOB_QUEUE.fail(job['id'], 'No data could be extracted from the invoice')
+    else:
+        publish_extraction(extracted_data)
+        JOB_QUEUE.complete(job['id'], extracted_data)
+
+def run_worker(once=False):
+    """Claim and process jobs until interrupted (or the queue is empty with once=True)."""
+    name = worker_id()
+    print(f"Extraction worker {name} started")
+    while True:
+        job = JOB_QUEUE.claim(name)
+        if job is None:
+            if once:
+                return
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        print(f"Worker {name} processing job {job['id']} ({job['filename']}, attempt {job['attempts']})")
+        try:
+            process_job(job)
+        except Exception as e:
+            JOB_QUEUE.fail(job['id'], f'Processing failed: {str(e)}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Run extraction workers for queued invoice jobs.')
+    parser.add_argument('-n', '--processes', type=int, default=int(os.getenv('WORKER_PROCESSES', 1)),
+                        help='number of worker processes to start on this host')
+    parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker(args.once)
+        return
+
+    processes = [multiprocessing.Process(target=run_worker, args=(args.once,)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+if __name__ == '__main__':
+    main()
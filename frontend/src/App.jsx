@@ -328,12 +328,12 @@ function App() {
   const fileInputRef = useRef(null)
 
   const handleFileSelect = (file) => {
-    if (file && file.type.startsWith('image/')) {
+    if (file && (file.type.startsWith('image/') || file.type === 'application/pdf')) {
       setSelectedFile(file)
       setError(null)
       setExtractedData(null)
     } else {
-      setError('Please select a valid image file (JPG, PNG, etc.)')
+      setError('Please select a valid image or PDF file (JPG, PNG, PDF, etc.)')
     }
   }
 
@@ -366,22 +366,59 @@ function App() {
 
     setIsLoading(true)
     setError(null)
+    setExtractedData(null)
 
     const formData = new FormData()
     formData.append('file', selectedFile)
 
     try {
-      const response = await fetch((import.meta.env.VITE_API_URL || '') + '/api/extract', {
+      // Server-Sent Events: sections and line items are shown as soon as the model produces them
+      const response = await fetch((import.meta.env.VITE_API_URL || '') + '/api/extract-stream', {
         method: 'POST',
         body: formData,
       })
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error('Failed to extract data from invoice')
       }
 
-      const data = await response.json()
-      setExtractedData(data)
+      let finished = false
+      const handleEvent = (event, data) => {
+        if (event === 'field') {
+          setExtractedData(current => ({ ...current, [data.key]: data.value }))
+        } else if (event === 'item') {
+          setExtractedData(current => {
+            const items = [...(current?.items || [])]
+            items[data.index] = data.item
+            return { ...current, items }
+          })
+        } else if (event === 'done') {
+          finished = true
+          setExtractedData(data)
+        } else if (event === 'error') {
+          setExtractedData(null)
+          throw new Error(data.error || 'Failed to extract data from invoice')
+        }
+      }
+
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader()
+      let buffer = ''
+      for (;;) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += value
+        let boundary
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const message = buffer.slice(0, boundary)
+          buffer = buffer.slice(boundary + 2)
+          const event = message.match(/^event: (.*)$/m)?.[1]
+          const data = message.match(/^data: (.*)$/m)?.[1]
+          if (event && data) handleEvent(event, JSON.parse(data))
+        }
+      }
+      if (!finished) {
+        throw new Error('The extraction stream ended unexpectedly')
+      }
     } catch (err) {
       setError(err.message)
     } finally {
@@ -498,7 +535,7 @@ function App() {
                 <input
                   ref={fileInputRef}
                   type="file"
-                  accept="image/*"
+                  accept="image/*,application/pdf"
                   onChange={handleFileChange}
                   className="absolute inset-0 w-full h-full opacity-0 cursor-pointer"
                 />
@@ -584,7 +621,7 @@ function App() {
             <div className="bg-white rounded-xl shadow-sm border p-6">
               <div className="flex items-center justify-between mb-4">
                 <h2 className="text-lg font-semibold text-gray-900">Extracted Data</h2>
-                {extractedData && (
+                {extractedData && !isLoading && (
                   <div className="flex space-x-2">
                     <button
                       onClick={downloadJSON}
@@ -0,0 +1,57 @@
+import os
+import multiprocessing
+
+# Production serving: gunicorn -c gunicorn.conf.py app:app
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+
+# Pre-forked worker processes, each running a pool of request threads. Extraction mostly
+# waits on the model, so threads keep a worker busy while processes add CPU parallelism.
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2, 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_class = 'gthread'
+
+# The app is imported in each worker after the fork, not in the master: the Gemini client,
+# background threads (webhook delivery, upload janitor) and SQLite connections must not be
+# shared across a fork.
+preload_app = False
+
+# Model calls can be slow; streamed extractions keep the connection open for the whole call
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 180))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth from image decoding
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+
+# Extraction worker processes for ?async=1 jobs, started by the gunicorn master next to the web
+# workers. The job queue is a SQLite file, so they must run on this host; set 0 when
+# extraction_worker.py is started separately on the same machine.
+EXTRACTION_WORKERS = int(os.environ.get('EXTRACTION_WORKERS', 1))
+
+def when_ready(server):
+    """Start the extraction workers once the master is listening."""
+    if EXTRACTION_WORKERS > 0:
+        import sys
+        import subprocess
+        server.extraction_workers = subprocess.Popen(
+            [sys.executable, '-m', 'extraction_worker', '--processes', str(EXTRACTION_WORKERS)]
+        )
+
+def on_exit(server):
+    """Stop the extraction workers with the master; jobs they were running are re-queued by lease."""
+    process = getattr(server, 'extraction_workers', None)
+    if process is not None:
+        # SIGINT, which extraction_worker.py handles by stopping its own child processes too
+        import signal
+        process.send_signal(signal.SIGINT)
+        process.wait(timeout=graceful_timeout)
+
+def post_worker_init(worker):
+    """Create the worker's model clients in the background, so health checks are answered at once."""
+    import threading
+    from invoice_extractor_server import cascade_tiers
+    threading.Thread(target=cascade_tiers, name='model-warmup', daemon=True).start()
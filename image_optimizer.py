@@ -0,0 +1,109 @@
+import os
+import io
+from typing import Tuple
+from PIL import Image, ImageOps
+
+# Optimizer configuration (override through environment variables)
+IMAGE_OPTIMIZE = os.getenv('IMAGE_OPTIMIZE', 'true').lower() in ('1', 'true', 'yes')
+IMAGE_MAX_EDGE = int(os.getenv('IMAGE_MAX_EDGE', 2048))
+IMAGE_JPEG_QUALITY = int(os.getenv('IMAGE_JPEG_QUALITY', 85))
+IMAGE_GRAYSCALE = os.getenv('IMAGE_GRAYSCALE', 'false').lower() in ('1', 'true', 'yes')
+
+# Formats the model accepts as-is, mapped to their MIME types
+PASSTHROUGH_MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp'
+}
+
+# Settings that change the bytes sent to the model (part of the extraction cache key)
+OPTIMIZER_VERSION = (
+    f"opt:{int(IMAGE_OPTIMIZE)}:{IMAGE_MAX_EDGE}:{IMAGE_JPEG_QUALITY}:{int(IMAGE_GRAYSCALE)}"
+)
+
+def sniff_mime_type(image_data: bytes) -> str:
+    """Guess an image MIME type from its magic bytes (defaults to JPEG)."""
+    header = bytes(image_data[:12])
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    if header.startswith((b'GIF87a', b'GIF89a')):
+        return 'image/gif'
+    if header.startswith(b'BM'):
+        return 'image/bmp'
+    if header.startswith((b'II*\x00', b'MM\x00*')):
+        return 'image/tiff'
+    return 'image/jpeg'
+
+def flatten_transparency(image: Image.Image) -> Image.Image:
+    """Composite an image with transparency onto white (dropping alpha would turn it black)."""
+    if 'transparency' in image.info:
+        image = image.convert('RGBA')
+    if image.mode not in ('RGBA', 'LA', 'PA'):
+        return image
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+def optimize_image(image_data: bytes, max_edge: int = None, quality: int = None,
+                   grayscale: bool = None) -> Tuple[bytes, str]:
+    """Downscale and recompress an invoice image before sending it to the model.
+
+    Returns the bytes to send and their MIME type. Large JPEGs are decoded in draft
+    mode at reduced scale, formats the model does not accept (BMP, TIFF, GIF) are
+    converted to JPEG, and the original is kept when it is already the smaller payload.
+    """
+    max_edge = IMAGE_MAX_EDGE if max_edge is None else max_edge
+    quality = IMAGE_JPEG_QUALITY if quality is None else quality
+    grayscale = IMAGE_GRAYSCALE if grayscale is None else grayscale
+
+    if not IMAGE_OPTIMIZE:
+        return image_data, sniff_mime_type(image_data)
+
+    try:
+        image = Image.open(io.BytesIO(image_data))
+        source_format = image.format
+        original_size = image.size
+
+        # Let the JPEG decoder skip detail we would throw away anyway
+        if source_format == 'JPEG' and max(image.size) > max_edge:
+            image.draft('L' if grayscale else 'RGB', (max_edge, max_edge))
+
+        image = ImageOps.exif_transpose(image)
+        flattened = flatten_transparency(image)
+        transparent = flattened is not image
+        image = flattened
+        if grayscale:
+            image = image.convert('L')
+        elif image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        resized = max(original_size) > max_edge
+        if max(image.size) > max_edge:
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=quality, optimize=True)
+        optimized = output.getvalue()
+
+        keep_original = (
+            source_format in PASSTHROUGH_MIME_TYPES
+            and not resized
+            and not grayscale
+            and not transparent
+            and len(image_data) <= len(optimized)
+        )
+        if keep_original:
+            result, mime_type = image_data, PASSTHROUGH_MIME_TYPES[source_format]
+        else:
+            result, mime_type = optimized, 'image/jpeg'
+
+        print(
+            f"Image optimizer: {source_format} {original_size[0]}x{original_size[1]} "
+            f"{len(image_data)} bytes -> {mime_type} {image.size[0]}x{image.size[1]} {len(result)} bytes"
+        )
+        return result, mime_type
+    except Exception as e:
+        print(f"Image optimizer skipped: {e}")
+        return image_data, sniff_mime_type(image_data)
@@ -0,0 +1,136 @@
+import json
+from typing import Dict, List, Tuple
+
+class IncrementalInvoiceParser:
+    """Incremental parser for the invoice JSON object as the model streams it.
+
+    feed() accepts text chunks of any size and returns the events completed by that
+    chunk: ('field', key, value) when a top-level field (company_info, totals, ...)
+    closes and ('item', index, item) as soon as each element of the top-level items
+    array closes. Text before the first '{' (such as a markdown fence) is skipped.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.position = 0
+        self.depth = 0
+        self.started = False
+        self.done = False
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.reading_key = False
+        self.expect_key = True
+        self.key = None
+        self.value_start = None
+        self.in_items = False
+        self.item_start = None
+        self.fields: Dict = {}
+        self.items: List = []
+
+    def feed(self, chunk: str) -> List[Tuple]:
+        """Consume a chunk of model output and return newly completed events."""
+        if self.done or not chunk:
+            return []
+        self.text += chunk
+        events = []
+        text = self.text
+        for i in range(self.position, len(text)):
+            c = text[i]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == '\\':
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.reading_key:
+                        self.key = json.loads(text[self.string_start:i + 1])
+                        self.reading_key = False
+                continue
+
+            if not self.started:
+                if c == '{':
+                    self.started = True
+                    self.depth = 1
+                continue
+
+            if c.isspace():
+                continue
+
+            if c == '"':
+                self.in_string = True
+                self.string_start = i
+                if self.depth == 1 and self.expect_key:
+                    self.reading_key = True
+                else:
+                    self._mark_value_start(i)
+            elif c == ':' and self.depth == 1:
+                self.expect_key = False
+                self.value_start = None
+            elif c in '{[':
+                self._mark_value_start(i)
+                if self.depth == 1 and self.key == 'items' and c == '[':
+                    self.in_items = True
+                self.depth += 1
+            elif c in '}]':
+                # A scalar last item ends at the items array's own closing bracket
+                if self.in_items and self.depth == 2 and self.item_start is not None:
+                    events.append(self._emit_item(text[self.item_start:i]))
+                self.depth -= 1
+                if self.in_items and self.depth == 2 and self.item_start is not None:
+                    events.append(self._emit_item(text[self.item_start:i + 1]))
+                elif self.depth == 0:
+                    events.extend(self._finish_field(text, i))
+                    self.done = True
+                    self.position = i + 1
+                    return events
+            elif c == ',':
+                if self.depth == 1:
+                    events.extend(self._finish_field(text, i))
+                elif self.in_items and self.depth == 2 and self.item_start is not None:
+                    events.append(self._emit_item(text[self.item_start:i]))
+            else:
+                # Numbers, true/false/null
+                self._mark_value_start(i)
+
+        self.position = len(text)
+        return events
+
+    def _mark_value_start(self, i):
+        if self.depth == 1 and not self.expect_key and self.value_start is None:
+            self.value_start = i
+        elif self.in_items and self.depth == 2 and self.item_start is None:
+            self.item_start = i
+
+    def _emit_item(self, raw):
+        item = json.loads(raw)
+        self.item_start = None
+        self.items.append(item)
+        return ('item', len(self.items) - 1, item)
+
+    def _finish_field(self, text, end):
+        """Close the current top-level field at position end."""
+        events = []
+        if self.key is not None and self.value_start is not None:
+            if self.key == 'items':
+                # Items were already emitted one by one
+                self.fields['items'] = self.items
+            else:
+                value = json.loads(text[self.value_start:end])
+                if value is not None:
+                    self.fields[self.key] = value
+                    events.append(('field', self.key, value))
+        self.key = None
+        self.value_start = None
+        self.expect_key = True
+        self.in_items = False
+        return events
+
+    def result(self) -> Dict:
+        """Return the invoice assembled so far."""
+        result = dict(self.fields)
+        if self.items and 'items' not in result:
+            result['items'] = self.items
+        return result
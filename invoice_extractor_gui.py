@@ -0,0 +1,244 @@
+import os
+import csv
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+from PIL import Image, ImageTk
+from invoice_extractor import MODEL_NAME, extract_fields_from_image
+from extraction_core import gemini_model
+
+class InvoiceExtractorApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Invoice Data Extractor")
+        self.root.geometry("1000x700")
+        
+        # Variables
+        self.image_path = ""
+        self.extracted_data = {}
+        
+        # Create UI
+        self.create_widgets()
+    
+    def create_widgets(self):
+        # Top frame for buttons
+        top_frame = ttk.Frame(self.root, padding="10")
+        top_frame.pack(fill=tk.X)
+        
+        # Upload button
+        btn_upload = ttk.Button(top_frame, text="Upload Invoice Image", command=self.upload_image)
+        btn_upload.pack(side=tk.LEFT, padx=5)
+        
+        # Extract button
+        btn_extract = ttk.Button(top_frame, text="Extract Data", command=self.extract_data)
+        btn_extract.pack(side=tk.LEFT, padx=5)
+        
+        # Save button
+        btn_save = ttk.Button(top_frame, text="Save to CSV", command=self.save_data)
+        btn_save.pack(side=tk.LEFT, padx=5)
+        
+        # Image display area
+        self.image_label = ttk.Label(self.root, text="Upload an invoice image to begin")
+        self.image_label.pack(pady=10, fill=tk.BOTH, expand=True)
+        
+        # Results area
+        results_frame = ttk.LabelFrame(self.root, text="Extracted Data", padding="10")
+        results_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        # Create a canvas with scrollbar for the results
+        canvas = tk.Canvas(results_frame)
+        scrollbar = ttk.Scrollbar(results_frame, orient="vertical", command=canvas.yview)
+        self.scrollable_frame = ttk.Frame(canvas)
+        
+        self.scrollable_frame.bind(
+            "<Configure>",
+            lambda e: canvas.configure(
+                scrollregion=canvas.bbox("all")
+            )
+        )
+        
+        canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
+        canvas.configure(yscrollcommand=scrollbar.set)
+        
+        canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        # Status bar
+        self.status_var = tk.StringVar()
+        self.status_var.set("Ready")
+        status_bar = ttk.Label(self.root, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
+        status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+    
+    def upload_image(self):
+        filetypes = [
+            ("Image files", "*.jpg *.jpeg *.png"),
+            ("All files", "*.*")
+        ]
+        
+        self.image_path = filedialog.askopenfilename(
+            title="Select an invoice image",
+            filetypes=filetypes
+        )
+        
+        if self.image_path:
+            try:
+                # Load and display the image
+                image = Image.open(self.image_path)
+                # Resize image to fit in the window
+                image.thumbnail((800, 500))
+                photo = ImageTk.PhotoImage(image)
+                
+                self.image_label.config(image=photo)
+                self.image_label.image = photo  # Keep a reference
+                self.status_var.set(f"Loaded: {os.path.basename(self.image_path)}")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to load image: {e}")
+    
+    def extract_data(self):
+        if not self.image_path:
+            messagebox.showwarning("Warning", "Please upload an invoice image first")
+            return
+        
+        # Show loading state
+        for widget in self.scrollable_frame.winfo_children():
+            widget.destroy()
+        
+        loading_label = ttk.Label(self.scrollable_frame, text="Extracting data, please wait...")
+        loading_label.pack(pady=20)
+        
+        # Add a progress bar
+        progress = ttk.Progressbar(self.scrollable_frame, mode='indeterminate')
+        progress.pack(fill=tk.X, padx=20, pady=10)
+        progress.start(10)
+        
+        self.root.update()
+        
+        try:
+            # Extract data from image
+            self.extracted_data, error = extract_fields_from_image(self.image_path)
+            
+            if error:
+                raise Exception(error)
+            
+            # Clear loading widgets
+            for widget in self.scrollable_frame.winfo_children():
+                widget.destroy()
+            
+            if not self.extracted_data:
+                ttk.Label(self.scrollable_frame, text="No data extracted").pack()
+                return
+            
+            # Create a treeview for better data display
+            style = ttk.Style()
+            style.configure("Treeview", rowheight=30)  # Increase row height
+            
+            # Create a frame for the treeview and scrollbars
+            tree_frame = ttk.Frame(self.scrollable_frame)
+            tree_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+            
+            # Add scrollbars
+            y_scroll = ttk.Scrollbar(tree_frame, orient="vertical")
+            x_scroll = ttk.Scrollbar(tree_frame, orient="horizontal")
+            
+            # Create the treeview
+            tree = ttk.Treeview(
+                tree_frame,
+                columns=("Value"),
+                show="headings",
+                yscrollcommand=y_scroll.set,
+                xscroll=x_scroll.set
+            )
+            
+            # Configure the columns
+            tree.heading("#0", text="Field", anchor=tk.W)
+            tree.heading("Value", text="Value", anchor=tk.W)
+            tree.column("#0", width=250, stretch=tk.NO)
+            tree.column("Value", width=500, stretch=tk.YES)
+            
+            # Configure the scrollbars
+            y_scroll.config(command=tree.yview)
+            x_scroll.config(command=tree.xview)
+            
+            # Add data to the treeview
+            for key, value in self.extracted_data.items():
+                if value:  # Only add non-empty values
+                    tree.insert("", tk.END, text=key, values=(value,))
+            
+            # Pack the treeview and scrollbars
+            tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            y_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+            x_scroll.pack(side=tk.BOTTOM, fill=tk.X)
+            
+            # Add some padding and styling
+            style = ttk.Style()
+            style.configure("Treeview", rowheight=30, font=('Arial', 10))
+            style.configure("Treeview.Heading", font=('Arial', 10, 'bold'))
+            
+            self.status_var.set(f"Successfully extracted {len(self.extracted_data)} fields")
+            
+        except Exception as e:
+            for widget in self.scrollable_frame.winfo_children():
+                widget.destroy()
+            ttk.Label(
+                self.scrollable_frame, 
+                text=f"Error: {str(e)}",
+                foreground="red"
+            ).pack(pady=20)
+            self.status_var.set("Error extracting data")
+        finally:
+            if 'progress' in locals():
+                progress.stop()
+                progress.destroy()
+    
+    def save_data(self):
+        if not self.extracted_data:
+            messagebox.showwarning("Warning", "No data to save. Please extract data first.")
+            return
+        
+        # Default file path
+        default_file = os.path.join(os.getcwd(), "extracted_invoices.csv")
+        
+        # Check if file exists to determine if we need headers
+        file_exists = os.path.isfile(default_file)
+        
+        try:
+            # Save to the default file (append mode)
+            with open(default_file, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=self.extracted_data.keys())
+                
+                # Write header only if file is being created
+                if not file_exists:
+                    writer.writeheader()
+                
+                # Write the data
+                writer.writerow(self.extracted_data)
+            
+            # Show success message
+            messagebox.showinfo(
+                "Success",
+                f"Data appended to:\n{default_file}\n\n"
+                f"Total invoices saved: {self.count_invoices_in_csv(default_file)}"
+            )
+            self.status_var.set(f"Data appended to {os.path.basename(default_file)}")
+            
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save data: {str(e)}")
+    
+    def count_invoices_in_csv(self, filepath):
+        """Count the number of invoices in the CSV file."""
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                return sum(1 for _ in f) - 1  # Subtract 1 for header
+        except FileNotFoundError:
+            return 0
+
+def run():
+    """Open the desktop window (after checking the Gemini API can be initialized)."""
+    if not gemini_model(MODEL_NAME):
+        messagebox.showerror("Error", "Failed to initialize Gemini API. Please check your API key in the .env file.")
+    else:
+        root = tk.Tk()
+        app = InvoiceExtractorApp(root)
+        root.mainloop()
+
+if __name__ == '__main__':
+    run()
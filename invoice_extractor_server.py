@@ -1,117 +1,294 @@
 import os
-import google.generativeai as genai
-from typing import Dict, Optional, Tuple
-from PIL import Image
-import io
-from dotenv import load_dotenv
-import base64
-import json
-import re
-
-# Load environment variables
-load_dotenv()
-
-# Initialize Gemini API
-try:
-    GEMINI_API_KEY = os.getenv('GOOGLE_API_KEY')
-    if not GEMINI_API_KEY:
-        raise ValueError("Please set the GOOGLE_API_KEY in the .env file")
-    genai.configure(api_key=GEMINI_API_KEY)
-    MODEL = genai.GenerativeModel('gemini-1.5-flash')
-except Exception as e:
-    print(f"Error initializing Gemini API: {e}")
-    MODEL = None
-
-def extract_fields_from_image(image_path: str) -> Tuple[Dict[str, str], str]:
-    """Extract invoice fields from an image using Gemini API."""
-    if not MODEL:
+import asyncio
+import threading
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+import time
+from extraction_core import gemini_model, generation_options, get_profile, parse_profile_response
+from extraction_cache import EXTRACTION_CACHE, make_cache_key
+from image_optimizer import OPTIMIZER_VERSION, optimize_image
+from incremental_json import IncrementalInvoiceParser
+from model_scheduler import MODEL_SCHEDULER, response_usage
+from request_hedging import MODEL_HEDGER, MODEL_HEDGING
+from model_cascade import CascadeTier, build_tiers, parse_cascade, validate_extraction
+from extraction_backends import create_backend, register_backend
+from metrics import CACHE_LOOKUPS, EXTRACTIONS, MODEL_ERRORS, MODEL_TOKENS, stage_timer
+
+# Model cascade, cheapest tier first ("model:prompt_profile,..."); the last tier is the strongest.
+# The default "structured" profile sends the invoice schema as a response schema and gets JSON back.
+MODEL_NAME = 'gemini-1.5-flash'
+MODEL_CASCADE = os.getenv('MODEL_CASCADE', f'{MODEL_NAME}:structured')
+
+# Model and prompt identity (part of the extraction cache key)
+PROMPT_VERSION = '+'.join(get_profile(profile).version for _, profile in parse_cascade(MODEL_CASCADE))
+CACHE_VERSION = f"{MODEL_CASCADE}:{PROMPT_VERSION}:{OPTIMIZER_VERSION}"
+
+# Gemini models are the default backend; see extraction_backends for the others
+register_backend('gemini', gemini_model)
+
+# Tiers (and their model clients) are created on first use rather than at import
+_cascade_tiers: Optional[List[CascadeTier]] = None
+_cascade_lock = threading.Lock()
+
+def cascade_tiers() -> List[CascadeTier]:
+    """The extraction cascade's tiers, creating their model clients on first use."""
+    global _cascade_tiers
+    if _cascade_tiers is None:
+        with _cascade_lock:
+            if _cascade_tiers is None:
+                _cascade_tiers = build_tiers(MODEL_CASCADE, create_backend)
+    return _cascade_tiers
+
+ImageSource = Union[str, bytes, bytearray, memoryview, BinaryIO]
+
+def read_image_data(image: ImageSource) -> bytes:
+    """Return the raw bytes of an image given as a path, bytes-like object or binary stream."""
+    if isinstance(image, bytes):
+        return image
+    if isinstance(image, (bytearray, memoryview)):
+        return bytes(image)
+    if isinstance(image, (str, os.PathLike)):
+        with open(image, "rb") as img_file:
+            return img_file.read()
+    return image.read()
+
+def extract_fields_from_image(image: ImageSource, use_cache: bool = True) -> Tuple[Dict[str, str], str]:
+    """Extract invoice fields from an image using Gemini API.
+
+    image may be a file path (as before), raw bytes/memoryview or a readable binary stream,
+    so uploads can be passed straight through without a disk round trip.
+    """
+    tiers = cascade_tiers()
+    if not tiers or not all(tier.model for tier in tiers):
         return {}, "Error: Gemini API not properly initialized. Check your API key."
     
     try:
         # Load and prepare the image
-        with open(image_path, "rb") as img_file:
-            img_data = img_file.read()
+        with stage_timer('read_image'):
+            img_data = read_image_data(image)
         
-        # Prepare the prompt
-        prompt = """Extract data from this pharmacy invoice and return it in a structured JSON format.
+        # Serve byte-identical re-uploads from the cache
+        cache_key = None
+        if use_cache:
+            with stage_timer('cache_lookup'):
+                cache_key = make_cache_key(img_data, CACHE_VERSION)
+                cached = EXTRACTION_CACHE.get(cache_key)
+            CACHE_LOOKUPS.inc('miss' if cached is None else 'hit')
+            if cached is not None:
+                EXTRACTIONS.inc('cached')
+                return cached, ""
+        
+        # Shrink the payload and send the real MIME type
+        with stage_timer('optimize_image'):
+            payload, mime_type = optimize_image(img_data)
+        
+        # Cheaper tiers first; escalate when their output fails validation
+        for position, tier in enumerate(tiers):
+            is_last = position == len(tiers) - 1
+            started = time.monotonic()
+            try:
+                result, error = _generate(tier, payload, mime_type)
+            except Exception:
+                tier.record(time.monotonic() - started, 'errors')
+                MODEL_ERRORS.inc(tier.name)
+                if is_last:
+                    raise
+                continue
+            problems = _tier_problems(is_last, result, error)
+            tier.record(time.monotonic() - started, 'escalated' if problems else 'accepted')
+            if not problems:
+                break
+            print(f"Escalating from {tier.name}: {', '.join(problems)}")
+        
+        if result and cache_key:
+            with stage_timer('cache_store'):
+                EXTRACTION_CACHE.put(cache_key, result)
+        EXTRACTIONS.inc('error' if error or not result else 'ok')
+        return result, error
+    except Exception as e:
+        EXTRACTIONS.inc('error')
+        return {}, f"Error processing image: {str(e)}"
+
+def _tier_problems(is_last: bool, result: Dict, error: str) -> List[str]:
+    """Reasons to escalate past a tier's answer (the last tier's answer is always kept)."""
+    if is_last:
+        return []
+    if error:
+        return [error]
+    with stage_timer('validate'):
+        return validate_extraction(result)
+
+def _record_usage(tier: CascadeTier, response):
+    """Count a call's input and output tokens for its tier."""
+    input_tokens, output_tokens = response_usage(response)
+    tier.record_tokens(input_tokens, output_tokens)
+    if input_tokens:
+        MODEL_TOKENS.inc(tier.name, 'input', amount=input_tokens)
+    if output_tokens:
+        MODEL_TOKENS.inc(tier.name, 'output', amount=output_tokens)
+
+def _generate(tier, payload: bytes, mime_type: str) -> Tuple[Dict[str, str], str]:
+    """Run one cascade tier's model on the image and parse its response."""
+    profile = get_profile(tier.prompt_profile)
+    options = generation_options(profile)
+    
+    def generate():
+        return tier.model.generate_content([profile.text, {"mime_type": mime_type, "data": payload}], **options)
+    
+    # Generate content (queued and rate limited with every other model call in the process),
+    # optionally hedging calls that run slower than recent ones once admitted
+    with stage_timer('model'):
+        if MODEL_HEDGING:
+            response = MODEL_HEDGER.call(generate, MODEL_SCHEDULER)
+        else:
+            response = MODEL_SCHEDULER.call(generate)
+    _record_usage(tier, response)
+    with stage_timer('parse'):
+        return parse_profile_response(profile, response.text)
+
+async def extract_fields_from_image_async(image: ImageSource, use_cache: bool = True) -> Tuple[Dict[str, str], str]:
+    """Async counterpart of extract_fields_from_image for the asyncio service.
+
+    Model calls go through the backend's generate_content_async, so an extraction waiting
+    on the model holds no thread; cache access and image optimization run in the event
+    loop's default executor.
+    """
+    tiers = cascade_tiers()
+    if not tiers or not all(tier.model for tier in tiers):
+        return {}, "Error: Gemini API not properly initialized. Check your API key."
+    
+    try:
+        with stage_timer('read_image'):
+            img_data = read_image_data(image)
         
-        CRITICAL INSTRUCTIONS:
-        1. For each item, you MUST extract the NDC (National Drug Code) or SKU:
-           - Look for numbers in these formats: 12345-678-90, 1234567890, 12345678901, 1234-5678-90
-           - Look in a separate column specifically for SKU/NDC/HSN code
-           - If SKU/NDC is not found, use "NA" (do not generate or make up codes)
-           - Never extract SKU from product description or other fields
+        cache_key = None
+        if use_cache:
+            with stage_timer('cache_lookup'):
+                cache_key = make_cache_key(img_data, CACHE_VERSION)
+                cached = await asyncio.to_thread(EXTRACTION_CACHE.get, cache_key)
+            CACHE_LOOKUPS.inc('miss' if cached is None else 'hit')
+            if cached is not None:
+                EXTRACTIONS.inc('cached')
+                return cached, ""
         
-        2. Return the response in this exact JSON structure:
-        {
-          "company_info": {
-            "company_name": "string"
-          },
-          "billing_info": {
-            "billing_company_name": "string",
-            "billing_address": "string"
-          },
-          "shipping_info": {
-            "shipping_company_name": "string",
-            "shipping_address": "string"
-          },
-          "invoice_info": {
-            "gst_invoice_number": "string",
-            "invoice_date": "string",
-            "due_date": "string",
-            "sales_person": "string",
-            "order_number": "string"
-          },
-          "items": [
-            {
-              "sku_ndc_number": "string (or 'NA' if not found)",
-              "description_of_goods": "string (product name/description)",
-              "size": "string (or 'NA' if not found)",
-              "quantity": "number (0 if not found)",
-              "rate": "number (0 if not found)",
-              "amount": "number (0 if not found)",
-              "uqc": "string (e.g., 'CT', 'BOX', 'BTL')"
-            }
-          ],
-          "totals": {
-            "subtotal": "number (0 if not found, sum of all item amounts if not explicitly provided)",
-            "shipping": "number (0 if not found)",
-            "discount": "number (0 if not found)",
-            "tax": "number (0 if not found)",
-            "total_invoice": "number (0 if not found)"
-          }
-        }
+        with stage_timer('optimize_image'):
+            payload, mime_type = await asyncio.to_thread(optimize_image, img_data)
         
-        IMPORTANT RULES:
-        1. For missing text fields, use "NA"
-        2. For missing numeric fields, use 0
-        3. SKU/NDC must only come from a dedicated column, not from descriptions
-        4. Never make up or hallucinate data - only extract what's visible
-        5. For totals, only include values that are explicitly shown in the invoice
-        6. Do not calculate any values - only extract what's visible
-        7. If subtotal is not shown, leave it as 0
-        8. If discount is not shown, leave it as 0
-        9. If shipping is not shown, leave it as 0
-       10. If tax is not shown, leave it as 0
-       11. For items, include ALL products exactly as listed
-        """
-        # Generate content
-        response = MODEL.generate_content([prompt, {"mime_type": "image/jpeg", "data": img_data}])
+        for position, tier in enumerate(tiers):
+            is_last = position == len(tiers) - 1
+            started = time.monotonic()
+            try:
+                result, error = await _generate_async(tier, payload, mime_type)
+            except Exception:
+                tier.record(time.monotonic() - started, 'errors')
+                MODEL_ERRORS.inc(tier.name)
+                if is_last:
+                    raise
+                continue
+            problems = _tier_problems(is_last, result, error)
+            tier.record(time.monotonic() - started, 'escalated' if problems else 'accepted')
+            if not problems:
+                break
+            print(f"Escalating from {tier.name}: {', '.join(problems)}")
         
-        # Process the response
-        try:
-            # Try to parse the response as JSON
-            result = json.loads(response.text)
-            return {k: v for k, v in result.items() if v is not None}, ""
-        except json.JSONDecodeError:
-            # If direct JSON parsing fails, try to extract JSON from the response
-            json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group(0))
-                return {k: v for k, v in result.items() if v is not None}, ""
-            else:
-                return {}, "Could not parse the response as JSON"
+        if result and cache_key:
+            with stage_timer('cache_store'):
+                await asyncio.to_thread(EXTRACTION_CACHE.put, cache_key, result)
+        EXTRACTIONS.inc('error' if error or not result else 'ok')
+        return result, error
     except Exception as e:
+        EXTRACTIONS.inc('error')
         return {}, f"Error processing image: {str(e)}"
 
+async def _generate_async(tier, payload: bytes, mime_type: str) -> Tuple[Dict[str, str], str]:
+    """Async counterpart of _generate."""
+    profile = get_profile(tier.prompt_profile)
+    options = generation_options(profile)
+    
+    def generate():
+        return tier.model.generate_content_async([profile.text, {"mime_type": mime_type, "data": payload}],
+                                                 **options)
+    
+    with stage_timer('model'):
+        if MODEL_HEDGING:
+            response = await MODEL_HEDGER.call_async(generate, MODEL_SCHEDULER)
+        else:
+            response = await MODEL_SCHEDULER.call_async(generate)
+    _record_usage(tier, response)
+    with stage_timer('parse'):
+        return parse_profile_response(profile, response.text)
+
+def stream_fields_from_image(image: ImageSource, use_cache: bool = True) -> Iterator[Tuple]:
+    """Extract invoice fields with streaming generation, yielding results as they arrive.
+
+    Yields ('field', key, value) for each completed top-level section, ('item', index, item)
+    for each completed line item, and finally ('done', data, error) with the full result
+    (the same pair extract_fields_from_image returns).
+    """
+    tiers = cascade_tiers()
+    # The strongest tier serves streamed extractions
+    model = tiers[-1].model if tiers else None
+    if not model:
+        yield ('done', {}, "Error: Gemini API not properly initialized. Check your API key.")
+        return
+    
+    try:
+        img_data = read_image_data(image)
+        
+        # Replay cached results as events
+        cache_key = None
+        if use_cache:
+            cache_key = make_cache_key(img_data, CACHE_VERSION)
+            cached = EXTRACTION_CACHE.get(cache_key)
+            CACHE_LOOKUPS.inc('miss' if cached is None else 'hit')
+            if cached is not None:
+                EXTRACTIONS.inc('cached')
+                for key, value in cached.items():
+                    if key == 'items':
+                        for index, item in enumerate(value or []):
+                            yield ('item', index, item)
+                    else:
+                        yield ('field', key, value)
+                yield ('done', cached, "")
+                return
+        
+        payload, mime_type = optimize_image(img_data)
+        profile = get_profile(tiers[-1].prompt_profile)
+        response = MODEL_SCHEDULER.stream(lambda: model.generate_content(
+            [profile.text, {"mime_type": mime_type, "data": payload}],
+            stream=True,
+            **generation_options(profile)
+        ))
+        
+        parser = IncrementalInvoiceParser()
+        parse_failed = False
+        chunks = []
+        last_usage = None
+        for chunk in response:
+            # Usage metadata arrives with the final chunk(s)
+            if getattr(chunk, 'usage_metadata', None) is not None:
+                last_usage = chunk
+            text = chunk.text
+            chunks.append(text)
+            if parse_failed:
+                continue
+            try:
+                yield from parser.feed(text)
+            except ValueError:
+                # Malformed partial output; keep collecting and parse the whole text at the end
+                parse_failed = True
+        
+        if parser.done and not parse_failed:
+            result, error = {k: v for k, v in parser.result().items() if v is not None}, ""
+        else:
+            result, error = parse_profile_response(profile, ''.join(chunks))
+        if last_usage is not None:
+            _record_usage(tiers[-1], last_usage)
+        if result and cache_key:
+            EXTRACTION_CACHE.put(cache_key, result)
+        EXTRACTIONS.inc('error' if error or not result else 'ok')
+        yield ('done', result, error)
+    except Exception as e:
+        EXTRACTIONS.inc('error')
+        yield ('done', {}, f"Error processing image: {str(e)}")
+
 # Removed save_to_csv function as it's not needed
@@ -0,0 +1,42 @@
+import re
+from typing import Optional
+
+# Currency markers dropped before parsing ("Rs. 500", "INR 300", "₹ 5,54,400.00", "$1,234.50")
+_CURRENCY = re.compile(r'\b(?:rs|inr|usd)\b\.?|[₹$]', re.IGNORECASE)
+
+# One number with optional digit grouping, sign (leading or accounting-style trailing), the "/-"
+# rupee suffix and a trailing unit word ("12,600 nos", "1,200.00-", "1,000/-"); anything else,
+# e.g. "2 x 10" or "1.234,50", is rejected rather than having its digit runs joined together
+_NUMBER = re.compile(
+    r'(?P<sign>[-+])?\s*(?P<number>\d+(?:,\d+)*(?:\.\d+)?|\.\d+)\s*(?:/-|(?P<trailing_minus>-))?\s*(?:[a-z]+\.?)?',
+    re.IGNORECASE
+)
+
+# The common case, a bare number with optional comma grouping, which parse_number accepts
+# unchanged; callers on hot paths may convert these directly and send everything else through it
+PLAIN_NUMBER = re.compile(r'-?\d+(?:,\d+)*(?:\.\d+)?')
+
+def parse_number(value) -> Optional[float]:
+    """Parse an extracted amount or quantity into a float.
+
+    Handles numbers already typed by the model as well as strings with Western or
+    Indian digit grouping, currency symbols, units and accounting-style negatives.
+    Returns None for missing or unparseable values ('NA', '', None).
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    if not text:
+        return None
+    negative = text.startswith('(') and text.endswith(')')
+    if negative:
+        text = text[1:-1]
+    match = _NUMBER.fullmatch(_CURRENCY.sub('', text).strip())
+    if not match:
+        return None
+    number = float(match.group('number').replace(',', ''))
+    if match.group('sign') == '-' or match.group('trailing_minus'):
+        negative = not negative
+    return -number if negative else number
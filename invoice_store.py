@@ -0,0 +1,236 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Store configuration (override through environment variables)
+INVOICE_STORE_DB = os.getenv('INVOICE_STORE_DB', 'invoices.db')
+MAX_PAGE_SIZE = 500
+
+# Date layouts seen on invoices, tried in order when normalizing invoice_date
+DATE_FORMATS = (
+    '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%m/%d/%Y',
+    '%d-%b-%y', '%d-%b-%Y', '%d %b %Y', '%d %B %Y', '%b %d, %Y', '%B %d, %Y', '%d/%m/%y'
+)
+
+def normalize_date(value) -> Optional[str]:
+    """Convert an extracted date string to ISO format, or None if it cannot be parsed."""
+    if not value or not isinstance(value, str):
+        return None
+    value = value.strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+def _text(value) -> Optional[str]:
+    """Return a stripped string, treating empty and 'NA' values as missing."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value if value and value.upper() != 'NA' else None
+
+def index_fields(data: Dict) -> Dict:
+    """Pull the indexed header fields out of an invoice (server or desktop schema)."""
+    company = data.get('company_info') or {}
+    invoice = data.get('invoice_info') or {}
+    invoice_date = _text(invoice.get('invoice_date')) or _text(invoice.get('issue_date'))
+    supplier_name = _text(company.get('company_name'))
+    return {
+        'invoice_number': _text(invoice.get('gst_invoice_number')) or _text(invoice.get('invoice_number')),
+        'invoice_date': invoice_date,
+        'invoice_date_iso': normalize_date(invoice_date),
+        'supplier_name': supplier_name,
+        'supplier_name_key': supplier_name.lower() if supplier_name else None,
+        'supplier_gstin': (_text(company.get('gstin')) or '').upper() or None
+    }
+
+class InvoiceStore:
+    """Embedded SQLite (WAL) store keeping every extracted invoice.
+
+    Header fields used for lookups are copied into indexed columns, and line-item SKUs
+    go into a separate indexed table, so filtered, keyset-paginated queries stay fast
+    regardless of how many invoices are stored.
+    """
+
+    def __init__(self, db_path=INVOICE_STORE_DB):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        """Return this thread's connection, creating the schema on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript('''
+                    CREATE TABLE IF NOT EXISTS invoices (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        created_at TEXT NOT NULL,
+                        source TEXT NOT NULL,
+                        invoice_number TEXT,
+                        invoice_date TEXT,
+                        invoice_date_iso TEXT,
+                        supplier_name TEXT,
+                        supplier_name_key TEXT,
+                        supplier_gstin TEXT,
+                        item_count INTEGER NOT NULL,
+                        data TEXT NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_invoices_number ON invoices (invoice_number);
+                    CREATE INDEX IF NOT EXISTS idx_invoices_gstin ON invoices (supplier_gstin);
+                    CREATE INDEX IF NOT EXISTS idx_invoices_supplier ON invoices (supplier_name_key);
+                    CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices (invoice_date_iso);
+                    CREATE TABLE IF NOT EXISTS invoice_items (
+                        invoice_id INTEGER NOT NULL REFERENCES invoices (id) ON DELETE CASCADE,
+                        position INTEGER NOT NULL,
+                        sku TEXT,
+                        PRIMARY KEY (invoice_id, position)
+                    ) WITHOUT ROWID;
+                    CREATE INDEX IF NOT EXISTS idx_invoice_items_sku ON invoice_items (sku, invoice_id);
+                    CREATE TABLE IF NOT EXISTS store_meta (
+                        key TEXT PRIMARY KEY,
+                        value TEXT
+                    );
+                ''')
+                self._initialized = True
+        self._local.conn = conn
+        return conn
+
+    def save(self, data: Dict, source: str = 'extraction') -> int:
+        """Store an extracted invoice and return its id."""
+        fields = index_fields(data)
+        items = data.get('items') or []
+        conn = self._connect()
+        conn.execute('BEGIN')
+        try:
+            cursor = conn.execute(
+                'INSERT INTO invoices (created_at, source, invoice_number, invoice_date, invoice_date_iso,'
+                ' supplier_name, supplier_name_key, supplier_gstin, item_count, data)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (datetime.now().isoformat(), source, fields['invoice_number'], fields['invoice_date'],
+                 fields['invoice_date_iso'], fields['supplier_name'], fields['supplier_name_key'],
+                 fields['supplier_gstin'], len(items), json.dumps(data, ensure_ascii=False))
+            )
+            invoice_id = cursor.lastrowid
+            conn.executemany(
+                'INSERT INTO invoice_items (invoice_id, position, sku) VALUES (?, ?, ?)',
+                [(invoice_id, position, _text(item.get('sku_ndc_number')) if isinstance(item, dict) else None)
+                 for position, item in enumerate(items)]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return invoice_id
+
+    def _record(self, row, include_data=True) -> Dict:
+        record = {
+            'id': row['id'],
+            'timestamp': row['created_at'],
+            'source': row['source'],
+            'invoice_number': row['invoice_number'],
+            'invoice_date': row['invoice_date'],
+            'supplier_name': row['supplier_name'],
+            'supplier_gstin': row['supplier_gstin'],
+            'item_count': row['item_count']
+        }
+        if include_data:
+            record['data'] = json.loads(row['data'])
+        return record
+
+    def get(self, invoice_id: int) -> Optional[Dict]:
+        """Return one stored invoice by id."""
+        row = self._connect().execute('SELECT * FROM invoices WHERE id = ?', (invoice_id,)).fetchone()
+        return self._record(row) if row else None
+
+    def latest(self) -> Optional[Dict]:
+        """Return the most recent invoice, unless the latest view has been cleared since."""
+        conn = self._connect()
+        cleared = conn.execute("SELECT value FROM store_meta WHERE key = 'cleared_through'").fetchone()
+        row = conn.execute(
+            'SELECT * FROM invoices WHERE id > ? ORDER BY id DESC LIMIT 1',
+            (int(cleared['value']) if cleared else 0,)
+        ).fetchone()
+        return self._record(row) if row else None
+
+    def clear_latest(self):
+        """Hide everything stored so far from latest() without deleting history."""
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO store_meta (key, value)"
+            " VALUES ('cleared_through', (SELECT COALESCE(MAX(id), 0) FROM invoices))"
+        )
+
+    def query(self, invoice_number=None, gstin=None, company=None, date_from=None, date_to=None,
+              sku=None, cursor=None, limit=50, include_data=False) -> Dict:
+        """Return a page of invoices (newest first) matching the filters.
+
+        company matches a case-insensitive name prefix; dates are ISO (YYYY-MM-DD).
+        Pass the returned next_cursor back as cursor to fetch the following page.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses = []
+        params: List = []
+        if invoice_number:
+            clauses.append('invoice_number = ?')
+            params.append(invoice_number)
+        if gstin:
+            clauses.append('supplier_gstin = ?')
+            params.append(gstin.upper())
+        if company:
+            # Prefix range scan on the lower-cased name index
+            prefix = company.lower()
+            clauses.append('supplier_name_key >= ? AND supplier_name_key < ?')
+            params.extend([prefix, prefix + '\uffff'])
+        if date_from:
+            clauses.append('invoice_date_iso >= ?')
+            params.append(date_from)
+        if date_to:
+            clauses.append('invoice_date_iso <= ?')
+            params.append(date_to)
+        if sku:
+            clauses.append('id IN (SELECT invoice_id FROM invoice_items WHERE sku = ?)')
+            params.append(sku)
+        if cursor:
+            clauses.append('id < ?')
+            params.append(int(cursor))
+
+        where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+        columns = '*' if include_data else (
+            'id, created_at, source, invoice_number, invoice_date, supplier_name, supplier_gstin, item_count'
+        )
+        rows = self._connect().execute(
+            f'SELECT {columns} FROM invoices{where} ORDER BY id DESC LIMIT ?', params + [limit + 1]
+        ).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'invoices': [self._record(row, include_data) for row in rows],
+            'next_cursor': rows[-1]['id'] if has_more else None,
+            'limit': limit
+        }
+
+    def iter_invoices(self, batch_size=MAX_PAGE_SIZE, cursor=None, **filters):
+        """Yield stored invoice records (with data) matching the filters, newest first (older than cursor)."""
+        while True:
+            page = self.query(cursor=cursor, limit=batch_size, include_data=True, **filters)
+            yield from page['invoices']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
+
+# Shared store instance
+INVOICE_STORE = InvoiceStore()
@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+from typing import Dict, Optional
+
+# Queue configuration (override through environment variables)
+JOB_QUEUE_DB = os.getenv('JOB_QUEUE_DB', 'job_queue.db')
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 300))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+def worker_id() -> str:
+    """Identify the current worker process (host and pid)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class JobQueue:
+    """Durable SQLite-backed queue of extraction jobs shared by the API and workers.
+
+    Jobs are claimed with a lease; a job whose worker dies is re-queued once its
+    lease expires, up to JOB_MAX_ATTEMPTS times. The database uses WAL mode, which
+    needs memory shared between processes on one host: the API and every worker must
+    run on the same machine, with the file on a local disk (not an NFS or SMB share).
+    """
+
+    def __init__(self, db_path=JOB_QUEUE_DB, lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._initialized = False
+
+    def _connect(self):
+        """Open a connection; each call gets its own so processes and threads never share one."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._initialized:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id TEXT PRIMARY KEY,'
+                ' filename TEXT NOT NULL,'
+                ' image BLOB,'
+                ' status TEXT NOT NULL,'
+                ' attempts INTEGER NOT NULL DEFAULT 0,'
+                ' result TEXT,'
+                ' error TEXT,'
+                ' worker TEXT,'
+                ' lease_expires REAL,'
+                ' created_at REAL NOT NULL,'
+                ' updated_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)')
+            self._initialized = True
+        return conn
+
+    def enqueue(self, filename: str, image_data: bytes) -> str:
+        """Persist a new job and return its id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT INTO jobs (id, filename, image, status, created_at, updated_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, filename, sqlite3.Binary(image_data), STATUS_QUEUED, now, now)
+            )
+        finally:
+            conn.close()
+        return job_id
+
+    def claim(self, worker: Optional[str] = None) -> Optional[Dict]:
+        """Atomically lease the oldest runnable job, or return None if the queue is empty."""
+        worker = worker or worker_id()
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # Give up on jobs whose lease expired too many times
+            conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, image = NULL, updated_at = ?'
+                ' WHERE status = ? AND lease_expires < ? AND attempts >= ?',
+                (STATUS_FAILED, 'Worker did not finish the job', now,
+                 STATUS_RUNNING, now, self.max_attempts)
+            )
+            row = conn.execute(
+                'SELECT id, filename, image, attempts FROM jobs'
+                ' WHERE status = ? OR (status = ? AND lease_expires < ?)'
+                ' ORDER BY created_at LIMIT 1',
+                (STATUS_QUEUED, STATUS_RUNNING, now)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                'UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?,'
+                ' lease_expires = ?, updated_at = ? WHERE id = ?',
+                (STATUS_RUNNING, worker, now + self.lease_seconds, now, row['id'])
+            )
+            conn.execute('COMMIT')
+            return {
+                'id': row['id'],
+                'filename': row['filename'],
+                'image': bytes(row['image']),
+                'attempts': row['attempts'] + 1
+            }
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def complete(self, job_id: str, result: Dict):
+        """Mark a job done and store its result."""
+        self._finish(job_id, STATUS_DONE, json.dumps(result, ensure_ascii=False), None)
+
+    def fail(self, job_id: str, error: str):
+        """Mark a job failed with an error message."""
+        self._finish(job_id, STATUS_FAILED, None, error)
+
+    def _finish(self, job_id, status, result, error):
+        conn = self._connect()
+        try:
+            # The uploaded image is no longer needed once the job is finished
+            conn.execute(
+                'UPDATE jobs SET status = ?, result = ?, error = ?, image = NULL,'
+                ' lease_expires = NULL, updated_at = ? WHERE id = ?',
+                (status, result, error, time.time(), job_id)
+            )
+        finally:
+            conn.close()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a job's status and result, or None if it does not exist."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                'SELECT id, filename, status, attempts, result, error, worker, created_at, updated_at'
+                ' FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {
+            'job_id': row['id'],
+            'filename': row['filename'],
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'worker': row['worker'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at']
+        }
+
+    def stats(self) -> Dict:
+        """Return the number of jobs in each status."""
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        finally:
+            conn.close()
+        return {status: count for status, count in rows}
+
+# Shared queue instance
+JOB_QUEUE = JobQueue()
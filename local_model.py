@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import asyncio
+import random
+import hashlib
+from types import SimpleNamespace
+from typing import Dict, Iterator
+
+# Canned invoice JSON returned for every call (a plausible invoice is generated per image when unset)
+LOCAL_MODEL_FIXTURE = os.getenv('LOCAL_MODEL_FIXTURE')
+# Share of responses from a "local-noisy" model whose arithmetic is deliberately wrong
+LOCAL_MODEL_ERROR_RATE = float(os.getenv('LOCAL_MODEL_ERROR_RATE', 0.2))
+
+# Simulated response latency: "0", "fixed:S", "uniform:LOW,HIGH" or "lognormal:MEDIAN,SIGMA" (seconds)
+LOCAL_MODEL_LATENCY = os.getenv('LOCAL_MODEL_LATENCY', '0')
+
+# Characters per streamed chunk, and the share of the latency spent before the first chunk
+STREAM_CHUNK_SIZE = 256
+FIRST_CHUNK_SHARE = 0.3
+
+def sample_latency(spec: str, rng=random) -> float:
+    """Draw one latency in seconds from a LOCAL_MODEL_LATENCY spec."""
+    kind, _, params = spec.partition(':')
+    values = [float(value) for value in params.split(',') if value.strip()]
+    if kind == 'fixed':
+        return values[0]
+    if kind == 'uniform':
+        return rng.uniform(values[0], values[1])
+    if kind == 'lognormal':
+        return values[0] * rng.lognormvariate(0, values[1])
+    return float(kind or 0)
+
+PRODUCTS = [
+    ('Lofena 25MG TABS (DICLOFENAC 25MG)', '30 TAB', 'BOX'),
+    ('Amoxicillin 500MG CAPS', '10 CAP', 'BOX'),
+    ('Paracetamol 250MG/5ML SYRUP', '60 ML', 'BTL'),
+    ('Atorvastatin 10MG TABS', '30 TAB', 'BOX'),
+    ('Pantoprazole 40MG TABS', '15 TAB', 'BOX'),
+    ('Metformin 500MG TABS', '20 TAB', 'BOX'),
+    ('Cetirizine 10MG TABS', '10 TAB', 'BOX'),
+    ('Omeprazole 20MG CAPS', '15 CAP', 'BOX')
+]
+
+def generate_invoice(seed: bytes, corrupt: bool = False) -> Dict:
+    """Generate a plausible, arithmetically consistent invoice (deterministic per seed)."""
+    rng = random.Random(hashlib.sha256(seed).digest())
+    items = []
+    for description, size, uqc in rng.sample(PRODUCTS, rng.randint(1, 6)):
+        quantity = rng.randint(1, 50)
+        rate = round(rng.uniform(5, 500), 2)
+        items.append({
+            'sku_ndc_number': f"{rng.randint(10000, 99999)}-{rng.randint(100, 999)}-{rng.randint(10, 99)}",
+            'description_of_goods': description,
+            'size': size,
+            'quantity': quantity,
+            'rate': rate,
+            'amount': round(quantity * rate, 2),
+            'uqc': uqc
+        })
+    if corrupt:
+        items[0]['amount'] = round(items[0]['amount'] * 1.5 + 10, 2)
+
+    subtotal = round(sum(item['amount'] for item in items), 2)
+    tax = round(subtotal * 0.12, 2)
+    return {
+        'company_info': {'company_name': 'Local Pharma Distributors'},
+        'billing_info': {'billing_company_name': 'City Pharmacy', 'billing_address': '12 Market Road'},
+        'shipping_info': {'shipping_company_name': 'City Pharmacy', 'shipping_address': '12 Market Road'},
+        'invoice_info': {
+            'gst_invoice_number': f"LP/{rng.randint(1000, 9999)}",
+            'invoice_date': f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025",
+            'due_date': 'NA',
+            'sales_person': 'NA',
+            'order_number': 'NA'
+        },
+        'items': items,
+        'totals': {'subtotal': subtotal, 'shipping': 0, 'discount': 0, 'tax': tax,
+                   'total_invoice': round(subtotal + tax, 2)}
+    }
+
+class LocalResponse:
+    """Response shaped like the SDK's: .text, .usage_metadata, and iterable chunks when streamed."""
+
+    def __init__(self, text: str, prompt_tokens: int, latency: float = 0.0):
+        self.text = text
+        self.latency = latency
+        output_tokens = max(1, len(text) // 4)
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens
+        )
+
+    def __iter__(self) -> Iterator:
+        starts = range(0, len(self.text), STREAM_CHUNK_SIZE)
+        time.sleep(self.latency * FIRST_CHUNK_SHARE)
+        for start in starts:
+            if start:
+                time.sleep(self.latency * (1 - FIRST_CHUNK_SHARE) / max(1, len(starts) - 1))
+            yield SimpleNamespace(text=self.text[start:start + STREAM_CHUNK_SIZE])
+
+class LocalModel:
+    """Offline stand-in for a Gemini model, for tests, load tests and cascades without API access.
+
+    "local" always answers correctly; "local-noisy" corrupts a line amount in
+    LOCAL_MODEL_ERROR_RATE of its answers (chosen per image) so validation has
+    something to catch. Every call takes a latency drawn from LOCAL_MODEL_LATENCY.
+    """
+
+    def __init__(self, model_name: str = 'local'):
+        self.model_name = model_name
+        self.error_rate = LOCAL_MODEL_ERROR_RATE if model_name == 'local-noisy' else 0.0
+
+    def _answer(self, contents):
+        """Response text, prompt token count and simulated latency for one call."""
+        prompt = next((part for part in contents if isinstance(part, str)), '')
+        image = next((part['data'] for part in contents if isinstance(part, dict)), b'')
+        if LOCAL_MODEL_FIXTURE:
+            with open(LOCAL_MODEL_FIXTURE, encoding='utf-8') as f:
+                text = f.read()
+        else:
+            corrupt = random.Random(hashlib.md5(image).digest()).random() < self.error_rate
+            text = json.dumps(generate_invoice(image, corrupt), indent=2)
+        return text, len(prompt) // 4 + 258, sample_latency(LOCAL_MODEL_LATENCY)
+
+    def generate_content(self, contents, stream: bool = False, **kwargs) -> LocalResponse:
+        text, prompt_tokens, latency = self._answer(contents)
+        if stream:
+            # Streamed responses spend the latency while being iterated
+            return LocalResponse(text, prompt_tokens, latency)
+        time.sleep(latency)
+        return LocalResponse(text, prompt_tokens)
+
+    async def generate_content_async(self, contents, **kwargs) -> LocalResponse:
+        text, prompt_tokens, latency = self._answer(contents)
+        await asyncio.sleep(latency)
+        return LocalResponse(text, prompt_tokens)
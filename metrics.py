@@ -0,0 +1,210 @@
+import os
+import math
+import time
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Return a per-request stage breakdown in a Server-Timing header (exposes internal timings to clients)
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'false').lower() in ('1', 'true', 'yes')
+
+# Histogram bucket upper bounds in seconds: sub-millisecond stages up to minute-long model calls
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            values = sorted(self.values.items())
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in values]
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels (bucket counts are kept non-cumulative)."""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = STAGE_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (+Inf last), sum, count]
+        self.series: Dict[Tuple, list] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labelvalues)
+            if series is None:
+                series = self.series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            series = sorted((labels, (list(counts), total, count))
+                            for labels, (counts, total, count) in self.series.items())
+        lines = []
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Named counters and histograms rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.metrics: List = []
+        self.collectors: List[Callable[[], List[Tuple[str, str, str, float]]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = STAGE_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], List[Tuple[str, str, str, float]]]):
+        """Add a callable returning (name, type, help, value) samples read at scrape time."""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        for collector in self.collectors:
+            try:
+                samples = collector()
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+                continue
+            for name, metric_type, documentation, value in samples:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.append(f"{name} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+METRICS = MetricsRegistry()
+
+STAGE_SECONDS = METRICS.histogram(
+    'invoice_stage_duration_seconds', 'Time spent in each stage of the extraction path.', ['stage'])
+REQUEST_SECONDS = METRICS.histogram(
+    'invoice_http_request_duration_seconds', 'HTTP request latency by endpoint.', ['endpoint'])
+HTTP_REQUESTS = METRICS.counter(
+    'invoice_http_requests_total', 'HTTP requests by endpoint and status code.', ['endpoint', 'status'])
+EXTRACTIONS = METRICS.counter(
+    'invoice_extractions_total', 'Image extractions by outcome (ok, error, cached).', ['outcome'])
+PARSE_FALLBACKS = METRICS.counter(
+    'invoice_parse_fallbacks_total', 'Model responses that needed the regex JSON fallback, by result.', ['result'])
+MODEL_TOKENS = METRICS.counter(
+    'invoice_model_tokens_total', 'Tokens reported by model calls, by cascade tier and kind (input, output).',
+    ['tier', 'kind'])
+MODEL_ERRORS = METRICS.counter(
+    'invoice_model_errors_total', 'Model calls that raised, by cascade tier.', ['tier'])
+CACHE_LOOKUPS = METRICS.counter(
+    'invoice_extraction_cache_lookups_total', 'Extraction cache lookups by result (hit, miss).', ['result'])
+WEBHOOK_DELIVERIES = METRICS.counter(
+    'invoice_webhook_deliveries_total', 'Webhook delivery attempts by outcome (delivered, retried, dead).',
+    ['outcome'])
+
+class RequestTimings:
+    """Stage durations of one request, summed per stage (pages may run in parallel)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self.lock:
+            self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, durations in milliseconds."""
+        with self.lock:
+            durations = list(self.durations.items())
+        durations.append(('total', time.perf_counter() - self.started))
+        return ', '.join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in durations)
+
+CURRENT_TIMINGS: ContextVar[Optional[RequestTimings]] = ContextVar('current_timings', default=None)
+
+class StageTimer:
+    """Times a block into the stage histogram (and the current request's timings, if any)."""
+
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        STAGE_SECONDS.observe(elapsed, self.stage)
+        timings = CURRENT_TIMINGS.get()
+        if timings is not None:
+            timings.add(self.stage, elapsed)
+        return False
+
+def stage_timer(stage: str) -> StageTimer:
+    """Context manager timing one stage of the extraction path."""
+    return StageTimer(stage)
+
+def with_current_timings(fn: Callable) -> Callable:
+    """Wrap fn so it records into the caller's request timings when run on another thread."""
+    timings = CURRENT_TIMINGS.get()
+    if timings is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = CURRENT_TIMINGS.set(timings)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            CURRENT_TIMINGS.reset(token)
+    return run
@@ -0,0 +1,100 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from invoice_numbers import parse_number
+from reconciliation import reconcile_invoices
+from request_hedging import LatencyHistogram
+
+# Sections every extraction must contain (from the extraction prompt's schema)
+REQUIRED_SECTIONS = ('company_info', 'invoice_info', 'items', 'totals')
+
+def parse_cascade(spec: str) -> List[Tuple[str, str]]:
+    """Parse "model:profile,model:profile" (cheapest first) into (model name, prompt profile) pairs."""
+    tiers = []
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        model_name, _, profile = entry.partition(':')
+        tiers.append((model_name.strip(), profile.strip() or 'full'))
+    return tiers
+
+def validate_extraction(data: Dict) -> List[str]:
+    """Structural and arithmetic problems that make a cheap tier's result untrustworthy."""
+    if not isinstance(data, dict) or not data:
+        return ['empty result']
+    problems = [f'missing {section}' for section in REQUIRED_SECTIONS if section not in data]
+
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        problems.append('no line items')
+    elif any(not isinstance(item, dict) or not item.get('description_of_goods')
+             or parse_number(item.get('amount')) is None for item in items):
+        problems.append('incomplete line items')
+
+    if not problems:
+        problems.extend(reconcile_invoices([data])['invoices'][0]['flags'])
+    return problems
+
+class CascadeTier:
+    """One model/prompt tier of the extraction cascade, with its outcome and latency stats."""
+
+    def __init__(self, model_name: str, prompt_profile: str, model):
+        self.model_name = model_name
+        self.prompt_profile = prompt_profile
+        self.model = model
+        self.latency = LatencyHistogram()
+        self.lock = threading.Lock()
+        self.counters = {'attempts': 0, 'accepted': 0, 'escalated': 0, 'errors': 0}
+        self.total_seconds = 0.0
+        self.tokens = {'calls_with_usage': 0, 'input_tokens': 0, 'output_tokens': 0}
+
+    @property
+    def name(self) -> str:
+        return f"{self.model_name}:{self.prompt_profile}"
+
+    def record(self, seconds: float, outcome: str):
+        """Record one attempt with outcome 'accepted', 'escalated' or 'errors'."""
+        self.latency.record(seconds)
+        with self.lock:
+            self.counters['attempts'] += 1
+            self.counters[outcome] += 1
+            self.total_seconds += seconds
+
+    def record_tokens(self, input_tokens: Optional[int], output_tokens: Optional[int]):
+        """Record the token usage of one call (calls whose response reports none are skipped)."""
+        if input_tokens is None and output_tokens is None:
+            return
+        with self.lock:
+            self.tokens['calls_with_usage'] += 1
+            self.tokens['input_tokens'] += input_tokens or 0
+            self.tokens['output_tokens'] += output_tokens or 0
+
+    def stats(self) -> Dict:
+        with self.lock:
+            attempts = self.counters['attempts']
+            calls = self.tokens['calls_with_usage']
+            result = {
+                'tier': self.name,
+                'hit_rate': round(self.counters['accepted'] / attempts, 4) if attempts else 0.0,
+                'mean_seconds': round(self.total_seconds / attempts, 3) if attempts else 0.0,
+                **self.counters,
+                **self.tokens,
+                'mean_input_tokens': round(self.tokens['input_tokens'] / calls, 1) if calls else None,
+                'mean_output_tokens': round(self.tokens['output_tokens'] / calls, 1) if calls else None
+            }
+        for percentile in (50, 95):
+            value = self.latency.percentile(percentile)
+            result[f'p{percentile}_seconds'] = round(value, 3) if value is not None else None
+        return result
+
+def build_tiers(spec: str, create_model: Callable) -> List[CascadeTier]:
+    """Create the tiers of a cascade spec, using create_model(name) for each model."""
+    return [CascadeTier(model_name, profile, create_model(model_name)) for model_name, profile in parse_cascade(spec)]
+
+def cascade_stats(tiers: List[CascadeTier]) -> Dict:
+    """Per-tier stats plus the share of invoices resolved at each tier."""
+    tier_stats = [tier.stats() for tier in tiers]
+    invoices = tier_stats[0]['attempts'] if tier_stats else 0
+    for stats in tier_stats:
+        stats['share_of_invoices'] = round(stats['accepted'] / invoices, 4) if invoices else 0.0
+    return {'invoices': invoices, 'tiers': tier_stats}
@@ -0,0 +1,321 @@
+import os
+import time
+import asyncio
+import random
+import threading
+from collections import deque
+from typing import Awaitable, Callable, Dict, Iterator, Optional, Tuple
+from metrics import METRICS
+
+# Quotas and concurrency bounds for model calls (per process)
+MODEL_REQUESTS_PER_MINUTE = float(os.getenv('MODEL_REQUESTS_PER_MINUTE', 2000))
+MODEL_TOKENS_PER_MINUTE = float(os.getenv('MODEL_TOKENS_PER_MINUTE', 4000000))
+MODEL_MAX_CONCURRENCY = int(os.getenv('MODEL_MAX_CONCURRENCY', 16))
+MODEL_MIN_CONCURRENCY = int(os.getenv('MODEL_MIN_CONCURRENCY', 1))
+# Tokens charged up front for a call; corrected from the response's usage metadata afterwards
+MODEL_ESTIMATED_TOKENS = int(os.getenv('MODEL_ESTIMATED_TOKENS', 3000))
+# How long a caller may wait in the queue, and how often a throttled call is retried
+MODEL_QUEUE_TIMEOUT = float(os.getenv('MODEL_QUEUE_TIMEOUT', 120))
+MODEL_MAX_RETRIES = int(os.getenv('MODEL_MAX_RETRIES', 5))
+
+# Backoff after a throttled call: BASE * 2^attempt with full jitter, capped
+THROTTLE_BACKOFF_BASE = 1.0
+THROTTLE_BACKOFF_MAX = 30.0
+# Concurrency is halved at most once per interval, so one burst of 429s counts as one signal
+DECREASE_INTERVAL = 2.0
+
+class ModelQueueTimeout(Exception):
+    """Raised when a call waited longer than the queue timeout for capacity."""
+
+def is_throttle_error(error: Exception) -> bool:
+    """Whether an error is a quota/overload response (HTTP 429 or 503)."""
+    if type(error).__name__ in ('ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable'):
+        return True
+    code = getattr(error, 'code', None)
+    try:
+        return int(code) in (429, 503)
+    except (TypeError, ValueError):
+        return False
+
+def response_tokens(response) -> Optional[int]:
+    """Total tokens reported in a model response's usage metadata, if any."""
+    usage = getattr(response, 'usage_metadata', None)
+    total = getattr(usage, 'total_token_count', None)
+    return total or None
+
+def response_usage(response) -> Tuple[Optional[int], Optional[int]]:
+    """Input (prompt) and output (candidate) token counts from a response's usage metadata."""
+    usage = getattr(response, 'usage_metadata', None)
+    return (getattr(usage, 'prompt_token_count', None) or None,
+            getattr(usage, 'candidates_token_count', None) or None)
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+class ModelScheduler:
+    """Process-wide admission control for model calls.
+
+    Calls wait in a FIFO queue until a concurrency slot is free and the request and token
+    buckets (refilled continuously at the per-minute quotas) have capacity. The concurrency
+    limit adapts AIMD-style: it grows by 1/limit on every successful call and halves on a
+    429/503, which also pauses admissions for a jittered backoff before the call is retried.
+    """
+
+    def __init__(self, requests_per_minute: float = MODEL_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = MODEL_TOKENS_PER_MINUTE,
+                 max_concurrency: int = MODEL_MAX_CONCURRENCY, min_concurrency: int = MODEL_MIN_CONCURRENCY,
+                 queue_timeout: float = MODEL_QUEUE_TIMEOUT, max_retries: int = MODEL_MAX_RETRIES):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+
+        self.condition = threading.Condition()
+        self.limit = float(self.max_concurrency)
+        self.active = 0
+        self.waiting = deque()
+        # Ticket -> (event loop, future) of coroutines waiting in acquire_async
+        self.async_waiters: Dict[int, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self.next_ticket = 0
+        self.request_bucket = requests_per_minute
+        self.token_bucket = tokens_per_minute
+        self.refilled_at = time.monotonic()
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+
+        self.counters = {'calls': 0, 'throttle_events': 0, 'retries': 0, 'queue_timeouts': 0, 'errors': 0}
+        self.total_wait = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self.refilled_at
+        self.refilled_at = now
+        self.request_bucket = min(self.requests_per_minute, self.request_bucket + elapsed * self.requests_per_minute / 60)
+        self.token_bucket = min(self.tokens_per_minute, self.token_bucket + elapsed * self.tokens_per_minute / 60)
+
+    def _wait_time(self, now, tokens) -> Optional[float]:
+        """Seconds until the head of the queue can be admitted (None: wait for a release)."""
+        if self.active >= int(self.limit):
+            return None
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.request_bucket < 1:
+            return (1 - self.request_bucket) * 60 / self.requests_per_minute
+        needed = min(tokens, self.tokens_per_minute)
+        if self.token_bucket < needed:
+            return (needed - self.token_bucket) * 60 / self.tokens_per_minute
+        return 0.0
+
+    def acquire(self, tokens: int = MODEL_ESTIMATED_TOKENS):
+        """Wait (FIFO) for a concurrency slot and bucket capacity, then take them."""
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        with self.condition:
+            ticket = self.next_ticket
+            self.next_ticket += 1
+            self.waiting.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self._wait_time(now, tokens) if self.waiting[0] == ticket else None
+                    if wait == 0:
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.counters['queue_timeouts'] += 1
+                        raise ModelQueueTimeout(f"Timed out after {self.queue_timeout:g}s waiting for model capacity")
+                    self.condition.wait(remaining if wait is None else min(wait, remaining))
+            finally:
+                self.waiting.remove(ticket)
+                self._notify()
+            self._take(tokens, started)
+
+    def _notify(self):
+        """Wake waiters after the queue or capacity changed (condition held).
+
+        Threads re-check on the condition. Of the coroutines, only the one at the head of
+        the queue can be admitted next, so only it is woken (on its own event loop).
+        """
+        self.condition.notify_all()
+        if self.waiting:
+            waiter = self.async_waiters.get(self.waiting[0])
+            if waiter is not None:
+                loop, future = waiter
+                loop.call_soon_threadsafe(_resolve, future)
+
+    def _take(self, tokens, started):
+        """Occupy a slot and charge the buckets (condition held)."""
+        self.active += 1
+        self.request_bucket -= 1
+        self.token_bucket -= tokens
+        self.total_wait += time.monotonic() - started
+
+    async def acquire_async(self, tokens: int = MODEL_ESTIMATED_TOKENS):
+        """acquire() for coroutines: same FIFO queue, but waits without blocking a thread."""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        with self.condition:
+            ticket = self.next_ticket
+            self.next_ticket += 1
+            self.waiting.append(ticket)
+        try:
+            while True:
+                with self.condition:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self._wait_time(now, tokens) if self.waiting[0] == ticket else None
+                    if wait == 0:
+                        self.waiting.remove(ticket)
+                        ticket = None
+                        self._notify()
+                        self._take(tokens, started)
+                        return
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.counters['queue_timeouts'] += 1
+                        raise ModelQueueTimeout(f"Timed out after {self.queue_timeout:g}s waiting for model capacity")
+                    # Registered under the lock, so a release after this check always wakes us
+                    future = loop.create_future()
+                    self.async_waiters[ticket] = (loop, future)
+                try:
+                    await asyncio.wait((future,), timeout=remaining if wait is None else min(wait, remaining))
+                finally:
+                    with self.condition:
+                        self.async_waiters.pop(ticket, None)
+        finally:
+            if ticket is not None:
+                with self.condition:
+                    self.waiting.remove(ticket)
+                    self._notify()
+
+    def release(self, tokens: int = MODEL_ESTIMATED_TOKENS, used_tokens: Optional[int] = None,
+                throttled: bool = False, attempt: int = 0):
+        """Return a slot, correct the token charge and feed the outcome to the AIMD controller."""
+        with self.condition:
+            self.active -= 1
+            self.counters['calls'] += 1
+            if used_tokens is not None:
+                self.token_bucket -= used_tokens - tokens
+            now = time.monotonic()
+            if throttled:
+                self.counters['throttle_events'] += 1
+                if now - self.last_decrease >= DECREASE_INTERVAL:
+                    self.limit = max(float(self.min_concurrency), self.limit / 2)
+                    self.last_decrease = now
+                backoff = random.uniform(0, min(THROTTLE_BACKOFF_MAX, THROTTLE_BACKOFF_BASE * 2 ** attempt))
+                self.paused_until = max(self.paused_until, now + backoff)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._notify()
+
+    def _admit(self, fn: Callable, tokens: int):
+        """Run fn with admission control, retrying throttled attempts; the slot stays held."""
+        attempt = 0
+        while True:
+            self.acquire(tokens)
+            try:
+                return fn()
+            except Exception as e:
+                throttled = is_throttle_error(e)
+                self.release(tokens, throttled=throttled, attempt=attempt)
+                if not throttled:
+                    with self.condition:
+                        self.counters['errors'] += 1
+                    raise
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                with self.condition:
+                    self.counters['retries'] += 1
+
+    def call(self, fn: Callable, tokens: int = MODEL_ESTIMATED_TOKENS):
+        """Run a model call (e.g. lambda: MODEL.generate_content(...)) under the scheduler."""
+        response = self._admit(fn, tokens)
+        self.release(tokens, used_tokens=response_tokens(response))
+        return response
+
+    async def _admit_async(self, fn: Callable[[], Awaitable], tokens: int):
+        """_admit() for coroutines; a cancelled call gives its slot back."""
+        attempt = 0
+        while True:
+            await self.acquire_async(tokens)
+            try:
+                return await fn()
+            except asyncio.CancelledError:
+                self.release(tokens)
+                raise
+            except Exception as e:
+                throttled = is_throttle_error(e)
+                self.release(tokens, throttled=throttled, attempt=attempt)
+                if not throttled:
+                    with self.condition:
+                        self.counters['errors'] += 1
+                    raise
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                with self.condition:
+                    self.counters['retries'] += 1
+
+    async def call_async(self, fn: Callable[[], Awaitable], tokens: int = MODEL_ESTIMATED_TOKENS):
+        """Run an async model call (e.g. lambda: MODEL.generate_content_async(...)) under the scheduler.
+
+        Async and threaded callers share the same queue, slots and quotas.
+        """
+        response = await self._admit_async(fn, tokens)
+        self.release(tokens, used_tokens=response_tokens(response))
+        return response
+
+    def stream(self, fn: Callable, tokens: int = MODEL_ESTIMATED_TOKENS) -> Iterator:
+        """Run a streaming model call, holding its slot until the stream has been consumed."""
+        response = self._admit(fn, tokens)
+        throttled = False
+        try:
+            for chunk in response:
+                yield chunk
+        except Exception as e:
+            throttled = is_throttle_error(e)
+            raise
+        finally:
+            self.release(tokens, used_tokens=response_tokens(response), throttled=throttled)
+
+    def queue_depth(self) -> int:
+        """Calls waiting for admission."""
+        with self.condition:
+            return len(self.waiting)
+
+    def stats(self) -> Dict:
+        """Current limit, queue depth, bucket levels and throttle counters."""
+        with self.condition:
+            now = time.monotonic()
+            self._refill(now)
+            admitted = self.counters['calls'] + self.active
+            return {
+                'concurrency_limit': int(self.limit),
+                'max_concurrency': self.max_concurrency,
+                'active': self.active,
+                'queue_depth': len(self.waiting),
+                'paused_for': round(max(0.0, self.paused_until - now), 3),
+                'request_bucket': round(self.request_bucket, 1),
+                'token_bucket': round(self.token_bucket),
+                'average_wait': round(self.total_wait / admitted, 4) if admitted else 0.0,
+                **self.counters
+            }
+
+# Shared scheduler in front of every model call in this process
+MODEL_SCHEDULER = ModelScheduler()
+
+def model_scheduler_gauges():
+    """Scheduler state sampled at scrape time for /metrics."""
+    stats = MODEL_SCHEDULER.stats()
+    return [
+        ('invoice_model_queue_depth', 'gauge', 'Model calls waiting for a scheduler slot.', stats['queue_depth']),
+        ('invoice_model_active_calls', 'gauge', 'Model calls in flight.', stats['active']),
+        ('invoice_model_concurrency_limit', 'gauge', 'Current AIMD model concurrency limit.', stats['concurrency_limit'])
+    ]
+
+METRICS.register_collector(model_scheduler_gauges)
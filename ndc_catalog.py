@@ -0,0 +1,223 @@
+import os
+import re
+import csv
+import argparse
+from typing import Dict, List, Optional
+import numpy as np
+
+# Directory holding the compiled catalog index (build it with `python ndc_catalog.py build ...`)
+NDC_CATALOG_PATH = os.getenv('NDC_CATALOG_PATH', 'ndc_catalog')
+
+# Catalog fields stored per package code, in record order
+CATALOG_FIELDS = ('package_ndc', 'name', 'generic_name', 'labeler', 'dosage_form', 'strength', 'package')
+
+# Fibonacci hashing constant (2^64 / golden ratio)
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_UINT64_MASK = (1 << 64) - 1
+
+# Hyphenated NDCs (4-4-2, 5-3-2, 5-4-1 and 11-digit 5-4-2) and bare 10/11-digit codes
+_HYPHENATED_NDC = re.compile(r'(?<!\d)(\d{4,5})-(\d{3,4})-(\d{1,2})(?![\d-])')
+_BARE_NDC = re.compile(r'(?<![\d-])(\d{10,11})(?![\d-])')
+_SEGMENT_LENGTHS = {(4, 4, 2), (5, 3, 2), (5, 4, 1), (5, 4, 2)}
+
+def ndc_candidates(value) -> List[str]:
+    """Return the possible 11-digit (5-4-2) forms of an extracted NDC.
+
+    Hyphenated codes have exactly one 11-digit form. A bare 10-digit code is ambiguous
+    (it may be 4-4-2, 5-3-2 or 5-4-1), so all three padded forms are returned.
+    """
+    if value is None or isinstance(value, bool):
+        return []
+    text = str(value).strip()
+
+    match = _HYPHENATED_NDC.search(text)
+    if match:
+        labeler, product, package = match.groups()
+        if (len(labeler), len(product), len(package)) in _SEGMENT_LENGTHS:
+            return [labeler.zfill(5) + product.zfill(4) + package.zfill(2)]
+
+    match = _BARE_NDC.search(text.replace(' ', ''))
+    if not match:
+        return []
+    digits = match.group(1)
+    if len(digits) == 11:
+        return [digits]
+    return ['0' + digits, digits[:5] + '0' + digits[5:], digits[:9] + '0' + digits[9:]]
+
+def normalize_ndc(value) -> Optional[str]:
+    """Canonicalize an NDC to 11 digits, or None if it is missing or ambiguous."""
+    candidates = ndc_candidates(value)
+    return candidates[0] if len(candidates) == 1 else None
+
+def _slots(keys: np.ndarray, bits: int) -> np.ndarray:
+    return (keys * np.uint64(_HASH_MULTIPLIER)) >> np.uint64(64 - bits)
+
+def build_hash_table(keys: np.ndarray):
+    """Build an open-addressing (linear probing) table mapping unique keys to their row numbers."""
+    count = len(keys)
+    bits = max(4, (2 * count - 1).bit_length())
+    size = 1 << bits
+    table_keys = np.zeros(size, dtype=np.uint64)
+    table_rows = np.full(size, -1, dtype=np.int32)
+
+    pending = np.arange(count)
+    slots = _slots(keys, bits).astype(np.int64)
+    while pending.size:
+        # Each round places, per free slot, the first pending key that hashes/probes to it
+        pending_slots = slots[pending]
+        free = table_rows[pending_slots] == -1
+        placed_slots, first = np.unique(pending_slots[free], return_index=True)
+        placed = pending[free][first]
+        table_keys[placed_slots] = keys[placed]
+        table_rows[placed_slots] = placed
+
+        is_placed = np.zeros(count, dtype=bool)
+        is_placed[placed] = True
+        pending = pending[~is_placed[pending]]
+        slots[pending] = (slots[pending] + 1) & (size - 1)
+    return table_keys, table_rows
+
+def _read_rows(path):
+    delimiter = ',' if path.lower().endswith('.csv') else '\t'
+    with open(path, newline='', encoding='utf-8', errors='replace') as f:
+        yield from csv.DictReader(f, delimiter=delimiter)
+
+def build_catalog(package_path: str, product_path: Optional[str], output_dir: str) -> int:
+    """Compile the FDA NDC directory export (package.txt, optionally product.txt) into an index."""
+    products = {}
+    if product_path:
+        for row in _read_rows(product_path):
+            strength = ' '.join(filter(None, [row.get('ACTIVE_NUMERATOR_STRENGTH'), row.get('ACTIVE_INGRED_UNIT')]))
+            name = ' '.join(filter(None, [row.get('PROPRIETARYNAME'), row.get('PROPRIETARYNAMESUFFIX')]))
+            products[row.get('PRODUCTID')] = (
+                name, row.get('NONPROPRIETARYNAME') or '', row.get('LABELERNAME') or '',
+                row.get('DOSAGEFORMNAME') or '', strength
+            )
+
+    keys, records, seen = [], [], set()
+    for row in _read_rows(package_path):
+        package_ndc = (row.get('NDCPACKAGECODE') or '').strip()
+        ndc = normalize_ndc(package_ndc)
+        if ndc is None or ndc in seen:
+            continue
+        seen.add(ndc)
+        product = products.get(row.get('PRODUCTID'), ('', '', '', '', ''))
+        fields = (package_ndc,) + product + (row.get('PACKAGEDESCRIPTION') or '',)
+        keys.append(int(ndc))
+        records.append('\t'.join(field.replace('\t', ' ').strip() for field in fields).encode('utf-8'))
+
+    keys = np.array(keys, dtype=np.uint64)
+    offsets = np.zeros(len(records) + 1, dtype=np.int64)
+    np.cumsum([len(record) for record in records], out=offsets[1:])
+    blob = np.frombuffer(b''.join(records), dtype=np.uint8)
+    table_keys, table_rows = build_hash_table(keys)
+
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, 'table_keys.npy'), table_keys)
+    np.save(os.path.join(output_dir, 'table_rows.npy'), table_rows)
+    np.save(os.path.join(output_dir, 'offsets.npy'), offsets)
+    np.save(os.path.join(output_dir, 'records.npy'), blob)
+    return len(records)
+
+class NdcCatalog:
+    """Memory-mapped NDC catalog with O(1) lookups by 11-digit package code.
+
+    The index is a power-of-two open-addressing hash table (keys and row numbers) plus
+    one UTF-8 record blob with row offsets, all loaded with mmap so opening the catalog
+    does not read it into memory.
+    """
+
+    def __init__(self, path: str = NDC_CATALOG_PATH):
+        self.path = path
+        self.table_keys = None
+        if os.path.exists(os.path.join(path, 'table_keys.npy')):
+            try:
+                self.table_keys = np.load(os.path.join(path, 'table_keys.npy'), mmap_mode='r')
+                self.table_rows = np.load(os.path.join(path, 'table_rows.npy'), mmap_mode='r')
+                self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+                self.records = np.load(os.path.join(path, 'records.npy'), mmap_mode='r')
+                self.bits = len(self.table_keys).bit_length() - 1
+            except Exception as e:
+                print(f"Error loading NDC catalog: {e}")
+                self.table_keys = None
+
+    @property
+    def available(self) -> bool:
+        return self.table_keys is not None
+
+    def __len__(self):
+        return len(self.offsets) - 1 if self.available else 0
+
+    def _row(self, ndc: str) -> int:
+        key = int(ndc)
+        mask = len(self.table_keys) - 1
+        slot = ((key * _HASH_MULTIPLIER) & _UINT64_MASK) >> (64 - self.bits)
+        while True:
+            row = int(self.table_rows[slot])
+            if row < 0:
+                return -1
+            if int(self.table_keys[slot]) == key:
+                return row
+            slot = (slot + 1) & mask
+
+    def get(self, ndc: str) -> Optional[Dict]:
+        """Look up a canonical 11-digit NDC."""
+        if not self.available:
+            return None
+        row = self._row(ndc)
+        if row < 0:
+            return None
+        record = bytes(self.records[self.offsets[row]:self.offsets[row + 1]]).decode('utf-8')
+        result = dict(zip(CATALOG_FIELDS, record.split('\t')))
+        result['ndc'] = ndc
+        return result
+
+    def lookup(self, value) -> Optional[Dict]:
+        """Look up an extracted NDC in any accepted format (ambiguous 10-digit codes try each form)."""
+        for ndc in ndc_candidates(value):
+            entry = self.get(ndc)
+            if entry is not None:
+                return entry
+        return None
+
+    def enrich(self, data: Dict) -> Dict:
+        """Add the canonical NDC and catalog fields to each extracted line item, in place."""
+        for item in data.get('items') or []:
+            if not isinstance(item, dict):
+                continue
+            entry = self.lookup(item.get('sku_ndc_number'))
+            if entry is None:
+                ndc = normalize_ndc(item.get('sku_ndc_number'))
+                if ndc:
+                    item['ndc_11'] = ndc
+                continue
+            item['ndc_11'] = entry['ndc']
+            for field in CATALOG_FIELDS[1:]:
+                if entry[field]:
+                    item[f'catalog_{field}'] = entry[field]
+        return data
+
+# Shared catalog (empty until an index has been built at NDC_CATALOG_PATH)
+NDC_CATALOG = NdcCatalog()
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the NDC catalog index.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='compile the FDA NDC directory export into an index')
+    build.add_argument('package', help='package.txt from the FDA NDC directory')
+    build.add_argument('product', nargs='?', help='product.txt from the FDA NDC directory')
+    build.add_argument('-o', '--output', default=NDC_CATALOG_PATH, help='index directory')
+    lookup = subparsers.add_parser('lookup', help='look up NDCs in the index')
+    lookup.add_argument('ndc', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        count = build_catalog(args.package, args.product, args.output)
+        print(f"Indexed {count} package codes in {args.output}")
+    else:
+        catalog = NdcCatalog()
+        for value in args.ndc:
+            print(f"{value}: {catalog.lookup(value)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,353 @@
+import os
+import re
+import csv
+import math
+import argparse
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+# Directory holding the compiled product index (build it with `python product_matcher.py build ...`)
+PRODUCT_INDEX_PATH = os.getenv('PRODUCT_INDEX_PATH', 'product_index')
+# Minimum score for enrichment to attach a match to a line item
+PRODUCT_MATCH_MIN_SCORE = float(os.getenv('PRODUCT_MATCH_MIN_SCORE', 0.7))
+
+# Postings read per query to retrieve candidates, taken from the query's rarest grams first;
+# once the budget is spent every further gram still contributes an evenly spaced sample
+CANDIDATE_POSTINGS_BUDGET = 16384
+POSTINGS_SAMPLE_PER_GRAM = 256
+# Candidates scored on all grams, and the best of those re-ranked by the strength/form-aware scorer
+SCORED_CANDIDATES = 200
+RERANK_CANDIDATES = 20
+
+# Weights of the final score
+NAME_WEIGHT = 0.6
+STRENGTH_WEIGHT = 0.25
+FORM_WEIGHT = 0.15
+
+_STRENGTH = re.compile(r'(\d+(?:\.\d+)?)\s*(mcg|mg|gm|g|ml|iu|%|units?)(?:\s*/\s*(\d*(?:\.\d+)?)\s*(ml|g|gm|l))?\b')
+_WORD = re.compile(r'[a-z0-9]+')
+
+# Dosage form spellings found on invoices and in catalogs, mapped to one canonical form
+FORM_SYNONYMS = {
+    'tab': 'tablet', 'tabs': 'tablet', 'tablet': 'tablet', 'tablets': 'tablet', 'tbl': 'tablet',
+    'cap': 'capsule', 'caps': 'capsule', 'capsule': 'capsule', 'capsules': 'capsule',
+    'syp': 'syrup', 'syr': 'syrup', 'syrup': 'syrup',
+    'susp': 'suspension', 'suspension': 'suspension',
+    'inj': 'injection', 'injection': 'injection', 'vial': 'injection', 'amp': 'injection',
+    'crm': 'cream', 'cream': 'cream', 'oint': 'ointment', 'ointment': 'ointment', 'gel': 'gel',
+    'drop': 'drops', 'drops': 'drops', 'soln': 'solution', 'sol': 'solution', 'solution': 'solution',
+    'lotion': 'lotion', 'spray': 'spray', 'inhaler': 'inhaler', 'powder': 'powder', 'sachet': 'powder'
+}
+
+_UNIT_SCALE = {'mcg': 0.001, 'mg': 1.0, 'g': 1000.0, 'gm': 1000.0}
+
+# Canonical dosage forms, indexed by position in the compiled index (-1 for unknown)
+FORMS = sorted(set(FORM_SYNONYMS.values()))
+
+def parse_description(text: str) -> Tuple[List[str], frozenset, Optional[str]]:
+    """Split a product description into name words, normalized strengths and a canonical dosage form."""
+    text = (text or '').lower()
+    strengths = set()
+    for amount, unit, per_amount, per_unit in _STRENGTH.findall(text):
+        unit = 'unit' if unit.startswith('unit') else unit
+        value = float(amount) * _UNIT_SCALE.get(unit, 1.0)
+        unit = 'mg' if unit in _UNIT_SCALE else unit
+        strength = f"{value:g}{unit}"
+        if per_unit:
+            strength += f"/{per_amount or '1'}{per_unit}"
+        strengths.add(strength)
+    text = _STRENGTH.sub(' ', text)
+
+    words, form = [], None
+    for word in _WORD.findall(text):
+        if word in FORM_SYNONYMS:
+            form = form or FORM_SYNONYMS[word]
+        else:
+            words.append(word)
+    return words, frozenset(strengths), form
+
+# Catalog descriptions recur across queries, so their parses are cached
+_parse_catalog_description = lru_cache(maxsize=65536)(parse_description)
+
+def name_grams(words: List[str]) -> set:
+    """Character trigrams of each word (padded at word boundaries) plus the whole words."""
+    grams = set()
+    for word in words:
+        grams.add('w:' + word)
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def _attribute_score(query, candidate) -> float:
+    """1.0 when both agree, 0.0 when both are known and differ, 0.5 when either is unknown."""
+    if not query or not candidate:
+        return 0.5
+    if isinstance(query, frozenset):
+        return len(query & candidate) / len(query | candidate)
+    return 1.0 if query == candidate else 0.0
+
+def _read_catalog(path):
+    """Yield (id, description) from a formulary CSV (id, description) or the FDA NDC product.txt."""
+    delimiter = ',' if path.lower().endswith('.csv') else '\t'
+    with open(path, newline='', encoding='utf-8', errors='replace') as f:
+        for row in csv.DictReader(f, delimiter=delimiter):
+            if 'PROPRIETARYNAME' in row:
+                generic = row.get('NONPROPRIETARYNAME')
+                description = ' '.join(filter(None, [
+                    row.get('PROPRIETARYNAME'), f"({generic})" if generic else None,
+                    row.get('ACTIVE_NUMERATOR_STRENGTH'), row.get('ACTIVE_INGRED_UNIT'), row.get('DOSAGEFORMNAME')
+                ]))
+                yield row.get('PRODUCTNDC') or row.get('PRODUCTID'), description
+            else:
+                yield row.get('id') or row.get('sku'), row.get('description') or row.get('name')
+
+def build_index(catalog_path: str, output_dir: str) -> int:
+    """Compile a product catalog into an n-gram inverted index (CSR postings with IDF weights)."""
+    vocabulary: Dict[str, int] = {}
+    strength_vocabulary: Dict[str, int] = {}
+    product_grams, product_strengths, product_forms, records = [], [], [], []
+    for product_id, description in _read_catalog(catalog_path):
+        if not description:
+            continue
+        words, strengths, form = parse_description(description)
+        product_grams.append(np.array(
+            sorted({vocabulary.setdefault(gram, len(vocabulary)) for gram in name_grams(words)}), dtype=np.int32))
+        product_strengths.append(sorted(strength_vocabulary.setdefault(strength, len(strength_vocabulary))
+                                        for strength in strengths))
+        product_forms.append(FORMS.index(form) if form else -1)
+        records.append(f"{product_id or ''}\t{description.replace(chr(9), ' ')}".encode('utf-8'))
+
+    count = len(records)
+    gram_ids = np.concatenate(product_grams) if product_grams else np.zeros(0, dtype=np.int32)
+    product_ids = np.repeat(np.arange(count, dtype=np.int32), [len(grams) for grams in product_grams])
+
+    # Postings: product ids grouped by gram (CSR layout)
+    order = np.argsort(gram_ids, kind='stable')
+    postings = product_ids[order]
+    frequency = np.bincount(gram_ids, minlength=len(vocabulary))
+    indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(frequency, out=indptr[1:])
+    idf = np.log((count + 1) / (frequency + 1)).astype(np.float32) + np.float32(1.0)
+    norms = np.bincount(product_ids, weights=idf[gram_ids], minlength=count).astype(np.float32)
+
+    # Forward index: each product's gram ids, for exact scoring of retrieved candidates
+    product_indptr = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum([len(grams) for grams in product_grams], out=product_indptr[1:])
+
+    # Each product's strengths and form, so candidates tied on name can be ranked by them
+    strength_indptr = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum([len(strengths) for strengths in product_strengths], out=strength_indptr[1:])
+    strength_ids = np.array([strength for strengths in product_strengths for strength in strengths], dtype=np.int32)
+
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum([len(record) for record in records], out=offsets[1:])
+
+    os.makedirs(output_dir, exist_ok=True)
+    grams = sorted(vocabulary, key=vocabulary.get)
+    np.save(os.path.join(output_dir, 'grams.npy'), np.array(grams, dtype=str))
+    np.save(os.path.join(output_dir, 'indptr.npy'), indptr)
+    np.save(os.path.join(output_dir, 'postings.npy'), postings)
+    np.save(os.path.join(output_dir, 'idf.npy'), idf)
+    np.save(os.path.join(output_dir, 'norms.npy'), norms)
+    np.save(os.path.join(output_dir, 'product_indptr.npy'), product_indptr)
+    np.save(os.path.join(output_dir, 'product_grams.npy'), gram_ids)
+    strengths = sorted(strength_vocabulary, key=strength_vocabulary.get)
+    np.save(os.path.join(output_dir, 'strengths.npy'), np.array(strengths, dtype=str))
+    np.save(os.path.join(output_dir, 'strength_indptr.npy'), strength_indptr)
+    np.save(os.path.join(output_dir, 'product_strengths.npy'), strength_ids)
+    np.save(os.path.join(output_dir, 'product_forms.npy'), np.array(product_forms, dtype=np.int8))
+    np.save(os.path.join(output_dir, 'offsets.npy'), offsets)
+    np.save(os.path.join(output_dir, 'records.npy'), np.frombuffer(b''.join(records), dtype=np.uint8))
+    return count
+
+class ProductMatcher:
+    """Top-k fuzzy matching of invoice descriptions against a product catalog.
+
+    Candidates are retrieved from the postings of the query's character-trigram and word
+    grams (rarest first), scored by IDF-weighted cosine over all name grams, then re-ranked
+    with the strength and dosage form parsed from both descriptions, so "Diclofenac 25mg
+    tabs" prefers the 25 mg tablet over the 50 mg one or the gel. Strength and form also
+    count whenever candidates are cut down, so a product sold under one name in many
+    strengths and forms does not lose its exact entry among name-only ties.
+    """
+
+    def __init__(self, path: str = PRODUCT_INDEX_PATH):
+        self.path = path
+        self.vocabulary = None
+        if os.path.exists(os.path.join(path, 'grams.npy')):
+            try:
+                grams = np.load(os.path.join(path, 'grams.npy'))
+                self.vocabulary = {gram: i for i, gram in enumerate(grams.tolist())}
+                self.indptr = np.asarray(np.load(os.path.join(path, 'indptr.npy'), mmap_mode='r'))
+                self.postings = np.asarray(np.load(os.path.join(path, 'postings.npy'), mmap_mode='r'))
+                self.idf = np.load(os.path.join(path, 'idf.npy'))
+                self.norms = np.asarray(np.load(os.path.join(path, 'norms.npy'), mmap_mode='r'))
+                self.offsets = np.asarray(np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r'))
+                self.records = np.asarray(np.load(os.path.join(path, 'records.npy'), mmap_mode='r'))
+                self.product_indptr = np.asarray(np.load(os.path.join(path, 'product_indptr.npy'), mmap_mode='r'))
+                self.product_grams = np.asarray(np.load(os.path.join(path, 'product_grams.npy'), mmap_mode='r'))
+                self.unseen_idf = math.log(len(self.norms) + 1) + 1.0
+            except Exception as e:
+                print(f"Error loading product index: {e}")
+                self.vocabulary = None
+        self.strength_vocabulary = None
+        if self.available and os.path.exists(os.path.join(path, 'product_forms.npy')):
+            strengths = np.load(os.path.join(path, 'strengths.npy'))
+            self.strength_vocabulary = {strength: i for i, strength in enumerate(strengths.tolist())}
+            self.strength_indptr = np.asarray(np.load(os.path.join(path, 'strength_indptr.npy'), mmap_mode='r'))
+            self.product_strengths = np.asarray(np.load(os.path.join(path, 'product_strengths.npy'), mmap_mode='r'))
+            self.product_forms = np.asarray(np.load(os.path.join(path, 'product_forms.npy'), mmap_mode='r'))
+        elif self.available:
+            print(f"Product index at {path} has no strength/form arrays; rebuild it for attribute-aware retrieval")
+
+    @property
+    def available(self) -> bool:
+        return self.vocabulary is not None
+
+    def __len__(self):
+        return len(self.norms) if self.available else 0
+
+    def _gather(self, indptr, values, rows):
+        """Concatenate the CSR entries of the given rows, with the position of each entry's row."""
+        starts, ends = indptr[rows], indptr[rows + 1]
+        lengths = ends - starts
+        owner = np.repeat(np.arange(len(rows)), lengths)
+        positions = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        return owner, values[positions]
+
+    def _attribute_scores(self, candidates, strengths, form) -> np.ndarray:
+        """Weighted strength and form agreement per candidate, as in the re-ranking score (vectorized)."""
+        if self.strength_vocabulary is None:
+            return np.zeros(len(candidates))
+        forms = self.product_forms[candidates]
+        if form:
+            form_score = np.where(forms < 0, 0.5, (forms == FORMS.index(form)).astype(np.float64))
+        else:
+            form_score = np.full(len(candidates), 0.5)
+
+        counts = self.strength_indptr[candidates + 1] - self.strength_indptr[candidates]
+        if strengths:
+            query_ids = [self.strength_vocabulary[strength] for strength in strengths
+                         if strength in self.strength_vocabulary]
+            owner, product_strengths = self._gather(self.strength_indptr, self.product_strengths, candidates)
+            shared = np.bincount(owner[np.isin(product_strengths, query_ids)], minlength=len(candidates))
+            union = np.maximum(len(strengths) + counts - shared, 1)
+            strength_score = np.where(counts == 0, 0.5, shared / union)
+        else:
+            strength_score = np.full(len(candidates), 0.5)
+        return STRENGTH_WEIGHT * strength_score + FORM_WEIGHT * form_score
+
+    def _record(self, row: int) -> Tuple[str, str]:
+        record = bytes(self.records[self.offsets[row]:self.offsets[row + 1]]).decode('utf-8')
+        product_id, _, description = record.partition('\t')
+        return product_id, description
+
+    def match(self, description: str, k: int = 5) -> List[Dict]:
+        """Return the top-k catalog products for a description, best first."""
+        if not self.available or not description:
+            return []
+        words, strengths, form = parse_description(description)
+        grams = name_grams(words)
+        gram_ids = [self.vocabulary[gram] for gram in grams if gram in self.vocabulary]
+        if not gram_ids:
+            return []
+
+        gram_ids = np.array(gram_ids, dtype=np.int32)
+        query_norm = float(self.idf[gram_ids].sum()) + (len(grams) - len(gram_ids)) * self.unseen_idf
+
+        # Retrieve candidates from every gram's postings, rarest first: lists are read in full
+        # within the budget, and past it each gram adds an evenly spaced sample of its list
+        lengths = self.indptr[gram_ids + 1] - self.indptr[gram_ids]
+        lists, weights, used = [], [], 0
+        for position in np.argsort(lengths, kind='stable'):
+            start = self.indptr[gram_ids[position]]
+            postings = self.postings[start:start + lengths[position]]
+            take = max(CANDIDATE_POSTINGS_BUDGET - used, POSTINGS_SAMPLE_PER_GRAM)
+            if len(postings) > take:
+                postings = postings[np.linspace(0, len(postings) - 1, take).astype(np.int64)]
+            lists.append(postings)
+            weights.append(np.full(len(postings), self.idf[gram_ids[position]], dtype=np.float32))
+            used += len(postings)
+        candidates, inverse = np.unique(np.concatenate(lists), return_inverse=True)
+        if len(candidates) > SCORED_CANDIDATES:
+            # Partial cosine plus strength/form agreement, so ties on name keep the right variants.
+            # Only candidates within the largest possible strength/form bonus of the cut-off can
+            # reach it, so attributes are looked up for those alone.
+            partial = np.bincount(inverse, weights=np.concatenate(weights))
+            partial = NAME_WEIGHT * np.minimum(1.0, partial / np.sqrt(query_norm * self.norms[candidates]))
+            cutoff = np.partition(partial, -SCORED_CANDIDATES)[-SCORED_CANDIDATES] - STRENGTH_WEIGHT - FORM_WEIGHT
+            reachable = np.flatnonzero(partial >= cutoff)
+            candidates, partial = candidates[reachable], partial[reachable]
+            if len(candidates) > SCORED_CANDIDATES:
+                partial += self._attribute_scores(candidates, strengths, form)
+                candidates = candidates[np.argpartition(-partial, SCORED_CANDIDATES)[:SCORED_CANDIDATES]]
+
+        # Exact IDF-weighted cosine over all grams, from the candidates' forward index entries
+        owner, product_grams = self._gather(self.product_indptr, self.product_grams, candidates)
+        shared = np.isin(product_grams, gram_ids)
+        overlap = np.bincount(owner[shared], weights=self.idf[product_grams[shared]], minlength=len(candidates))
+        similarity = overlap / np.sqrt(query_norm * self.norms[candidates])
+        rerank = max(RERANK_CANDIDATES, k)
+        if len(candidates) > rerank:
+            combined = NAME_WEIGHT * np.minimum(1.0, similarity) + self._attribute_scores(candidates, strengths, form)
+            best = np.argpartition(-combined, rerank)[:rerank]
+            candidates, similarity = candidates[best], similarity[best]
+
+        results = []
+        for row, name_similarity in zip(candidates.tolist(), similarity.tolist()):
+            product_id, product_description = self._record(row)
+            _, product_strengths, product_form = _parse_catalog_description(product_description)
+            score = (
+                NAME_WEIGHT * min(1.0, name_similarity)
+                + STRENGTH_WEIGHT * _attribute_score(strengths, product_strengths)
+                + FORM_WEIGHT * _attribute_score(form, product_form)
+            )
+            results.append({'id': product_id, 'description': product_description, 'score': round(score, 4)})
+        results.sort(key=lambda result: result['score'], reverse=True)
+        return results[:k]
+
+    def match_many(self, descriptions: List[str], k: int = 5) -> List[List[Dict]]:
+        """Match a batch of descriptions, resolving each distinct description once."""
+        matches = {description: self.match(description, k) for description in set(descriptions)}
+        return [matches[description] for description in descriptions]
+
+    def enrich(self, data: Dict, min_score: float = PRODUCT_MATCH_MIN_SCORE) -> Dict:
+        """Attach the best catalog match to line items the NDC catalog could not resolve, in place."""
+        if not self.available:
+            return data
+        items = [item for item in data.get('items') or []
+                 if isinstance(item, dict) and 'catalog_name' not in item and item.get('description_of_goods')]
+        descriptions = [str(item['description_of_goods']) for item in items]
+        for item, matches in zip(items, self.match_many(descriptions, k=1)):
+            if matches and matches[0]['score'] >= min_score:
+                item['formulary_id'] = matches[0]['id']
+                item['formulary_description'] = matches[0]['description']
+                item['formulary_match_score'] = matches[0]['score']
+        return data
+
+# Shared matcher (empty until an index has been built at PRODUCT_INDEX_PATH)
+PRODUCT_MATCHER = ProductMatcher()
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the product description index.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='index a formulary CSV (id, description) or FDA product.txt')
+    build.add_argument('catalog')
+    build.add_argument('-o', '--output', default=PRODUCT_INDEX_PATH, help='index directory')
+    match = subparsers.add_parser('match', help='match descriptions against the index')
+    match.add_argument('description', nargs='+')
+    match.add_argument('-k', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        count = build_index(args.catalog, args.output)
+        print(f"Indexed {count} products in {args.output}")
+    else:
+        for description in args.description:
+            print(description)
+            for result in PRODUCT_MATCHER.match(description, args.k):
+                print(f"  {result['score']:.3f}  {result['id']}  {result['description']}")
+
+if __name__ == '__main__':
+    main()
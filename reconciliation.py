@@ -0,0 +1,196 @@
+import json
+import argparse
+from typing import Dict, Iterable, Iterator, List, Sequence
+import numpy as np
+from invoice_numbers import PLAIN_NUMBER, parse_number
+
+# Default tolerances: a value matches if within max(ABS_TOLERANCE, REL_TOLERANCE * |expected|)
+ABS_TOLERANCE = 1.0
+REL_TOLERANCE = 0.01
+
+# Stored invoices reconciled per batch when auditing the store
+AUDIT_BATCH_SIZE = 10000
+
+# Invoice-level flags
+FLAG_LINE_MISMATCH = 'line_amount_mismatch'
+FLAG_SUBTOTAL_MISMATCH = 'subtotal_mismatch'
+FLAG_TOTAL_MISMATCH = 'total_mismatch'
+
+def _to_float(value) -> float:
+    """Fast path for plain numbers and digit grouping, falling back to the full normalizer."""
+    if value.__class__ is float or value.__class__ is int:
+        return float(value)
+    if value.__class__ is str and PLAIN_NUMBER.fullmatch(value):
+        return float(value.replace(',', ''))
+    number = parse_number(value)
+    return np.nan if number is None else number
+
+def build_arrays(invoices: Sequence[Dict]) -> Dict[str, np.ndarray]:
+    """Flatten a batch of invoices into column arrays (missing values become NaN)."""
+    quantity, rate, amount, line_invoice = [], [], [], []
+    totals = {name: [] for name in ('subtotal', 'discount', 'shipping', 'tax', 'total_invoice')}
+
+    for index, invoice in enumerate(invoices):
+        items = [item for item in (invoice.get('items') or []) if isinstance(item, dict)]
+        quantity.extend(_to_float(item.get('quantity')) for item in items)
+        rate.extend(_to_float(item.get('rate')) for item in items)
+        amount.extend(_to_float(item.get('amount')) for item in items)
+        line_invoice.extend([index] * len(items))
+
+        invoice_totals = invoice.get('totals') or {}
+        for name, values in totals.items():
+            values.append(_to_float(invoice_totals.get(name)))
+
+    arrays = {
+        'quantity': np.array(quantity, dtype=np.float64),
+        'rate': np.array(rate, dtype=np.float64),
+        'amount': np.array(amount, dtype=np.float64),
+        'line_invoice': np.array(line_invoice, dtype=np.int64)
+    }
+    arrays.update({name: np.array(values, dtype=np.float64) for name, values in totals.items()})
+    return arrays
+
+def _close(actual, expected, abs_tol, rel_tol):
+    return np.abs(actual - expected) <= np.maximum(abs_tol, rel_tol * np.abs(expected))
+
+def reconcile_arrays(arrays: Dict[str, np.ndarray], abs_tol: float = ABS_TOLERANCE,
+                     rel_tol: float = REL_TOLERANCE) -> Dict[str, np.ndarray]:
+    """Run all arithmetic checks over a whole batch at once.
+
+    A check is only applied where its inputs were extracted: zero or missing quantity
+    or rate leaves a line unchecked, and a zero or missing subtotal/total leaves that
+    invoice-level check unchecked (the prompt uses 0 for "not shown").
+    Returns boolean arrays: line_checked/line_ok per line, and *_checked/*_ok plus
+    bad_line_count per invoice.
+    """
+    quantity, rate, amount = arrays['quantity'], arrays['rate'], arrays['amount']
+    line_invoice = arrays['line_invoice']
+    invoice_count = len(arrays['subtotal'])
+
+    # quantity * rate ≈ amount
+    line_checked = np.isfinite(quantity) & np.isfinite(rate) & np.isfinite(amount) & (quantity != 0) & (rate != 0)
+    line_ok = ~line_checked | _close(quantity * rate, amount, abs_tol, rel_tol)
+    bad_line_count = np.bincount(line_invoice[~line_ok], minlength=invoice_count)
+
+    # sum(item amounts) ≈ subtotal
+    items_sum = np.bincount(line_invoice, weights=np.nan_to_num(amount), minlength=invoice_count)
+    subtotal = arrays['subtotal']
+    subtotal_checked = np.isfinite(subtotal) & (subtotal != 0)
+    subtotal_ok = ~subtotal_checked | _close(items_sum, subtotal, abs_tol, rel_tol)
+
+    # subtotal - discount + shipping + tax ≈ total
+    total = arrays['total_invoice']
+    expected_total = (
+        subtotal
+        - np.abs(np.nan_to_num(arrays['discount']))
+        + np.nan_to_num(arrays['shipping'])
+        + np.nan_to_num(arrays['tax'])
+    )
+    total_checked = subtotal_checked & np.isfinite(total) & (total != 0)
+    total_ok = ~total_checked | _close(expected_total, total, abs_tol, rel_tol)
+
+    return {
+        'line_checked': line_checked,
+        'line_ok': line_ok,
+        'bad_line_count': bad_line_count,
+        'items_sum': items_sum,
+        'subtotal_checked': subtotal_checked,
+        'subtotal_ok': subtotal_ok,
+        'expected_total': expected_total,
+        'total_checked': total_checked,
+        'total_ok': total_ok,
+        'invoice_ok': (bad_line_count == 0) & subtotal_ok & total_ok
+    }
+
+def reconcile_invoices(invoices: Sequence[Dict], abs_tol: float = ABS_TOLERANCE,
+                       rel_tol: float = REL_TOLERANCE, flagged_only: bool = False) -> Dict:
+    """Reconcile a batch of invoices and return JSON-friendly per-invoice and per-line flags."""
+    arrays = build_arrays(invoices)
+    checks = reconcile_arrays(arrays, abs_tol, rel_tol)
+
+    # Line positions within their invoice, for reporting bad lines
+    line_invoice = arrays['line_invoice']
+    bad_lines: Dict[int, List[int]] = {}
+    if len(line_invoice):
+        starts = np.searchsorted(line_invoice, line_invoice)
+        for line in np.flatnonzero(~checks['line_ok']):
+            bad_lines.setdefault(int(line_invoice[line]), []).append(int(line - starts[line]))
+
+    results = []
+    for index in range(len(invoices)):
+        ok = bool(checks['invoice_ok'][index])
+        if flagged_only and ok:
+            continue
+        flags = []
+        if checks['bad_line_count'][index]:
+            flags.append(FLAG_LINE_MISMATCH)
+        if not checks['subtotal_ok'][index]:
+            flags.append(FLAG_SUBTOTAL_MISMATCH)
+        if not checks['total_ok'][index]:
+            flags.append(FLAG_TOTAL_MISMATCH)
+        results.append({
+            'index': index,
+            'ok': ok,
+            'flags': flags,
+            'bad_lines': bad_lines.get(index, []),
+            'items_sum': round(float(checks['items_sum'][index]), 2),
+            'expected_total': None if np.isnan(checks['expected_total'][index])
+            else round(float(checks['expected_total'][index]), 2)
+        })
+
+    return {
+        'summary': {
+            'invoices': len(invoices),
+            'flagged': int((~checks['invoice_ok']).sum()),
+            'lines': int(len(line_invoice)),
+            'lines_checked': int(checks['line_checked'].sum()),
+            'bad_lines': int((~checks['line_ok']).sum())
+        },
+        'invoices': results
+    }
+
+def audit_records(records: Iterable[Dict], batch_size: int = AUDIT_BATCH_SIZE, abs_tol: float = ABS_TOLERANCE,
+                  rel_tol: float = REL_TOLERANCE) -> Iterator[Dict]:
+    """Reconcile stored invoice records batch by batch, yielding one report per batch.
+
+    Each report holds its batch summary and only the flagged invoices, tagged with
+    invoice_id and invoice_number, so memory stays bounded by the batch size.
+    """
+    batch = []
+
+    def flush():
+        report = reconcile_invoices([record['data'] for record in batch], abs_tol, rel_tol, True)
+        for result in report['invoices']:
+            record = batch[result.pop('index')]
+            result['invoice_id'] = record['id']
+            result['invoice_number'] = record['invoice_number']
+        batch.clear()
+        return report
+
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield flush()
+    if batch:
+        yield flush()
+
+def main():
+    from invoice_store import INVOICE_STORE
+
+    parser = argparse.ArgumentParser(description='Audit stored invoices and list the ones that fail reconciliation.')
+    parser.add_argument('--batch-size', type=int, default=AUDIT_BATCH_SIZE, help='invoices reconciled per batch')
+    parser.add_argument('--abs-tol', type=float, default=ABS_TOLERANCE)
+    parser.add_argument('--rel-tol', type=float, default=REL_TOLERANCE)
+    for name in ('invoice_number', 'gstin', 'company', 'date_from', 'date_to', 'sku'):
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, help=f'filter by {name}')
+    args = parser.parse_args()
+
+    filters = {name: getattr(args, name) for name in
+               ('invoice_number', 'gstin', 'company', 'date_from', 'date_to', 'sku')}
+    records = INVOICE_STORE.iter_invoices(**filters)
+    for report in audit_records(records, args.batch_size, args.abs_tol, args.rel_tol):
+        for result in report['invoices']:
+            print(json.dumps(result))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# Hedging is opt-in: it trades a little extra quota for a shorter latency tail
+MODEL_HEDGING = os.getenv('MODEL_HEDGING', 'false').lower() in ('1', 'true', 'yes')
+# Fire the duplicate once a call is slower than this percentile of recent calls
+MODEL_HEDGE_PERCENTILE = float(os.getenv('MODEL_HEDGE_PERCENTILE', 95))
+# Maximum share of calls that may be hedged
+MODEL_HEDGE_BUDGET = float(os.getenv('MODEL_HEDGE_BUDGET', 0.05))
+# Recent calls kept in the latency histogram, and how many are needed before hedging starts
+MODEL_HEDGE_WINDOW = int(os.getenv('MODEL_HEDGE_WINDOW', 1000))
+MODEL_HEDGE_MIN_SAMPLES = int(os.getenv('MODEL_HEDGE_MIN_SAMPLES', 20))
+
+# Histogram buckets grow geometrically by 5% from 10 ms (about 190 buckets up to 10 minutes)
+HISTOGRAM_MIN_SECONDS = 0.01
+HISTOGRAM_GROWTH = 1.05
+HISTOGRAM_BUCKETS = int(math.log(60000) / math.log(HISTOGRAM_GROWTH)) + 1
+
+class LatencyHistogram:
+    """Log-bucketed histogram over the most recent `window` latencies."""
+
+    def __init__(self, window: int = MODEL_HEDGE_WINDOW):
+        self.counts = [0] * HISTOGRAM_BUCKETS
+        self.recent = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def _bucket(self, seconds: float) -> int:
+        if seconds <= HISTOGRAM_MIN_SECONDS:
+            return 0
+        bucket = int(math.log(seconds / HISTOGRAM_MIN_SECONDS) / math.log(HISTOGRAM_GROWTH)) + 1
+        return min(bucket, HISTOGRAM_BUCKETS - 1)
+
+    def record(self, seconds: float):
+        bucket = self._bucket(seconds)
+        with self.lock:
+            if len(self.recent) == self.recent.maxlen:
+                self.counts[self.recent[0]] -= 1
+            self.recent.append(bucket)
+            self.counts[bucket] += 1
+
+    def __len__(self):
+        return len(self.recent)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Upper bound of the bucket holding the p-th percentile, or None when empty."""
+        with self.lock:
+            total = len(self.recent)
+            if not total:
+                return None
+            rank = math.ceil(total * p / 100)
+            seen = 0
+            for bucket, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank:
+                    return HISTOGRAM_MIN_SECONDS * HISTOGRAM_GROWTH ** bucket
+        return None
+
+def _spawn(fn: Callable) -> Future:
+    """Run fn on a new daemon thread (no shared pool caps how many calls can be in flight)."""
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name='model-hedge', daemon=True).start()
+    return future
+
+class HedgedCaller:
+    """Run calls with a duplicate fired when the first is slower than recent calls.
+
+    The hedge threshold is a percentile of a rolling latency histogram fed by every
+    primary call (including the slow ones that were hedged), and hedges are paid for
+    from a budget that earns `budget` credits per call, so at most that share of calls
+    is duplicated. The first successful result wins; the other call is ignored (the
+    SDK offers no way to abort a request already in flight).
+
+    With a scheduler, both calls are admitted through it and latency is measured from
+    admission, so time spent queueing never triggers a hedge; nothing is hedged while
+    the scheduler has a queue, as extra calls would only add to it.
+    """
+
+    def __init__(self, percentile: float = MODEL_HEDGE_PERCENTILE, budget: float = MODEL_HEDGE_BUDGET,
+                 window: int = MODEL_HEDGE_WINDOW, min_samples: int = MODEL_HEDGE_MIN_SAMPLES):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.histogram = LatencyHistogram(window)
+        self.lock = threading.Lock()
+        self.credits = 1.0
+        self.counters = {'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'over_budget': 0, 'skipped_queued': 0}
+
+    def threshold(self) -> Optional[float]:
+        """Current hedge delay in seconds (None until enough calls have been observed)."""
+        if len(self.histogram) < self.min_samples:
+            return None
+        return self.histogram.percentile(self.percentile)
+
+    def _take_credit(self) -> bool:
+        with self.lock:
+            if self.credits >= 1:
+                self.credits -= 1
+                self.counters['hedged'] += 1
+                return True
+            self.counters['over_budget'] += 1
+            return False
+
+    def _begin(self, scheduler) -> Optional[float]:
+        """Count a call, earn its hedge credit and return the threshold (None: do not hedge)."""
+        with self.lock:
+            self.counters['calls'] += 1
+            self.credits = min(self.credits + self.budget, max(1.0, self.budget * 100))
+        threshold = self.threshold()
+        if threshold is not None and scheduler is not None and scheduler.queue_depth():
+            with self.lock:
+                self.counters['skipped_queued'] += 1
+            return None
+        return threshold
+
+    def _primary(self, fn: Callable, started: List[float], admitted=None) -> Callable:
+        """Wrap fn to note when it starts running (after admission) and record its latency."""
+        def run():
+            began = time.monotonic()
+            started.append(began)
+            if admitted is not None:
+                admitted.set()
+            try:
+                return fn()
+            finally:
+                self.histogram.record(time.monotonic() - began)
+        return run
+
+    def call(self, fn: Callable, scheduler=None):
+        """Return fn() from whichever of the primary and (possible) hedge finishes first.
+
+        The primary runs in the calling thread unless a hedge could fire; then it runs on
+        its own thread so the caller can take whichever call finishes first.
+        """
+        threshold = self._begin(scheduler)
+        admit = scheduler.call if scheduler is not None else (lambda run: run())
+        started: List[float] = []
+        if threshold is None:
+            return admit(self._primary(fn, started))
+
+        admitted = threading.Event()
+        primary = _spawn(lambda: admit(self._primary(fn, started, admitted)))
+        primary.add_done_callback(lambda _: admitted.set())
+        # The hedge delay counts from admission, not from joining the scheduler's queue
+        admitted.wait()
+        if started:
+            wait([primary], timeout=max(0.0, started[0] + threshold - time.monotonic()))
+        if primary.done() or not self._take_credit():
+            return primary.result()
+
+        hedge = _spawn(lambda: admit(fn))
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self.lock:
+                            self.counters['hedge_wins'] += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _primary_async(self, fn: Callable[[], Awaitable], started: List[float],
+                       admitted: Optional[asyncio.Event] = None) -> Callable[[], Awaitable]:
+        """_primary() for coroutine functions."""
+        async def run():
+            began = time.monotonic()
+            started.append(began)
+            if admitted is not None:
+                admitted.set()
+            try:
+                return await fn()
+            finally:
+                self.histogram.record(time.monotonic() - began)
+        return run
+
+    async def call_async(self, fn: Callable[[], Awaitable], scheduler=None):
+        """call() for coroutines; unlike threads, the losing (or abandoned) request is cancelled."""
+        threshold = self._begin(scheduler)
+        admit = scheduler.call_async if scheduler is not None else (lambda run: run())
+        started: List[float] = []
+        if threshold is None:
+            return await admit(self._primary_async(fn, started))
+
+        admitted = asyncio.Event()
+        primary = asyncio.ensure_future(admit(self._primary_async(fn, started, admitted)))
+        tasks = [primary]
+        try:
+            # The hedge delay counts from admission, not from joining the scheduler's queue
+            admission = asyncio.ensure_future(admitted.wait())
+            try:
+                await asyncio.wait([primary, admission], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                admission.cancel()
+            if started:
+                await asyncio.wait([primary], timeout=max(0.0, started[0] + threshold - time.monotonic()))
+            if primary.done() or not self._take_credit():
+                return await primary
+
+            hedge = asyncio.ensure_future(admit(fn))
+            tasks.append(hedge)
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            with self.lock:
+                                self.counters['hedge_wins'] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict:
+        threshold = self.threshold()
+        with self.lock:
+            return {
+                'enabled': MODEL_HEDGING,
+                'percentile': self.percentile,
+                'budget': self.budget,
+                'threshold_seconds': round(threshold, 3) if threshold is not None else None,
+                'samples': len(self.histogram),
+                'hedge_rate': round(self.counters['hedged'] / self.counters['calls'], 4) if self.counters['calls'] else 0.0,
+                **self.counters
+            }
+
+# Shared hedger for model calls (used when MODEL_HEDGING is enabled)
+MODEL_HEDGER = HedgedCaller()
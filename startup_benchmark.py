@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import statistics
+import urllib.request
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Importing app without a model call, in a fresh interpreter each time
+IMPORT_SNIPPET = (
+    "import sys, time; started = time.perf_counter(); import app; "
+    "sys.stdout.write(repr(time.perf_counter() - started))"
+)
+
+def startup_environment(workdir: str) -> Dict[str, str]:
+    """Throwaway storage and a placeholder API key, so the SDK is set up exactly as in production."""
+    env = dict(os.environ)
+    env.setdefault('GOOGLE_API_KEY', 'startup-benchmark')
+    env.pop('EXTRACTION_BACKEND', None)
+    for variable, filename in (('INVOICE_STORE_DB', 'invoices.db'), ('EXTRACTION_CACHE_DB', 'cache.db'),
+                               ('JOB_QUEUE_DB', 'jobs.db'), ('WEBHOOK_OUTBOX_DB', 'outbox.db'),
+                               ('WEBHOOK_LOG_DB', 'webhook_logs.db'),
+                               ('WEBHOOK_CONFIG_FILE', 'webhook_config.json')):
+        env[variable] = os.path.join(workdir, filename)
+    return env
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def measure_import(tree: str, env: Dict[str, str]) -> float:
+    """Seconds to import app in a fresh interpreter."""
+    output = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET], cwd=tree, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+def measure_first_health(tree: str, env: Dict[str, str], timeout: float = 60) -> float:
+    """Seconds from starting `python app.py` until /api/health first answers 200."""
+    port = free_port()
+    url = f'http://127.0.0.1:{port}/api/health'
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'app.py'], cwd=tree, env={**env, 'PORT': str(port)},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f'app.py exited with code {process.returncode}')
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f'No health check answer within {timeout:g}s')
+    finally:
+        process.terminate()
+        process.wait()
+
+def slowest_imports(tree: str, env: Dict[str, str], count: int = 10) -> List[Dict]:
+    """Top-level packages with the largest cumulative import time (python -X importtime)."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=tree, env=env,
+                            capture_output=True, text=True).stderr
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Modules imported directly by app (one nesting level below it)
+        if name.startswith('   ') and not name.startswith('     '):
+            try:
+                totals[name.strip()] = int(cumulative)
+            except ValueError:
+                continue
+    return [{'module': name, 'ms': round(us / 1000, 1)}
+            for name, us in sorted(totals.items(), key=lambda item: -item[1])[:count]]
+
+def measure_tree(tree: str, runs: int, label: str) -> Dict:
+    with tempfile.TemporaryDirectory(prefix='invoice-startup-') as workdir:
+        env = startup_environment(workdir)
+        imports = [measure_import(tree, env) for _ in range(runs)]
+        health = [measure_first_health(tree, env) for _ in range(runs)]
+        result = {
+            'import_app_ms': round(statistics.median(imports) * 1000, 1),
+            'first_health_check_ms': round(statistics.median(health) * 1000, 1),
+            'slowest_imports': slowest_imports(tree, env)
+        }
+    print(f"{label:<10} import app {result['import_app_ms']:>8.1f} ms   "
+          f"first /api/health {result['first_health_check_ms']:>8.1f} ms   (median of {runs})")
+    return result
+
+def export_ref(ref: str, directory: str):
+    """Write the files of a git ref into directory (the working tree is not touched)."""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    archive = subprocess.run(['git', 'archive', ref], cwd=repo, capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', directory], input=archive, check=True)
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=(
+        'Measure cold-start cost: time to import app and time until the first /api/health answer, '
+        'optionally against an earlier git ref.'
+    ))
+    parser.add_argument('-r', '--runs', type=int, default=5, help='fresh processes per measurement')
+    parser.add_argument('--baseline', help='git ref to measure for comparison (e.g. HEAD~1)')
+    parser.add_argument('-o', '--output', default='startup_results.json', help='results file')
+    args = parser.parse_args()
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': git_commit(),
+        'python': sys.version.split()[0],
+        'runs': args.runs
+    }
+    if args.baseline:
+        with tempfile.TemporaryDirectory(prefix='invoice-baseline-') as tree:
+            export_ref(args.baseline, tree)
+            results['baseline'] = {'ref': args.baseline, **measure_tree(tree, args.runs, 'baseline')}
+    results['current'] = measure_tree(os.path.dirname(os.path.abspath(__file__)), args.runs, 'current')
+
+    if args.baseline:
+        for metric in ('import_app_ms', 'first_health_check_ms'):
+            before, after = results['baseline'][metric], results['current'][metric]
+            print(f"  {metric}: {before} -> {after} ({(after - before) / before * 100:+.1f}%)")
+
+    print('Slowest imports now: ' + ', '.join(
+        f"{entry['module']} {entry['ms']} ms" for entry in results['current']['slowest_imports'][:5]))
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
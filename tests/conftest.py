@@ -0,0 +1,12 @@
+import os
+import tempfile
+
+# Keep every SQLite store and the webhook config out of the working tree, and run offline
+_STORAGE = tempfile.mkdtemp(prefix='invoice-tests-')
+for variable, filename in (('INVOICE_STORE_DB', 'invoices.db'), ('EXTRACTION_CACHE_DB', 'cache.db'),
+                           ('JOB_QUEUE_DB', 'jobs.db'), ('WEBHOOK_OUTBOX_DB', 'outbox.db'),
+                           ('WEBHOOK_LOG_DB', 'webhook_logs.db'),
+                           ('WEBHOOK_CONFIG_FILE', 'webhook_config.json')):
+    os.environ.setdefault(variable, os.path.join(_STORAGE, filename))
+os.environ.setdefault('MODEL_CASCADE', 'local:structured')
+os.environ.setdefault('LOCAL_MODEL_LATENCY', '0')
@@ -0,0 +1,32 @@
+import asyncio
+import io
+from PIL import Image
+from quart.datastructures import FileStorage
+from asgi_app import app
+
+def png_bytes():
+    output = io.BytesIO()
+    Image.new('RGB', (32, 32), 'white').save(output, format='PNG')
+    return output.getvalue()
+
+def test_async_extract_status_url_is_served():
+    async def scenario():
+        client = app.test_client()
+        upload = FileStorage(io.BytesIO(png_bytes()), filename='invoice.png', content_type='image/png')
+        response = await client.post('/api/extract?async=1', files={'file': upload})
+        assert response.status_code == 202
+        queued = await response.get_json()
+
+        status = await client.get(queued['status_url'].replace('http://localhost', ''))
+        assert status.status_code == 200
+        job = await status.get_json()
+        assert job['job_id'] == queued['job_id']
+        assert job['status'] == 'queued'
+
+        stats = await client.get('/api/jobs')
+        assert stats.status_code == 200
+        assert (await stats.get_json())['jobs']['queued'] >= 1
+
+        missing = await client.get('/api/jobs/does-not-exist')
+        assert missing.status_code == 404
+    asyncio.run(scenario())
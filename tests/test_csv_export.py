@@ -0,0 +1,36 @@
+import csv
+import io
+import json
+import csv_export
+from csv_export import LAYOUT_COLUMNS, stream_csv
+
+def export(records, layout='items'):
+    rows = list(csv.DictReader(io.StringIO(''.join(stream_csv(records, layout)))))
+    assert list(rows[0]) == LAYOUT_COLUMNS[layout]
+    return rows
+
+def test_header_and_items_are_flattened_into_the_fixed_columns():
+    data = {
+        'company_info': {'company_name': 'Acme Pharma', 'website': 'acme.example'},
+        'totals': {'subtotal': 200, 'total_invoice': 236},
+        'items': [{'description_of_goods': 'Lofena 25MG TABS', 'quantity': 2, 'batch': 'B12'}]
+    }
+    row, = export([{'id': 1, 'timestamp': 't', 'data': data}])
+    assert row['company_info_company_name'] == 'Acme Pharma'
+    assert row['totals_total_invoice'] == '236'
+    assert row['item_description_of_goods'] == 'Lofena 25MG TABS'
+    assert json.loads(row['extra_fields']) == {'company_info_website': 'acme.example', 'item_batch': 'B12'}
+
+def test_known_section_that_is_not_an_object_is_kept():
+    row, = export([{'id': 1, 'data': {'totals': 'Rs. 1,200', 'items': []}}], layout='invoices')
+    assert row['totals_total_invoice'] == ''
+    assert json.loads(row['extra_fields']) == {'totals': 'Rs. 1,200'}
+
+def test_plans_for_many_record_shapes_stay_bounded():
+    records = [{'id': index, 'data': {f'note_{index}': index, 'items': [{f'field_{index}': index}]}}
+               for index in range(csv_export.PLAN_CACHE_SIZE * 3)]
+    rows = export(records)
+    assert json.loads(rows[-1]['extra_fields']) == {f'note_{len(records) - 1}': len(records) - 1,
+                                                    f'item_field_{len(records) - 1}': len(records) - 1}
+    assert csv_export._cached_header_plan.cache_info().currsize <= csv_export.PLAN_CACHE_SIZE
+    assert csv_export._cached_item_plan.cache_info().currsize <= csv_export.PLAN_CACHE_SIZE
@@ -0,0 +1,27 @@
+import time
+from extraction_cache import ExtractionCache
+
+def test_memory_hits_expire_with_max_age(tmp_path):
+    cache = ExtractionCache(str(tmp_path / 'cache.db'), max_age_seconds=0.1)
+    cache.put('key', {'total': 1})
+    assert cache.get('key') == {'total': 1}
+    assert cache.memory_hits == 1
+    time.sleep(0.15)
+    assert cache.get('key') is None
+    assert cache.stats()['memory_entries'] == 0
+
+def test_clear_reaches_other_processes_memory_tiers(tmp_path):
+    # Two instances on one file stand in for two server worker processes
+    path = str(tmp_path / 'cache.db')
+    worker, other = ExtractionCache(path), ExtractionCache(path)
+    worker.put('key', {'total': 1})
+    assert other.get('key') == {'total': 1}
+    assert other.get('key') == {'total': 1}
+    assert other.memory_hits == 1
+
+    worker.clear()
+    assert other.get('key') is None
+    assert worker.get('key') is None
+
+    other.put('key', {'total': 2})
+    assert worker.get('key') == {'total': 2}
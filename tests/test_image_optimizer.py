@@ -0,0 +1,43 @@
+import io
+import pytest
+from PIL import Image
+from image_optimizer import flatten_transparency, optimize_image
+
+def transparent_scan(mode):
+    """Black text strokes on a fully transparent background."""
+    image = Image.new('RGBA', (400, 300), (0, 0, 0, 0))
+    for x in range(50, 350):
+        for y in range(140, 160):
+            image.putpixel((x, y), (0, 0, 0, 255))
+    if mode == 'LA':
+        return image.convert('LA')
+    if mode == 'P':
+        # Palette entry 0 (black) is the transparent background
+        palette = Image.new('P', image.size, 0)
+        palette.putpalette([0, 0, 0, 0, 0, 0])
+        palette.paste(1, mask=image.getchannel('A'))
+        palette.info['transparency'] = 0
+        return palette
+    return image
+
+@pytest.mark.parametrize('mode', ['RGBA', 'LA', 'P'])
+def test_transparent_background_becomes_white(mode):
+    image = transparent_scan(mode)
+    flattened = flatten_transparency(image)
+    assert flattened.mode == 'RGB'
+    assert flattened.getpixel((5, 5)) == (255, 255, 255)
+    assert flattened.getpixel((200, 150)) == (0, 0, 0)
+
+@pytest.mark.parametrize('grayscale', [False, True])
+def test_optimized_transparent_png_keeps_text_readable(grayscale):
+    output = io.BytesIO()
+    transparent_scan('RGBA').save(output, format='PNG')
+    optimized, mime_type = optimize_image(output.getvalue(), grayscale=grayscale)
+    assert mime_type == 'image/jpeg'
+    image = Image.open(io.BytesIO(optimized)).convert('L')
+    assert image.getpixel((5, 5)) > 240
+    assert image.getpixel((200, 150)) < 15
+
+def test_opaque_images_are_left_alone():
+    image = Image.new('RGB', (10, 10), 'red')
+    assert flatten_transparency(image) is image
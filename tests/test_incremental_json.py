@@ -0,0 +1,44 @@
+import json
+import random
+import pytest
+from incremental_json import IncrementalInvoiceParser
+from local_model import generate_invoice
+
+def feed_in_chunks(text, rng):
+    """Feed text in random-sized chunks, returning the parser and all events."""
+    parser = IncrementalInvoiceParser()
+    events = []
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 12)
+        events.extend(parser.feed(text[position:position + size]))
+        position += size
+    return parser, events
+
+DOCUMENTS = [
+    json.dumps(generate_invoice(b'incremental'), indent=2),
+    '```json\n' + json.dumps(generate_invoice(b'fenced')) + '\n```',
+    '{"items": [1, 2], "a": 1}',
+    '{"items": [{"x": [1, "]"]}, "s", null, 3.5], "note": "a \\"quoted\\" }"}',
+    '{"company_info": {"company_name": "A"}, "items": []}',
+    '{"items": [7]}',
+]
+
+@pytest.mark.parametrize('text', DOCUMENTS)
+def test_random_chunk_boundaries_give_the_whole_document(text):
+    expected = json.loads(text[text.index('{'):text.rindex('}') + 1])
+    expected_items = expected.get('items', [])
+    rng = random.Random(text)
+    for _ in range(50):
+        parser, events = feed_in_chunks(text, rng)
+        assert parser.done
+        assert parser.result() == {k: v for k, v in expected.items() if v is not None}
+        assert [(index, item) for kind, index, item in events if kind == 'item'] == list(enumerate(expected_items))
+        fields = {event[1]: event[2] for event in events if event[0] == 'field'}
+        assert fields == {k: v for k, v in expected.items() if k != 'items' and v is not None}
+
+def test_items_are_emitted_before_the_object_closes():
+    parser = IncrementalInvoiceParser()
+    assert parser.feed('{"items": [{"amount": 1},') == [('item', 0, {'amount': 1})]
+    assert parser.feed(' 2]') == [('item', 1, 2)]
+    assert not parser.done
@@ -0,0 +1,31 @@
+import pytest
+from invoice_numbers import parse_number
+
+@pytest.mark.parametrize('value, expected', [
+    (12, 12.0),
+    (3.5, 3.5),
+    ('1,234.50', 1234.5),
+    ('5,54,400.00', 554400.0),
+    ('₹ 5,54,400.00', 554400.0),
+    ('$1,234.50', 1234.5),
+    ('Rs.500', 500.0),
+    ('Rs. 500.00', 500.0),
+    ('INR. 300', 300.0),
+    ('500 INR', 500.0),
+    ('Rs. 1,000/-', 1000.0),
+    ('12,600 nos', 12600.0),
+    ('10 TAB', 10.0),
+    ('.5', 0.5),
+    ('-12', -12.0),
+    ('1,200.00-', -1200.0),
+    ('(1,234.50)', -1234.5),
+])
+def test_parses_amounts_and_quantities(value, expected):
+    assert parse_number(value) == expected
+
+@pytest.mark.parametrize('value', [
+    None, True, '', '   ', 'NA', '-', '.', 'Rs', 'abc',
+    '2 x 10', '1.234,50', '1.2.3', '12 - 3', '5 of 10'
+])
+def test_rejects_missing_or_ambiguous_values(value):
+    assert parse_number(value) is None
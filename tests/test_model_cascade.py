@@ -0,0 +1,96 @@
+import io
+import pytest
+from PIL import Image
+import local_model
+import invoice_extractor_server
+from extraction_backends import create_backend
+from model_cascade import build_tiers, cascade_stats, validate_extraction
+
+def invoice_images(count):
+    """Distinct small scans, so the local models answer (and corrupt) per image."""
+    images = []
+    for index in range(count):
+        image = Image.new('RGB', (64, 64), 'white')
+        image.putpixel((index % 64, index // 64), (0, 0, 0))
+        output = io.BytesIO()
+        image.save(output, format='PNG')
+        images.append(output.getvalue())
+    return images
+
+@pytest.fixture
+def cascade(monkeypatch):
+    """Install a cascade spec built with a given local-noisy error rate."""
+    def install(spec, error_rate):
+        monkeypatch.setattr(local_model, 'LOCAL_MODEL_ERROR_RATE', error_rate)
+        tiers = build_tiers(spec, create_backend)
+        monkeypatch.setattr(invoice_extractor_server, '_cascade_tiers', tiers)
+        return tiers
+    return install
+
+def extract_all(images):
+    results = []
+    for image in images:
+        result, error = invoice_extractor_server.extract_fields_from_image(image, use_cache=False)
+        assert error == ''
+        results.append(result)
+    return results
+
+def test_clean_cheap_tier_answers_are_accepted(cascade):
+    cheap, strong = cascade('local-noisy:compact,local:structured', error_rate=0.0)
+    results = extract_all(invoice_images(10))
+
+    assert cheap.stats()['accepted'] == 10
+    assert cheap.stats()['escalated'] == 0
+    assert strong.stats()['attempts'] == 0
+    assert all(validate_extraction(result) == [] for result in results)
+
+def test_inconsistent_cheap_tier_answers_escalate(cascade):
+    cheap, strong = cascade('local-noisy:compact,local:structured', error_rate=1.0)
+    results = extract_all(invoice_images(10))
+
+    assert cheap.stats()['escalated'] == 10
+    assert strong.stats()['accepted'] == 10
+    assert all(validate_extraction(result) == [] for result in results)
+    stats = cascade_stats([cheap, strong])
+    assert [tier['share_of_invoices'] for tier in stats['tiers']] == [0.0, 1.0]
+
+def test_escalations_match_the_corrupted_share(cascade):
+    cheap, strong = cascade('local-noisy:compact,local:full', error_rate=0.5)
+    extract_all(invoice_images(40))
+
+    cheap_stats = cheap.stats()
+    assert cheap_stats['attempts'] == 40
+    assert 0 < cheap_stats['escalated'] < 40
+    assert cheap_stats['accepted'] + cheap_stats['escalated'] == 40
+    assert strong.stats()['attempts'] == cheap_stats['escalated']
+    assert strong.stats()['accepted'] == cheap_stats['escalated']
+
+def test_token_usage_is_recorded_per_tier(cascade):
+    cheap, strong = cascade('local-noisy:compact,local:structured', error_rate=1.0)
+    extract_all(invoice_images(3))
+
+    for tier in (cheap, strong):
+        stats = tier.stats()
+        assert stats['calls_with_usage'] == 3
+        assert stats['mean_input_tokens'] > 0 and stats['mean_output_tokens'] > 0
+
+def test_failing_tier_escalates_as_an_error(cascade, monkeypatch):
+    cheap, strong = cascade('local-noisy:compact,local:structured', error_rate=0.0)
+
+    def unavailable(*args, **kwargs):
+        raise RuntimeError('model unavailable')
+
+    monkeypatch.setattr(cheap.model, 'generate_content', unavailable)
+    extract_all(invoice_images(2))
+
+    assert cheap.stats()['errors'] == 2
+    assert strong.stats()['accepted'] == 2
+
+def test_validation_flags_incomplete_results():
+    assert validate_extraction({}) == ['empty result']
+    invoice = local_model.generate_invoice(b'validation')
+    assert validate_extraction(invoice) == []
+    invoice['items'][0]['amount'] = 'NA'
+    assert validate_extraction(invoice) == ['incomplete line items']
+    del invoice['totals']
+    assert 'missing totals' in validate_extraction(invoice)
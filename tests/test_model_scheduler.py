@@ -0,0 +1,108 @@
+import time
+import asyncio
+import threading
+import pytest
+from model_scheduler import ModelScheduler, ModelQueueTimeout
+
+def scheduler(max_concurrency, **kwargs):
+    return ModelScheduler(requests_per_minute=1e9, tokens_per_minute=1e12, max_concurrency=max_concurrency,
+                          min_concurrency=max_concurrency, **kwargs)
+
+def test_async_calls_respect_the_concurrency_limit():
+    model_scheduler = scheduler(5)
+    active = peak = 0
+
+    async def call():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.001)
+        active -= 1
+
+    async def main():
+        await asyncio.gather(*(model_scheduler.call_async(call) for _ in range(200)))
+
+    asyncio.run(main())
+    assert peak == 5
+    assert model_scheduler.stats()['calls'] == 200
+    assert model_scheduler.stats()['queue_depth'] == 0
+
+def test_queued_coroutines_are_woken_on_release_without_polling():
+    model_scheduler = scheduler(1)
+
+    async def call():
+        await asyncio.sleep(0.001)
+
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(*(model_scheduler.call_async(call) for _ in range(100)))
+        return time.perf_counter() - started
+
+    # 100 calls of ~1ms one after another; each hand-over is a direct wakeup, not a poll interval
+    assert asyncio.run(main()) < 0.6
+
+def test_threads_and_coroutines_share_slots():
+    model_scheduler = scheduler(2)
+    active = peak = 0
+    lock = threading.Lock()
+
+    def enter():
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+
+    def leave():
+        nonlocal active
+        with lock:
+            active -= 1
+
+    def blocking_call():
+        enter()
+        time.sleep(0.002)
+        leave()
+
+    async def async_call():
+        enter()
+        await asyncio.sleep(0.002)
+        leave()
+
+    threads = [threading.Thread(target=model_scheduler.call, args=(blocking_call,)) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+
+    async def main():
+        await asyncio.gather(*(model_scheduler.call_async(async_call) for _ in range(20)))
+
+    asyncio.run(main())
+    for thread in threads:
+        thread.join()
+    assert peak <= 2
+    assert model_scheduler.stats()['calls'] == 40
+
+def test_cancelled_call_releases_its_slot():
+    model_scheduler = scheduler(1)
+
+    async def main():
+        blocked = asyncio.ensure_future(model_scheduler.call_async(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        blocked.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await blocked
+        await asyncio.wait_for(model_scheduler.call_async(lambda: asyncio.sleep(0)), 1)
+
+    asyncio.run(main())
+    assert model_scheduler.stats()['active'] == 0
+
+def test_queue_timeout_for_coroutines():
+    model_scheduler = scheduler(1, queue_timeout=0.05)
+
+    async def main():
+        holder = asyncio.ensure_future(model_scheduler.call_async(lambda: asyncio.sleep(0.3)))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ModelQueueTimeout):
+            await model_scheduler.call_async(lambda: asyncio.sleep(0))
+        await holder
+
+    asyncio.run(main())
+    assert model_scheduler.stats()['queue_timeouts'] == 1
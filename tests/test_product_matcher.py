@@ -0,0 +1,50 @@
+import csv
+import random
+import pytest
+from product_matcher import ProductMatcher, build_index
+
+BRAND_SYLLABLES = ['lo', 'fe', 'na', 'di', 'cl', 'ra', 'mo', 'xi', 'pa', 'ce', 'ta', 'mol', 'fen', 'zo']
+GENERICS = ['DICLOFENAC', 'DICLOFENAC SODIUM', 'ACECLOFENAC', 'PARACETAMOL', 'IBUPROFEN', 'CEFIXIME']
+STRENGTHS = [5, 10, 25, 50, 75, 100, 250, 500]
+FORMS = ['TABS', 'CAPS', 'GEL', 'INJ', 'SYP', 'CREAM', 'DROPS']
+TARGETS = [(25, 'TABS'), (50, 'CAPS'), (100, 'INJ'), (10, 'GEL')]
+
+@pytest.fixture(scope='module')
+def matcher(tmp_path_factory):
+    """A catalog full of shared trigrams, where one name is sold in thousands of strength/form variants."""
+    rng = random.Random(7)
+    rows = []
+    for index in range(20000):
+        brand = ''.join(rng.choice(BRAND_SYLLABLES) for _ in range(rng.randint(2, 3))).upper()
+        generic, strength, form = rng.choice(GENERICS), rng.choice(STRENGTHS), rng.choice(FORMS)
+        rows.append((f'P{index}', f'{brand} {strength}MG {form} ({generic} {strength}MG)'))
+    # 3000 "Lofena" entries that tie with the targets on name but never match both strength and form
+    variants = [(strength, form) for strength in STRENGTHS for form in FORMS if (strength, form) not in TARGETS]
+    for index in range(3000):
+        strength, form = rng.choice(variants)
+        rows.append((f'L{index}', f'Lofena {strength}MG {form} (DICLOFENAC {strength}MG)'))
+    rows.extend((f'TARGET-{strength}-{form}', f'Lofena {strength}MG {form} (DICLOFENAC {strength}MG)')
+                for strength, form in TARGETS)
+    rng.shuffle(rows)
+
+    directory = tmp_path_factory.mktemp('formulary')
+    with open(directory / 'formulary.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'description'])
+        writer.writerows(rows)
+    build_index(str(directory / 'formulary.csv'), str(directory / 'index'))
+    return ProductMatcher(str(directory / 'index'))
+
+@pytest.mark.parametrize('strength, form', TARGETS)
+def test_exact_variant_is_found_among_name_ties(matcher, strength, form):
+    matches = matcher.match(f'Lofena {strength}MG {form} (DICLOFENAC {strength}MG)', k=3)
+    assert matches[0]['id'] == f'TARGET-{strength}-{form}'
+    assert matches[0]['score'] == 1.0
+
+def test_form_synonyms_and_missing_generic_still_find_the_variant(matcher):
+    assert matcher.match('LOFENA 25 mg tablets', k=1)[0]['id'] == 'TARGET-25-TABS'
+
+def test_common_brand_trigrams_do_not_crowd_out_the_exact_name(matcher):
+    # A name made only of common syllables: its word gram is rare, its trigrams are not
+    description = matcher._record(0)[1]
+    assert matcher.match(description, k=1)[0]['description'] == description
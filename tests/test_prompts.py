@@ -0,0 +1,16 @@
+from google.generativeai.types import generation_types
+from extraction_core import generation_options, get_profile
+
+def test_structured_profile_builds_a_gemini_generation_config():
+    # Runs the SDK's own schema conversion, which is where an unsupported
+    # TypedDict would fail on every live extraction.
+    options = generation_options(get_profile('structured'))
+    config = generation_types.to_generation_config_dict(options['generation_config'])
+    assert config['response_mime_type'] == 'application/json'
+    schema = config['response_schema']
+    assert set(schema.properties) == {
+        'company_info', 'billing_info', 'shipping_info', 'invoice_info', 'items', 'totals'}
+    assert 'sku_ndc_number' in schema.properties['items'].items.properties
+
+def test_compact_profile_has_no_generation_config():
+    assert generation_options(get_profile('compact')) == {}
@@ -0,0 +1,78 @@
+import copy
+import numpy as np
+from local_model import generate_invoice
+from reconciliation import (FLAG_LINE_MISMATCH, FLAG_SUBTOTAL_MISMATCH, FLAG_TOTAL_MISMATCH, audit_records,
+                            build_arrays, reconcile_invoices)
+
+def consistent_invoice():
+    return {
+        'items': [
+            {'quantity': '2', 'rate': '₹ 100.00', 'amount': '200.00'},
+            {'quantity': 3, 'rate': 50, 'amount': '1,50.00'},
+        ],
+        'totals': {'subtotal': '350', 'discount': '-10', 'shipping': 0, 'tax': '35', 'total_invoice': 'Rs. 375'}
+    }
+
+def test_consistent_invoice_has_no_flags():
+    report = reconcile_invoices([consistent_invoice()])
+    assert report['summary'] == {'invoices': 1, 'flagged': 0, 'lines': 2, 'lines_checked': 2, 'bad_lines': 0}
+    assert report['invoices'][0]['ok']
+    assert report['invoices'][0]['flags'] == []
+
+def test_each_mismatch_is_flagged():
+    line = consistent_invoice()
+    line['items'][1]['amount'] = 999
+    subtotal = consistent_invoice()
+    subtotal['totals']['subtotal'] = 500
+    total = consistent_invoice()
+    total['totals']['total_invoice'] = 1000
+
+    results = reconcile_invoices([line, subtotal, total])['invoices']
+    assert results[0]['flags'] == [FLAG_LINE_MISMATCH, FLAG_SUBTOTAL_MISMATCH]
+    assert results[0]['bad_lines'] == [1]
+    assert results[1]['flags'] == [FLAG_SUBTOTAL_MISMATCH, FLAG_TOTAL_MISMATCH]
+    assert results[2]['flags'] == [FLAG_TOTAL_MISMATCH]
+
+def test_missing_values_are_not_checked():
+    invoice = consistent_invoice()
+    invoice['items'][0].update(quantity='NA', amount='2 x 10')
+    invoice['totals'].update(subtotal=0, total_invoice='NA')
+    report = reconcile_invoices([invoice])
+    assert report['summary']['lines_checked'] == 1
+    assert report['invoices'][0]['ok']
+
+def test_values_within_tolerance_match():
+    invoice = consistent_invoice()
+    invoice['items'][0]['amount'] = 200.9
+    invoice['totals'].update(subtotal=350.9, tax=35.0, total_invoice=375.9)
+    assert reconcile_invoices([invoice])['invoices'][0]['ok']
+
+def test_flagged_only_keeps_batch_positions():
+    bad = consistent_invoice()
+    bad['totals']['total_invoice'] = 10
+    report = reconcile_invoices([consistent_invoice(), bad, consistent_invoice()], flagged_only=True)
+    assert [result['index'] for result in report['invoices']] == [1]
+    assert report['summary']['flagged'] == 1
+
+def test_audit_records_batches_and_tags_results():
+    records = []
+    for index in range(25):
+        invoice = generate_invoice(str(index).encode(), corrupt=index % 4 == 0)
+        records.append({'id': index + 1, 'invoice_number': f'INV-{index}', 'data': copy.deepcopy(invoice)})
+
+    reports = list(audit_records(records, batch_size=10))
+    assert [report['summary']['invoices'] for report in reports] == [10, 10, 5]
+    flagged = [result for report in reports for result in report['invoices']]
+    assert [result['invoice_id'] for result in flagged] == [1, 5, 9, 13, 17, 21, 25]
+    assert flagged[0]['invoice_number'] == 'INV-0'
+
+def test_values_parse_number_rejects_are_missing_not_misread():
+    ambiguous = consistent_invoice()
+    ambiguous['items'][0]['amount'] = '1.234,50'
+    ambiguous['items'][1]['amount'] = '1_000'
+    ambiguous['totals']['total_invoice'] = '1e3'
+    arrays = build_arrays([ambiguous])
+    # Not 1.2345, 1000 and 1000.0: the checks that need them are skipped instead
+    assert np.isnan(arrays['amount']).all()
+    assert np.isnan(arrays['total_invoice'][0])
+    assert reconcile_invoices([ambiguous])['summary']['lines_checked'] == 0
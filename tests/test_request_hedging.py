@@ -0,0 +1,81 @@
+import time
+import asyncio
+import threading
+from request_hedging import HedgedCaller
+from model_scheduler import ModelScheduler
+
+def warmed_hedger(latency=0.02):
+    hedger = HedgedCaller(percentile=95, budget=1.0, min_samples=5)
+    for _ in range(20):
+        hedger.histogram.record(latency)
+    return hedger
+
+def single_slot_scheduler():
+    return ModelScheduler(requests_per_minute=1e9, tokens_per_minute=1e12, max_concurrency=1, min_concurrency=1)
+
+def test_primary_runs_inline_until_a_threshold_exists():
+    hedger = HedgedCaller(min_samples=5)
+    assert hedger.call(threading.get_ident) == threading.get_ident()
+
+def test_slow_call_is_hedged_and_the_hedge_wins():
+    hedger = warmed_hedger()
+    calls = []
+
+    def fn():
+        calls.append(None)
+        time.sleep(0.5 if len(calls) == 1 else 0.0)
+        return len(calls)
+
+    started = time.monotonic()
+    assert hedger.call(fn) == 2
+    assert time.monotonic() - started < 0.3
+    assert hedger.stats()['hedge_wins'] == 1
+
+def test_queue_wait_does_not_count_towards_the_hedge_threshold():
+    hedger = warmed_hedger()
+    scheduler = single_slot_scheduler()
+    scheduler.acquire()
+    threading.Timer(0.3, scheduler.release).start()
+
+    # Waits ~0.3s for the slot, then runs well within the threshold once admitted
+    assert hedger.call(lambda: 'ok', scheduler) == 'ok'
+    assert hedger.stats()['hedged'] == 0
+
+def test_no_hedging_while_the_scheduler_has_a_queue():
+    hedger = warmed_hedger()
+    scheduler = single_slot_scheduler()
+    scheduler.acquire()
+    queued = threading.Thread(target=scheduler.call, args=(lambda: None,))
+    queued.start()
+    while not scheduler.queue_depth():
+        time.sleep(0.001)
+    threading.Timer(0.05, scheduler.release).start()
+
+    assert hedger.call(threading.get_ident, scheduler) == threading.get_ident()
+    queued.join()
+    assert hedger.stats()['skipped_queued'] == 1
+    assert hedger.stats()['hedged'] == 0
+
+def test_async_queue_wait_does_not_trigger_a_hedge():
+    hedger = warmed_hedger()
+    scheduler = single_slot_scheduler()
+
+    async def main():
+        holder = asyncio.ensure_future(scheduler.call_async(lambda: asyncio.sleep(0.3)))
+        await asyncio.sleep(0.01)
+        # Waits ~0.3s behind the holder, then finishes at once: no hedge
+        assert await hedger.call_async(lambda: asyncio.sleep(0, 'queued'), scheduler) == 'queued'
+        assert hedger.stats()['hedged'] == 0
+        await holder
+        # Admitted at once but slow: hedged, and the loser is cancelled
+        calls = []
+
+        async def fn():
+            calls.append(None)
+            await asyncio.sleep(1.0 if len(calls) == 1 else 0.0)
+            return len(calls)
+
+        return await hedger.call_async(fn)
+
+    assert asyncio.run(main()) == 2
+    assert hedger.stats()['hedge_wins'] == 1
@@ -0,0 +1,26 @@
+import io
+import json
+from werkzeug.test import EnvironBuilder, run_wsgi_app
+import app as server
+
+def post_chunked(path, field, size):
+    """POST a multipart upload without Content-Length, as with Transfer-Encoding: chunked."""
+    builder = EnvironBuilder(path=path, method='POST',
+                             data={field: (io.BytesIO(b'\0' * size), 'invoice.png')})
+    environ = builder.get_environ()
+    del environ['CONTENT_LENGTH']
+    environ['HTTP_TRANSFER_ENCODING'] = 'chunked'
+    environ['wsgi.input_terminated'] = True
+    body, status, _ = run_wsgi_app(server.app, environ, buffered=True)
+    return int(status.split()[0]), json.loads(b''.join(body))
+
+def test_single_file_routes_reject_oversized_chunked_uploads():
+    for path in ('/api/extract', '/api/extract-stream'):
+        status, body = post_chunked(path, 'file', server.MAX_FILE_SIZE + 1024)
+        assert status == 413
+        assert body == {'error': 'File too large. Maximum size is 16MB.'}
+
+def test_batch_route_reports_oversized_files_individually():
+    status, body = post_chunked('/api/extract-batch', 'files', server.MAX_FILE_SIZE + 1024)
+    assert status == 200
+    assert body['results'][0]['error'] == 'File too large. Maximum size is 16MB.'
@@ -0,0 +1,72 @@
+import json
+import time
+import sqlite3
+import pytest
+from webhook_batching import WebhookBatcher
+from webhook_delivery import STATUS_BATCHING, STATUS_PENDING, WebhookDelivery
+
+class OutboxOnly(WebhookDelivery):
+    """Delivery engine that only writes the outbox (no worker threads, nothing is sent)."""
+
+    def start(self):
+        pass
+
+def outbox_rows(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in conn.execute('SELECT * FROM deliveries ORDER BY id')]
+    finally:
+        conn.close()
+
+@pytest.fixture
+def outbox(tmp_path):
+    return str(tmp_path / 'outbox.db')
+
+def webhook(**options):
+    return {'id': 1, 'url': 'https://erp.example.com/invoices', 'headers': {'X-Key': 'k'}, **options}
+
+def test_full_batch_becomes_one_array_delivery(outbox):
+    batcher = WebhookBatcher(OutboxOnly(outbox))
+    for number in range(3):
+        batcher.add(webhook(batch_size=3, batch_linger_seconds=60), {'invoice': number})
+
+    row, = outbox_rows(outbox)
+    assert row['status'] == STATUS_PENDING
+    assert row['batch_size'] == 3
+    assert json.loads(row['payload']) == [{'invoice': 0}, {'invoice': 1}, {'invoice': 2}]
+    assert json.loads(row['headers']) == {'X-Key': 'k'}
+
+def test_gathering_batch_survives_a_crash(outbox):
+    # The first process accepts two invoices and dies before the linger window ends
+    batcher = WebhookBatcher(OutboxOnly(outbox))
+    batcher.add(webhook(batch_size=10, batch_linger_seconds=0.2), {'invoice': 'a'})
+    batcher.add(webhook(batch_size=10, batch_linger_seconds=0.2), {'invoice': 'b'})
+    assert [row['status'] for row in outbox_rows(outbox)] == [STATUS_BATCHING, STATUS_BATCHING]
+
+    # A fresh process's delivery scheduler finds the overdue batch in the outbox
+    restarted = OutboxOnly(outbox)
+    restarted._release_due_batches()
+    assert [row['status'] for row in outbox_rows(outbox)] == [STATUS_BATCHING, STATUS_BATCHING]
+    time.sleep(0.25)
+    restarted._release_due_batches()
+
+    row, = outbox_rows(outbox)
+    assert row['status'] == STATUS_PENDING
+    assert json.loads(row['payload']) == [{'invoice': 'a'}, {'invoice': 'b'}]
+
+def test_linger_timer_releases_partial_batch(outbox):
+    batcher = WebhookBatcher(OutboxOnly(outbox))
+    batcher.add(webhook(batch_size=10, batch_linger_seconds=0.05), {'invoice': 'a'})
+    deadline = time.time() + 2
+    while outbox_rows(outbox)[0]['status'] != STATUS_PENDING:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    assert outbox_rows(outbox)[0]['batch_size'] == 1
+
+def test_stale_timer_does_not_release_a_newer_batch(outbox):
+    delivery = OutboxOnly(outbox)
+    delivery.stage('key', 'https://erp.example.com', {'invoice': 'a'}, batch_size=10, linger=60)
+    assert delivery.release('key', due_by=time.time()) is None
+    assert outbox_rows(outbox)[0]['status'] == STATUS_BATCHING
+    assert delivery.release('key') is not None
@@ -0,0 +1,151 @@
+import os
+import copy
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# fcntl is only available on POSIX; elsewhere writes are serialized per process only
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class WebhookConfigStore:
+    """In-memory view of webhook_config.json.
+
+    Reads are served from memory and the file is only re-parsed when its mtime or size
+    changes (e.g. edited by hand or by another worker process). Writes happen under a
+    lock and replace the file atomically, and ids are allocated from a persisted
+    monotonic counter so they are never reused after a delete.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._config = {'webhooks': [], 'next_id': 1}
+        self._signature = None
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _refresh(self):
+        """Reload the file if it changed since the last read."""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        config = {'webhooks': []}
+        if signature is not None:
+            try:
+                with open(self.path, 'r') as f:
+                    config = json.load(f)
+            except Exception as e:
+                print(f"Error loading webhook config: {e}")
+                return
+        config.setdefault('webhooks', [])
+        highest_id = max((w.get('id', 0) for w in config['webhooks']), default=0)
+        config['next_id'] = max(config.get('next_id', 1), highest_id + 1)
+        self._config = config
+        self._signature = signature
+
+    @contextmanager
+    def _write_lock(self):
+        """Serialize writers across threads and, where supported, across processes."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path + '.lock', 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, config) -> bool:
+        """Atomically replace the config file (temp file plus rename)."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, temp_path = tempfile.mkstemp(prefix='.webhook_config.', suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(config, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.path)
+            except Exception:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        except Exception as e:
+            print(f"Error saving webhook config: {e}")
+            return False
+        self._config = config
+        self._signature = self._file_signature()
+        return True
+
+    def load(self) -> Dict:
+        """Return a copy of the current configuration."""
+        with self._lock:
+            self._refresh()
+            return copy.deepcopy(self._config)
+
+    def enabled_webhooks(self) -> List[Dict]:
+        """Return the enabled webhooks without copying (callers must not modify them)."""
+        with self._lock:
+            self._refresh()
+            return [w for w in self._config['webhooks'] if w.get('enabled', True)]
+
+    def save(self, config: Dict) -> bool:
+        """Replace the whole configuration."""
+        with self._write_lock():
+            self._refresh()
+            config = copy.deepcopy(config)
+            highest_id = max((w.get('id', 0) for w in config.get('webhooks', [])), default=0)
+            config['next_id'] = max(config.get('next_id', 1), self._config['next_id'], highest_id + 1)
+            return self._write(config)
+
+    def add(self, name: Optional[str], url: str, enabled: bool = True,
+            headers: Optional[Dict] = None, **options) -> Optional[Dict]:
+        """Add a webhook with a fresh id; returns it, or None if saving failed."""
+        with self._write_lock():
+            self._refresh()
+            config = copy.deepcopy(self._config)
+            webhook_id = config['next_id']
+            webhook = {
+                'id': webhook_id,
+                'name': name or f"Webhook {webhook_id}",
+                'url': url,
+                'enabled': enabled,
+                'headers': headers or {},
+                'created_at': datetime.now().isoformat()
+            }
+            webhook.update(options)
+            config['webhooks'].append(webhook)
+            config['next_id'] = webhook_id + 1
+            return copy.deepcopy(webhook) if self._write(config) else None
+
+    def delete(self, webhook_id: int) -> bool:
+        """Remove a webhook; returns False only if saving failed."""
+        with self._write_lock():
+            self._refresh()
+            config = copy.deepcopy(self._config)
+            config['webhooks'] = [w for w in config['webhooks'] if w.get('id') != webhook_id]
+            return self._write(config)
+
+    def toggle(self, webhook_id: int) -> bool:
+        """Flip a webhook's enabled flag; returns False only if saving failed."""
+        with self._write_lock():
+            self._refresh()
+            config = copy.deepcopy(self._config)
+            for webhook in config['webhooks']:
+                if webhook.get('id') == webhook_id:
+                    webhook['enabled'] = not webhook.get('enabled', True)
+                    break
+            return self._write(config)
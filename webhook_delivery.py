@@ -0,0 +1,593 @@
+import os
+import gzip
+import json
+import time
+import queue
+import asyncio
+import random
+import sqlite3
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit
+from typing import Callable, Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import stage_timer
+
+# httpx is only needed by the asyncio service's delivery engine
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Delivery configuration (override through environment variables)
+WEBHOOK_OUTBOX_DB = os.getenv('WEBHOOK_OUTBOX_DB', 'webhook_outbox.db')
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 4))
+# Concurrent deliveries in the asyncio service (coroutines, not threads)
+WEBHOOK_ASYNC_CONCURRENCY = int(os.getenv('WEBHOOK_ASYNC_CONCURRENCY', 64))
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', 30))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', 6))
+WEBHOOK_BACKOFF_BASE = float(os.getenv('WEBHOOK_BACKOFF_BASE', 2))
+WEBHOOK_BACKOFF_MAX = float(os.getenv('WEBHOOK_BACKOFF_MAX', 300))
+WEBHOOK_BREAKER_THRESHOLD = int(os.getenv('WEBHOOK_BREAKER_THRESHOLD', 5))
+WEBHOOK_BREAKER_COOLDOWN = float(os.getenv('WEBHOOK_BREAKER_COOLDOWN', 30))
+
+# Seconds a worker may hold a delivery before another worker or process may retry it
+DELIVERY_LEASE_SECONDS = 120
+# How often the scheduler scans the outbox for due retries
+SCHEDULER_INTERVAL = 1.0
+
+STATUS_PENDING = 'pending'
+STATUS_DEAD = 'dead'
+# One invoice of a webhook batch that is still gathering; never sent on its own
+STATUS_BATCHING = 'batching'
+
+# HTTP statuses worth retrying; any other 4xx is a permanent failure
+RETRYABLE_STATUS_CODES = {408, 425, 429}
+
+class CircuitBreaker:
+    """Per-host breaker: opens after consecutive failures, half-opens after a cooldown."""
+
+    def __init__(self, threshold=WEBHOOK_BREAKER_THRESHOLD, cooldown=WEBHOOK_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> Optional[float]:
+        """Return None if a request may be sent, else the time at which to try again."""
+        with self._lock:
+            if self.opened_at is None:
+                return None
+            retry_at = self.opened_at + self.cooldown
+            if time.time() < retry_at or self.trial_in_flight:
+                return max(retry_at, time.time() + 1)
+            # Half-open: let a single trial request through
+            self.trial_in_flight = True
+            return None
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.time()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.time() >= self.opened_at + self.cooldown else 'open'
+
+class WebhookDelivery:
+    """Webhook delivery engine with a durable outbox.
+
+    Every delivery is written to the SQLite outbox before it is sent. A fixed pool of
+    worker threads sends deliveries through keep-alive sessions (one per host), retries
+    failures with exponential backoff and jitter, and skips hosts whose circuit breaker
+    is open. Pending deliveries left by a restart are picked up from the outbox.
+
+    Invoices for batching webhooks are written to the outbox as they arrive (status
+    'batching', grouped by batch key) and coalesced into one delivery when the batch
+    is released, so a crash while a batch is gathering loses nothing.
+    """
+
+    def __init__(self, db_path=WEBHOOK_OUTBOX_DB, workers=WEBHOOK_WORKERS,
+                 on_result: Optional[Callable[[Dict], None]] = None):
+        self.db_path = db_path
+        self.workers = workers
+        self.on_result = on_result
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._queued_lock = threading.Lock()
+        self._sessions = {}
+        self._breakers = {}
+        self._hosts_lock = threading.Lock()
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._initialized = False
+        self.delivered = 0
+        self.failed = 0
+        self.retried = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._initialized:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS deliveries ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' url TEXT NOT NULL,'
+                ' headers TEXT NOT NULL,'
+                ' payload TEXT NOT NULL,'
+                ' status TEXT NOT NULL,'
+                ' attempts INTEGER NOT NULL DEFAULT 0,'
+                ' next_attempt_at REAL NOT NULL,'
+                ' lease_expires REAL,'
+                ' last_error TEXT,'
+                ' compress INTEGER NOT NULL DEFAULT 0,'
+                ' batch_size INTEGER NOT NULL DEFAULT 1,'
+                ' batch_key TEXT,'
+                ' created_at REAL NOT NULL)'
+            )
+            # Outboxes created before batching was added lack these columns
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(deliveries)')}
+            if 'compress' not in columns:
+                conn.execute('ALTER TABLE deliveries ADD COLUMN compress INTEGER NOT NULL DEFAULT 0')
+            if 'batch_size' not in columns:
+                conn.execute('ALTER TABLE deliveries ADD COLUMN batch_size INTEGER NOT NULL DEFAULT 1')
+            if 'batch_key' not in columns:
+                conn.execute('ALTER TABLE deliveries ADD COLUMN batch_key TEXT')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_deliveries_due ON deliveries (status, next_attempt_at)'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_deliveries_batch ON deliveries (status, batch_key)'
+            )
+            self._initialized = True
+        return conn
+
+    def start(self):
+        """Start the worker pool and retry scheduler (idempotent)."""
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'webhook-worker-{i}')
+                thread.daemon = True
+                thread.start()
+            thread = threading.Thread(target=self._schedule, name='webhook-scheduler')
+            thread.daemon = True
+            thread.start()
+
+    def enqueue(self, url: str, data, headers: Optional[Dict] = None,
+                compress: bool = False, batch_size: int = 1) -> int:
+        """Persist a delivery to the outbox and hand it to the worker pool.
+
+        With compress=True the body is sent gzip-encoded; batch_size records how many
+        invoices a batched payload carries.
+        """
+        self.start()
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'INSERT INTO deliveries (url, headers, payload, status, next_attempt_at,'
+                ' compress, batch_size, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, json.dumps(headers or {}), json.dumps(data, ensure_ascii=False),
+                 STATUS_PENDING, now, int(compress), batch_size, now)
+            )
+            delivery_id = cursor.lastrowid
+        finally:
+            conn.close()
+        self._submit(delivery_id)
+        return delivery_id
+
+    def stage(self, batch_key: str, url: str, data, headers: Optional[Dict] = None, compress: bool = False,
+              batch_size: int = 1, linger: float = 0.0) -> Optional[float]:
+        """Persist one invoice of a batching webhook's current batch.
+
+        The batch is released as one delivery as soon as it holds batch_size invoices;
+        otherwise its deadline (linger seconds after its first invoice) is returned.
+        """
+        self.start()
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                batch = conn.execute(
+                    'SELECT COUNT(*) AS size, MIN(next_attempt_at) AS deadline FROM deliveries'
+                    ' WHERE status = ? AND batch_key = ?', (STATUS_BATCHING, batch_key)
+                ).fetchone()
+                deadline = batch['deadline'] if batch['size'] else now + linger
+                conn.execute(
+                    'INSERT INTO deliveries (url, headers, payload, status, next_attempt_at,'
+                    ' compress, batch_size, batch_key, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (url, json.dumps(headers or {}), json.dumps(data, ensure_ascii=False),
+                     STATUS_BATCHING, deadline, int(compress), 1, batch_key, now)
+                )
+                delivery_id = self._coalesce(conn, batch_key) if batch['size'] + 1 >= batch_size else None
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+        if delivery_id is not None:
+            self._submit(delivery_id)
+            return None
+        return deadline
+
+    def release(self, batch_key: str, due_by: Optional[float] = None) -> Optional[int]:
+        """Coalesce a gathering batch into one pending delivery and hand it to the workers.
+
+        With due_by, only a batch whose deadline has passed by then is released.
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                delivery_id = None
+                if due_by is None or conn.execute(
+                    'SELECT 1 FROM deliveries WHERE status = ? AND batch_key = ? AND next_attempt_at <= ? LIMIT 1',
+                    (STATUS_BATCHING, batch_key, due_by)
+                ).fetchone():
+                    delivery_id = self._coalesce(conn, batch_key)
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+        if delivery_id is not None:
+            self._submit(delivery_id)
+        return delivery_id
+
+    def _coalesce(self, conn, batch_key) -> Optional[int]:
+        """Replace a batch's staged invoices with one pending array delivery (inside a transaction)."""
+        rows = conn.execute(
+            'SELECT id, url, headers, payload, compress FROM deliveries WHERE status = ? AND batch_key = ?'
+            ' ORDER BY id', (STATUS_BATCHING, batch_key)
+        ).fetchall()
+        if not rows:
+            return None
+        latest, now = rows[-1], time.time()
+        cursor = conn.execute(
+            'INSERT INTO deliveries (url, headers, payload, status, next_attempt_at,'
+            ' compress, batch_size, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (latest['url'], latest['headers'], '[' + ','.join(row['payload'] for row in rows) + ']',
+             STATUS_PENDING, now, latest['compress'], len(rows), now)
+        )
+        conn.execute('DELETE FROM deliveries WHERE status = ? AND batch_key = ? AND id <= ?',
+                     (STATUS_BATCHING, batch_key, latest['id']))
+        return cursor.lastrowid
+
+    def _release_due_batches(self):
+        """Release batches whose linger window has passed, including ones left by a crashed process."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            keys = [row['batch_key'] for row in conn.execute(
+                'SELECT batch_key FROM deliveries WHERE status = ? GROUP BY batch_key'
+                ' HAVING MIN(next_attempt_at) <= ?', (STATUS_BATCHING, now)
+            )]
+        finally:
+            conn.close()
+        for key in keys:
+            self.release(key, due_by=now)
+
+    def _submit(self, delivery_id):
+        with self._queued_lock:
+            if delivery_id in self._queued:
+                return
+            self._queued.add(delivery_id)
+        self._queue.put(delivery_id)
+
+    def _due_ids(self):
+        """Ids of pending deliveries that are due and not leased."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                'SELECT id FROM deliveries WHERE status = ? AND next_attempt_at <= ?'
+                ' AND (lease_expires IS NULL OR lease_expires < ?)'
+                ' ORDER BY next_attempt_at LIMIT 500',
+                (STATUS_PENDING, now, now)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [row['id'] for row in rows]
+
+    def _schedule(self):
+        """Feed due (and orphaned) pending deliveries from the outbox to the workers."""
+        while True:
+            try:
+                self._release_due_batches()
+                for delivery_id in self._due_ids():
+                    self._submit(delivery_id)
+            except sqlite3.Error as e:
+                print(f"Error scanning webhook outbox: {e}")
+            time.sleep(SCHEDULER_INTERVAL)
+
+    def _claim(self, delivery_id):
+        """Lease a delivery so no other worker or process sends it concurrently."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'UPDATE deliveries SET lease_expires = ? WHERE id = ? AND status = ?'
+                ' AND next_attempt_at <= ? AND (lease_expires IS NULL OR lease_expires < ?)',
+                (now + DELIVERY_LEASE_SECONDS, delivery_id, STATUS_PENDING, now, now)
+            )
+            if cursor.rowcount != 1:
+                return None
+            return conn.execute('SELECT * FROM deliveries WHERE id = ?', (delivery_id,)).fetchone()
+        finally:
+            conn.close()
+
+    def _breaker(self, url) -> CircuitBreaker:
+        """Return the circuit breaker for a URL's host."""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        with self._hosts_lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker()
+            return self._breakers[host]
+
+    def _host_state(self, url):
+        """Return the keep-alive session and circuit breaker for a URL's host."""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        breaker = self._breaker(url)
+        with self._hosts_lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+                session.mount(host, adapter)
+                self._sessions[host] = session
+            return self._sessions[host], breaker
+
+    def _work(self):
+        while True:
+            delivery_id = self._queue.get()
+            with self._queued_lock:
+                self._queued.discard(delivery_id)
+            try:
+                row = self._claim(delivery_id)
+                if row is not None:
+                    self._deliver(row)
+            except Exception as e:
+                print(f"Error delivering webhook {delivery_id}: {e}")
+
+    def _deliver(self, row):
+        session, breaker = self._host_state(row['url'])
+        log_entry = self._begin(row, breaker)
+        if log_entry is None:
+            return
+
+        retryable = True
+        try:
+            body, webhook_headers = self._request(row, log_entry)
+            with stage_timer('webhook_post'):
+                response = session.post(
+                    row['url'],
+                    data=body,
+                    headers=webhook_headers,
+                    timeout=WEBHOOK_TIMEOUT
+                )
+            retryable = self._record_response(log_entry, response.status_code, response.text)
+        except Exception as e:
+            log_entry['status'] = 'error'
+            log_entry['error'] = str(e)
+
+        self._finish(row, breaker, log_entry, retryable)
+
+    def _begin(self, row, breaker) -> Optional[Dict]:
+        """Start an attempt: the log entry, or None if the host's breaker pushed the delivery back."""
+        retry_at = breaker.allow()
+        if retry_at is not None:
+            # Host is considered down; push the delivery back without using an attempt
+            self._update(row['id'], STATUS_PENDING, row['attempts'], retry_at, 'Circuit breaker open')
+            return None
+
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'url': row['url'],
+            'delivery_id': row['id'],
+            'attempt': row['attempts'] + 1,
+            'batch_size': row['batch_size'],
+            'status': 'pending',
+            'response_code': None,
+            'error': None
+        }
+
+    def _request(self, row, log_entry):
+        """Build the request body (gzipped if asked) and headers, noting sizes in the log entry."""
+        webhook_headers = {'Content-Type': 'application/json'}
+        webhook_headers.update(json.loads(row['headers']))
+
+        body = row['payload'].encode('utf-8')
+        log_entry['payload_bytes'] = len(body)
+        if row['compress']:
+            body = gzip.compress(body)
+            webhook_headers['Content-Encoding'] = 'gzip'
+            log_entry['compressed_bytes'] = len(body)
+            log_entry['compression_ratio'] = round(log_entry['payload_bytes'] / max(len(body), 1), 2)
+        return body, webhook_headers
+
+    def _record_response(self, log_entry, status_code, text) -> bool:
+        """Record an HTTP response in the log entry; returns whether a failure is worth retrying."""
+        log_entry['status'] = 'success' if status_code < 400 else 'failed'
+        log_entry['response_code'] = status_code
+        log_entry['response_text'] = text[:500]  # Limit response text
+        return status_code >= 500 or status_code in RETRYABLE_STATUS_CODES
+
+    def _finish(self, row, breaker, log_entry, retryable):
+        """Update the breaker and the outbox after an attempt, then report it."""
+        attempt = log_entry['attempt']
+
+        # Any answer that is not worth retrying shows the host is up
+        if log_entry['status'] == 'success' or not retryable:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+        if log_entry['status'] == 'success':
+            self._delete(row['id'])
+            self.delivered += 1
+        else:
+            error = log_entry['error'] or f"HTTP {log_entry['response_code']}"
+            if retryable and attempt < WEBHOOK_MAX_ATTEMPTS:
+                delay = min(WEBHOOK_BACKOFF_MAX, WEBHOOK_BACKOFF_BASE ** attempt)
+                next_attempt_at = time.time() + random.uniform(delay / 2, delay)
+                self._update(row['id'], STATUS_PENDING, attempt, next_attempt_at, error)
+                log_entry['next_attempt_at'] = datetime.fromtimestamp(next_attempt_at).isoformat()
+                self.retried += 1
+            else:
+                self._update(row['id'], STATUS_DEAD, attempt, time.time(), error)
+                self.failed += 1
+
+        if self.on_result:
+            self.on_result(log_entry)
+
+    def _update(self, delivery_id, status, attempts, next_attempt_at, error):
+        conn = self._connect()
+        try:
+            conn.execute(
+                'UPDATE deliveries SET status = ?, attempts = ?, next_attempt_at = ?,'
+                ' lease_expires = NULL, last_error = ? WHERE id = ?',
+                (status, attempts, next_attempt_at, error, delivery_id)
+            )
+        finally:
+            conn.close()
+
+    def _delete(self, delivery_id):
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM deliveries WHERE id = ?', (delivery_id,))
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict:
+        """Return outbox counts, delivery counters and circuit breaker states."""
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) FROM deliveries GROUP BY status').fetchall()
+        finally:
+            conn.close()
+        with self._hosts_lock:
+            breakers = {host: breaker.state for host, breaker in self._breakers.items()}
+        return {
+            'outbox': {status: count for status, count in rows},
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'retried': self.retried,
+            'workers': self.workers,
+            'circuit_breakers': breakers
+        }
+
+class AsyncWebhookDelivery(WebhookDelivery):
+    """WebhookDelivery for the asyncio service.
+
+    Uses the same outbox, leases, retries and circuit breakers, but deliveries are sent
+    by coroutines on the server's event loop through one shared httpx.AsyncClient
+    instead of a pool of threads. enqueue() stays synchronous and thread-safe, so the
+    webhook batcher's timer thread can hand batches over as before.
+    """
+
+    def __init__(self, db_path=WEBHOOK_OUTBOX_DB, concurrency=WEBHOOK_ASYNC_CONCURRENCY,
+                 on_result: Optional[Callable[[Dict], None]] = None):
+        super().__init__(db_path, workers=concurrency, on_result=on_result)
+        self._loop = None
+        self._async_queue = None
+        self._client = None
+        self._tasks = []
+
+    async def start_async(self):
+        """Start the delivery coroutines on the running event loop (idempotent)."""
+        if self._loop is not None:
+            return
+        if httpx is None:
+            raise RuntimeError("Async webhook delivery requires httpx (pip install httpx)")
+        self._loop = asyncio.get_running_loop()
+        self._async_queue = asyncio.Queue()
+        self._client = httpx.AsyncClient(
+            timeout=WEBHOOK_TIMEOUT,
+            limits=httpx.Limits(max_connections=self.workers, max_keepalive_connections=self.workers)
+        )
+        self._tasks = [self._loop.create_task(self._work_async()) for _ in range(self.workers)]
+        self._tasks.append(self._loop.create_task(self._schedule_async()))
+
+    async def stop_async(self):
+        """Stop the delivery coroutines; unsent deliveries stay in the outbox."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+        self._tasks = []
+        self._loop = None
+
+    def start(self):
+        """Threads are not used; deliveries enqueued before start_async() wait in the outbox."""
+
+    def _submit(self, delivery_id):
+        if self._loop is None:
+            return
+        with self._queued_lock:
+            if delivery_id in self._queued:
+                return
+            self._queued.add(delivery_id)
+        self._loop.call_soon_threadsafe(self._async_queue.put_nowait, delivery_id)
+
+    async def _schedule_async(self):
+        while True:
+            try:
+                await asyncio.to_thread(self._release_due_batches)
+                for delivery_id in await asyncio.to_thread(self._due_ids):
+                    self._submit(delivery_id)
+            except sqlite3.Error as e:
+                print(f"Error scanning webhook outbox: {e}")
+            await asyncio.sleep(SCHEDULER_INTERVAL)
+
+    async def _work_async(self):
+        while True:
+            delivery_id = await self._async_queue.get()
+            with self._queued_lock:
+                self._queued.discard(delivery_id)
+            try:
+                row = await asyncio.to_thread(self._claim, delivery_id)
+                if row is not None:
+                    await self._deliver_async(row)
+            except Exception as e:
+                print(f"Error delivering webhook {delivery_id}: {e}")
+
+    async def _deliver_async(self, row):
+        breaker = self._breaker(row['url'])
+        log_entry = await asyncio.to_thread(self._begin, row, breaker)
+        if log_entry is None:
+            return
+
+        retryable = True
+        try:
+            body, webhook_headers = self._request(row, log_entry)
+            with stage_timer('webhook_post'):
+                response = await self._client.post(row['url'], content=body, headers=webhook_headers)
+            retryable = self._record_response(log_entry, response.status_code, response.text)
+        except Exception as e:
+            log_entry['status'] = 'error'
+            log_entry['error'] = str(e) or type(e).__name__
+
+        # Outbox writes and the result callback (log store) are blocking SQLite calls
+        await asyncio.to_thread(self._finish, row, breaker, log_entry, retryable)
@@ -0,0 +1,73 @@
+import os
+import json
+import sqlite3
+import threading
+from typing import Dict, List
+
+# Log configuration (override through environment variables)
+WEBHOOK_LOG_DB = os.getenv('WEBHOOK_LOG_DB', 'webhook_logs.db')
+WEBHOOK_LOG_LIMIT = int(os.getenv('WEBHOOK_LOG_LIMIT', 100))
+
+class WebhookLogStore:
+    """Recent webhook log entries in SQLite (WAL), shared by every server worker process.
+
+    Only the newest `limit` entries are kept; older ones are trimmed on each append.
+    """
+
+    def __init__(self, db_path=WEBHOOK_LOG_DB, limit=WEBHOOK_LOG_LIMIT):
+        self.db_path = db_path
+        self.limit = limit
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        """Return this thread's connection, creating the table on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        with self._init_lock:
+            if not self._initialized:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS webhook_logs ('
+                    ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                    ' entry TEXT NOT NULL)'
+                )
+                self._initialized = True
+        self._local.conn = conn
+        return conn
+
+    def append(self, log_entry: Dict):
+        """Store a log entry and drop entries beyond the limit."""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = conn.execute(
+                'INSERT INTO webhook_logs (entry) VALUES (?)',
+                (json.dumps(log_entry, ensure_ascii=False, default=str),)
+            )
+            conn.execute('DELETE FROM webhook_logs WHERE id <= ?', (cursor.lastrowid - self.limit,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def recent(self, count=None) -> List[Dict]:
+        """Return the newest entries, oldest first."""
+        rows = self._connect().execute(
+            'SELECT entry FROM webhook_logs ORDER BY id DESC LIMIT ?',
+            (self.limit if count is None else count,)
+        ).fetchall()
+        return [json.loads(entry) for entry, in reversed(rows)]
+
+    def count(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM webhook_logs').fetchone()[0]
+
+    def clear(self):
+        self._connect().execute('DELETE FROM webhook_logs')
+
+# Shared log store instance
+WEBHOOK_LOGS = WebhookLogStore()